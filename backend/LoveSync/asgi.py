@@ -11,13 +11,14 @@ django_asgi_app = get_asgi_application()
 from channels.routing import ProtocolTypeRouter, URLRouter
 from core.middleware import JWTAuthMiddlewareStack
 import collab.routing  # 导入你的websocket路由
+import mall.routing
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     # WebSocket路由（带身份认证）
     "websocket": JWTAuthMiddlewareStack(
         URLRouter(
-            collab.routing.websocket_urlpatterns
+            collab.routing.websocket_urlpatterns + mall.routing.websocket_urlpatterns
         )
     ),
 })
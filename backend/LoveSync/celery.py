@@ -0,0 +1,14 @@
+import os
+
+from celery import Celery
+
+# 设置Django配置模块
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LoveSync.settings')
+
+app = Celery('LoveSync')
+
+# 读取settings中以CELERY_开头的配置
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# 自动发现各应用下的tasks.py
+app.autodiscover_tasks()
@@ -357,6 +357,45 @@ SESSION_COOKIE_SECURE = False  # 开发环境使用HTTP，生产环境应设置
 SESSION_COOKIE_HTTPONLY = True  # 防止JavaScript访问cookie
 SESSION_COOKIE_SAMESITE = 'Lax'  # 防止CSRF攻击，同时确保消息在重定向过程中不会丢失
 
+# Celery配置（使用Redis作为消息队列）
+# 启动worker：celery -A LoveSync worker -l info
+# 启动定时任务：celery -A LoveSync beat -l info
+REDIS_DB_CELERY = os.getenv('REDIS_DB_CELERY', '3')
+CELERY_BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB_CELERY}"
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_IGNORE_RESULT = True
+
+# 秒杀活动预热：提前多少秒把活动数据加载到缓存
+FLASH_SALE_PREWARM_LEAD_SECONDS = int(os.getenv('FLASH_SALE_PREWARM_LEAD_SECONDS', 300))
+
+CELERY_BEAT_SCHEDULE = {
+    # 每分钟检查即将开始的秒杀活动并预热缓存
+    'prewarm-flash-sales': {
+        'task': 'mall.tasks.prewarm_flash_sales',
+        'schedule': 60,
+    },
+    # 每分钟同步有变化的商品搜索索引
+    'sync-product-search': {
+        'task': 'mall.tasks.sync_product_search',
+        'schedule': 60,
+    },
+    # 每10分钟对账退款状态并重新排队超时未完成的退款
+    'reconcile-refunds': {
+        'task': 'mall.tasks.reconcile_refunds',
+        'schedule': 600,
+    },
+    # 每30秒把缓冲的动态计数写入数据库
+    'flush-moment-counters': {
+        'task': 'moment.tasks.flush_moment_counters',
+        'schedule': 30,
+    },
+    # 每10分钟把超出时间窗口的动态移出热门排行
+    'prune-moment-rankings': {
+        'task': 'moment.tasks.prune_moment_rankings',
+        'schedule': 600,
+    },
+}
+
 # 阿里云 OSS 存储配置
 if not DEBUG:  # 仅在生产环境使用 OSS
     DEFAULT_FILE_STORAGE = 'core.storage.AliyunOSSStorage'
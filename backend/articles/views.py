@@ -5,6 +5,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.db.models import Q
+from core.pagination import keyset_page, parse_page
 from .models import OfficialColumn, ColumnArticle, ColumnComment, ArticleLike, ColumnSubscription
 from .serializers import (
     OfficialColumnSerializer, ColumnArticleSerializer,
@@ -173,10 +174,9 @@ class ColumnArticleViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def infinite_load(self, request):
-        """无限加载文章"""
-        page = int(request.query_params.get('page', 1))
+        """无限加载文章（传入 cursor 时按游标翻页）"""
+        page = parse_page(request.query_params.get('page'))
         page_size = 10
-        offset = (page - 1) * page_size
         
         category = request.query_params.get('category', 'all')
         queryset = self.queryset
@@ -184,14 +184,15 @@ class ColumnArticleViewSet(viewsets.ModelViewSet):
         if category != 'all':
             queryset = queryset.filter(column__category=category)
         
-        articles = queryset.order_by('-published_at')[offset:offset + page_size]
+        articles, next_cursor, has_more = keyset_page(
+            queryset, request.query_params.get('cursor'), page_size, 'published_at', page
+        )
         serializer = self.get_serializer(articles, many=True)
         
-        has_more = queryset.count() > offset + page_size
-        
         return Response({
             'articles': serializer.data,
             'has_more': has_more,
+            'next_cursor': next_cursor,
             'page': page
         })
 
@@ -229,24 +230,24 @@ class ColumnCommentViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def infinite_load(self, request):
-        """无限加载评论"""
+        """无限加载评论（传入 cursor 时按游标翻页）"""
         article_id = request.query_params.get('article_id')
         if not article_id:
             return Response({'error': 'article_id is required'}, status=400)
         
-        page = int(request.query_params.get('page', 1))
+        page = parse_page(request.query_params.get('page'))
         page_size = 20
-        offset = (page - 1) * page_size
         
         queryset = self.queryset.filter(article_id=article_id)
-        comments = queryset.order_by('-created_at')[offset:offset + page_size]
+        comments, next_cursor, has_more = keyset_page(
+            queryset, request.query_params.get('cursor'), page_size, 'created_at', page
+        )
         serializer = self.get_serializer(comments, many=True)
         
-        has_more = queryset.count() > offset + page_size
-        
         return Response({
             'comments': serializer.data,
             'has_more': has_more,
+            'next_cursor': next_cursor,
             'page': page
         })
 
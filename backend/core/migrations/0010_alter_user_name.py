@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_remove_profile_notification_vibration_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='name',
+            field=models.CharField(db_index=True, default='用户名', max_length=30),
+        ),
+    ]
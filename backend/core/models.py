@@ -11,7 +11,7 @@ from django.utils import timezone
 # 用户
 class User(AbstractUser):
     username = models.CharField(max_length=11, unique=True, db_index=True, verbose_name='手机号')
-    name = models.CharField(max_length=30, default='用户名')
+    name = models.CharField(max_length=30, default='用户名', db_index=True)
     email = models.EmailField(max_length=30, null=True, blank=True)
     phone_verified = models.BooleanField(default=False, verbose_name='手机号已验证')
     email_verified = models.BooleanField(default=False, verbose_name='邮箱已验证')
@@ -0,0 +1,57 @@
+"""游标分页（keyset）
+
+无限滚动接口按 (排序字段, id) 倒序分页：游标编码上一页最后一条记录的排序字段值和ID，
+下一页用 WHERE (字段, id) < (游标) 直接从索引位置继续读取，不再使用 OFFSET 跳过前面所有行；
+每次多取一条判断是否还有下一页，不再对整个结果集执行 COUNT。
+
+为兼容只传页码的旧客户端，没有游标时按页码定位（第一页与游标分页一致），响应中同时返回 next_cursor。
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+
+def encode_cursor(value, pk):
+    """生成游标"""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = json.dumps([value, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, field):
+    """解析游标，返回 (排序字段值, ID)，无效时返回 None"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return model._meta.get_field(field).to_python(value), int(pk)
+    except Exception:
+        return None
+
+
+def keyset_page(queryset, cursor=None, page_size=10, field='created_at', page=1):
+    """按 (field, id) 倒序取一页，返回 (记录列表, 下一页游标或 None, 是否还有更多)"""
+    queryset = queryset.order_by(f'-{field}', '-id')
+
+    position = decode_cursor(cursor, queryset.model, field) if cursor else None
+    if position is not None:
+        value, pk = position
+        queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+        items = list(queryset[:page_size + 1])
+    else:
+        offset = (max(page, 1) - 1) * page_size
+        items = list(queryset[offset:offset + page_size + 1])
+
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    next_cursor = encode_cursor(getattr(items[-1], field), items[-1].id) if has_more else None
+    return items, next_cursor, has_more
+
+
+def parse_page(value, default=1):
+    """解析页码参数"""
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return default
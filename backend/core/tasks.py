@@ -0,0 +1,17 @@
+"""公共异步任务"""
+from celery import shared_task
+from django.apps import apps
+
+from .thumbnails import generate_thumbnails
+
+
+@shared_task
+def generate_image_thumbnails(model_label, pk, field_name):
+    """为上传的图片生成缩略图"""
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    try:
+        generate_thumbnails(instance, field_name)
+    except Exception as e:
+        print(f"缩略图生成失败: {model_label} {pk} {e}")
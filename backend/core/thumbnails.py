@@ -0,0 +1,101 @@
+"""图片缩略图
+
+上传的图片（动态图片、相册照片、日记图片）由 Celery 任务在后台生成几个固定宽度的缩略图，
+与原图存放在同一存储后端（本地或阿里云 OSS），路径为 {原图目录}/thumbs/{原图文件名}_{宽度}w.{扩展名}；
+生成的宽度记录在模型的 thumbnail_widths 字段中，序列化时输出 srcset，
+列表页可以按显示尺寸加载缩略图，不必下载原图。小于某个宽度的原图不会放大生成该宽度的缩略图。
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+
+# 缩略图宽度（像素）
+THUMBNAIL_WIDTHS = tuple(sorted(
+    int(width) for width in os.getenv('IMAGE_THUMBNAIL_WIDTHS', '320,640,1080').split(',')
+))
+
+# 缩略图格式（WEBP 或 JPEG）
+THUMBNAIL_FORMAT = os.getenv('IMAGE_THUMBNAIL_FORMAT', 'WEBP').upper()
+
+# 缩略图质量
+THUMBNAIL_QUALITY = int(os.getenv('IMAGE_THUMBNAIL_QUALITY', 80))
+
+_EXTENSIONS = {
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+}
+
+
+def thumbnail_name(name, width):
+    """缩略图存储路径"""
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return f'{directory}/thumbs/{stem}_{width}w.{_EXTENSIONS.get(THUMBNAIL_FORMAT, "webp")}'
+
+
+def generate_thumbnails(instance, field_name):
+    """为模型实例的图片字段生成缩略图，返回生成的宽度列表"""
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return []
+
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as image_file:
+        image = Image.open(image_file)
+        # JPEG 按缩小后的尺寸解码，减少大图的解码时间和内存
+        image.draft('RGB', (THUMBNAIL_WIDTHS[-1], THUMBNAIL_WIDTHS[-1]))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    if THUMBNAIL_FORMAT == 'JPEG':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        # 保留透明通道（PNG、GIF 等）
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    widths = []
+    for width in THUMBNAIL_WIDTHS:
+        if width >= image.width:
+            break
+        height = max(1, round(image.height * width / image.width))
+        buffer = BytesIO()
+        image.resize((width, height), Image.LANCZOS).save(buffer, format=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+
+        name = thumbnail_name(field_file.name, width)
+        # 覆盖已有的缩略图，避免存储后端改名
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(buffer.getvalue()))
+        widths.append(width)
+
+    type(instance).objects.filter(pk=instance.pk).update(thumbnail_widths=widths)
+    instance.thumbnail_widths = widths
+    return widths
+
+
+def enqueue_thumbnails(instance, field_name):
+    """提交后异步生成缩略图"""
+    from .tasks import generate_image_thumbnails
+    model_label = instance._meta.label
+    pk = instance.pk
+    transaction.on_commit(lambda: generate_image_thumbnails.delay(model_label, pk, field_name))
+
+
+def thumbnail_urls(field_file, widths, request=None):
+    """返回 {宽度: 缩略图URL}"""
+    if not field_file:
+        return {}
+    urls = {}
+    for width in widths or []:
+        url = field_file.storage.url(thumbnail_name(field_file.name, width))
+        urls[width] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def build_srcset(field_file, widths, request=None):
+    """生成 srcset 属性值（没有缩略图时为空字符串）"""
+    return ', '.join(f'{url} {width}w' for width, url in thumbnail_urls(field_file, widths, request).items())
@@ -20,6 +20,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from .models import User, Profile, VerificationCode
 from .serializers import UserSerializer, ProfileSerializer, CustomTokenObtainPairSerializer, RegisterSerializer
 from moment.models import Moment
+from moment.cache_tags import MOMENT_LIST_GENERATION, get_tagged, set_tagged, tagged_key
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     """自定义JWT令牌获取视图"""
@@ -181,12 +182,10 @@ class IndexView(TemplateView):
         context = super().get_context_data(**kwargs)
         
         try:
-            from moment.models import Tag
-            from django.db.models import Count
+            from moment.trending import get_trending_tags
             
-            popular_tags = Tag.objects.annotate(
-                moment_count=Count('moments')
-            ).order_by('-moment_count')[:10]
+            # 最近7天的热门标签
+            popular_tags = get_trending_tags(limit=10)
             
             # 添加到上下文
             context['popular_tags'] = popular_tags
@@ -562,43 +561,30 @@ def settings_view(request, setting_type=None):
 @login_required
 def community_view(request):
     """社区页面"""
-    # 生成缓存键
-    cache_key = 'community:latest:1'
+    # 生成缓存键（带列表代号）
+    cache_key = tagged_key('community:latest:1', MOMENT_LIST_GENERATION)
     moments = None
     
-    # 尝试从缓存获取
-    try:
-        from django.core.cache import caches
-        master_cache = caches['master_cache']
-        cached_moments = master_cache.get(cache_key)
-        if cached_moments:
-            moments = cached_moments
-    except Exception as e:
-        print(f"缓存读取失败123: {e}")
+    # 尝试从缓存获取（页面中任一动态有变化时视为未命中）
+    cached_moments = get_tagged(cache_key)
+    if cached_moments:
+        moments = cached_moments
     
     # 从数据库查询
     if moments is None:
         # 获取所有分享的动态，按时间倒序排列，限制初始加载数量为10条
         moments = Moment.objects.filter(is_shared=True, user__isnull=False).order_by('-created_at')[:50]
-        # 缓存结果，有效期5分钟
-        try:
-            from django.core.cache import caches
-            master_cache = caches['master_cache']
-            # 只缓存有效的动态（确保user存在且id不为空）
-            valid_moments = []
-            for m in moments:
-                try:
-                    if m.user and hasattr(m.user, 'id') and m.user.id:
-                        valid_moments.append(m)
-                except Exception:
-                    # 跳过无效对象
-                    pass
-            if valid_moments:
-                master_cache.set(cache_key, valid_moments, 180)
-            else:
-                master_cache.set(cache_key, [], 180)
-        except Exception as e:
-            print(f"缓存写入失败: {e}")
+        # 缓存结果，有效期3分钟
+        # 只缓存有效的动态（确保user存在且id不为空）
+        valid_moments = []
+        for m in moments:
+            try:
+                if m.user and hasattr(m.user, 'id') and m.user.id:
+                    valid_moments.append(m)
+            except Exception:
+                # 跳过无效对象
+                pass
+        set_tagged(cache_key, valid_moments, [m.id for m in valid_moments], 180)
     else:
         try:
             if isinstance(moments, list):
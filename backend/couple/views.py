@@ -7,6 +7,7 @@ from django.views.generic import TemplateView
 from django.db import models
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
+from core.pagination import keyset_page, parse_page
 import json
 from .models import Anniversary, CoupleTask, TaskCompletion, QuizQuestion, UserQuizAnswer
 from .serializers import AnniversarySerializer, CoupleTaskSerializer, TaskCompletionSerializer
@@ -495,16 +496,14 @@ def couple_places_api(request):
     from django.http import JsonResponse
     
     try:
-        # 获取分页参数
-        page = int(request.GET.get('page', 1))
+        # 获取分页参数（传入 cursor 时按游标翻页）
+        page = parse_page(request.GET.get('page'))
+        cursor = request.GET.get('cursor')
         page_size = 10  # 每页10条数据
         
         # 获取地点类型参数
         place_type = request.GET.get('place_type', '')
         
-        # 计算偏移量
-        offset = (page - 1) * page_size
-        
         # 构建查询
         queryset = CouplePlace.objects.all().distinct()
         
@@ -526,8 +525,8 @@ def couple_places_api(request):
             if db_type:
                 queryset = queryset.filter(place_type=db_type)
         
-        # 按创建时间倒序排序
-        places = queryset.order_by('-created_at')[offset:offset + page_size]
+        # 按创建时间倒序排序，多取一条判断是否还有更多数据
+        places, next_cursor, has_more = keyset_page(queryset, cursor, page_size, 'created_at', page)
         
         # 构建地点数据列表
         places_data = []
@@ -545,13 +544,11 @@ def couple_places_api(request):
             }
             places_data.append(place_dict)
         
-        # 检查是否还有更多数据
-        has_more = queryset.count() > offset + page_size
-        
         return JsonResponse({
             'success': True,
             'places': places_data,
             'has_more': has_more,
+            'next_cursor': next_cursor,
             'page': page
         })
     
@@ -0,0 +1,26 @@
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+
+# 秒杀活动推送分组
+FLASH_SALE_GROUP = 'mall_flash_sale'
+
+
+class FlashSaleConsumer(AsyncWebsocketConsumer):
+    """秒杀活动开始推送"""
+
+    async def connect(self):
+        await self.channel_layer.group_add(FLASH_SALE_GROUP, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(FLASH_SALE_GROUP, self.channel_name)
+
+    async def flash_sale_started(self, event):
+        """转发秒杀开始事件"""
+        await self.send(text_data=json.dumps({
+            'type': 'flash_sale_started',
+            'flash_sale_id': event['flash_sale_id'],
+            'name': event['name'],
+            'end_time': event['end_time'],
+        }))
@@ -0,0 +1,216 @@
+"""优惠券可用性索引
+
+按用户缓存未使用、未过期的优惠券（按最低消费升序排列），
+结算时一次遍历即可得出可用优惠券和最优优惠，无需逐张查询数据库。
+优惠券状态变化（领取、使用）时调用 invalidate_user_coupon_index 清除缓存；
+优惠券本身被修改或删除（前台视图集或管理后台）时递增全局版本号 coupon_index:version，
+所有用户的索引缓存随之失效，同时清除可领取优惠券缓存。
+"""
+import os
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .models import Coupon, UserCoupon
+
+
+# 优惠券索引版本号的 Redis 原生键，与管理后台共用
+COUPON_INDEX_VERSION_KEY = 'coupon_index:version'
+
+# 用户优惠券索引缓存时间（秒），实际过期时间不会晚于最早到期的优惠券
+COUPON_INDEX_CACHE_TTL = int(os.getenv('COUPON_INDEX_CACHE_TTL', 600))
+
+
+def get_coupon_index_version():
+    """获取优惠券索引版本号"""
+    try:
+        version = get_redis_connection('mall_cache').get(COUPON_INDEX_VERSION_KEY)
+        return int(version) if version else 0
+    except Exception as e:
+        print(f"优惠券索引版本读取失败: {e}")
+        return 0
+
+
+def user_coupon_index_key(user_id):
+    """用户优惠券索引缓存键"""
+    return f'user_coupon_index:v{get_coupon_index_version()}:{user_id}'
+
+
+def available_coupons_key():
+    """可领取优惠券缓存键"""
+    return 'coupon_available'
+
+
+def _boundary_ttl(boundaries, now):
+    """计算缓存时间，不超过下一个生效/失效时间点"""
+    ttl = COUPON_INDEX_CACHE_TTL
+    for boundary in boundaries:
+        if boundary and boundary > now:
+            ttl = min(ttl, int((boundary - now).total_seconds()) + 1)
+    return max(ttl, 1)
+
+
+def calculate_discount(coupon_type, value, order_total):
+    """计算优惠金额，返回 None 表示优惠券类型错误"""
+    order_total = Decimal(order_total)
+    value = Decimal(value)
+    if coupon_type in ('满减券', '现金券'):
+        discount = value
+    elif coupon_type == '折扣券':
+        discount = order_total * (1 - value / 10)
+    else:
+        return None
+    # 优惠金额不超过订单金额
+    return max(min(discount, order_total), Decimal(0))
+
+
+def build_user_coupon_index(user_id):
+    """从数据库构建用户优惠券索引"""
+    now = timezone.now()
+    user_coupons = UserCoupon.objects.filter(
+        user_id=user_id,
+        is_used=False,
+        coupon__end_time__gte=now
+    ).select_related('coupon')
+
+    entries = []
+    for user_coupon in user_coupons:
+        coupon = user_coupon.coupon
+        entries.append({
+            'id': user_coupon.id,
+            'coupon': {
+                'id': coupon.id,
+                'name': coupon.name,
+                'type': coupon.type,
+                'value': coupon.value,
+                'min_spend': coupon.min_spend,
+                'start_time': coupon.start_time,
+                'end_time': coupon.end_time,
+            }
+        })
+
+    # 按最低消费升序排列，便于按门槛二分查找
+    entries.sort(key=lambda entry: entry['coupon']['min_spend'])
+    return entries
+
+
+def get_user_coupon_index(user_id):
+    """获取用户优惠券索引，优先读取缓存"""
+    cache_key = user_coupon_index_key(user_id)
+    try:
+        entries = caches['mall_cache'].get(cache_key)
+        if entries is not None:
+            return entries
+    except Exception as e:
+        print(f"优惠券索引缓存读取失败: {e}")
+
+    entries = build_user_coupon_index(user_id)
+
+    try:
+        now = timezone.now()
+        boundaries = []
+        for entry in entries:
+            boundaries.append(entry['coupon']['start_time'])
+            boundaries.append(entry['coupon']['end_time'])
+        caches['mall_cache'].set(cache_key, entries, _boundary_ttl(boundaries, now))
+    except Exception as e:
+        print(f"优惠券索引缓存写入失败: {e}")
+    return entries
+
+
+def invalidate_user_coupon_index(user_id):
+    """用户优惠券状态变化时清除索引缓存"""
+    try:
+        caches['mall_cache'].delete(user_coupon_index_key(user_id))
+    except Exception as e:
+        print(f"优惠券索引缓存清除失败: {e}")
+
+
+def evaluate_coupons(entries, order_total, now=None):
+    """一次遍历计算可用优惠券及最优优惠
+
+    返回 (未过期优惠券列表, 可用优惠券列表, 最优优惠券, 最优优惠金额)
+    """
+    now = now or timezone.now()
+    order_total = Decimal(order_total)
+
+    # 过滤掉缓存期间已过期的优惠券
+    valid_entries = [entry for entry in entries if entry['coupon']['end_time'] >= now]
+
+    # 满足最低消费的优惠券是按门槛排序后的前缀
+    thresholds = [entry['coupon']['min_spend'] for entry in valid_entries]
+    reachable = valid_entries[:bisect_right(thresholds, order_total)]
+
+    applicable = []
+    best_entry = None
+    best_discount = Decimal(0)
+    for entry in reachable:
+        coupon = entry['coupon']
+        # 未到生效时间的优惠券暂不可用
+        if coupon['start_time'] and coupon['start_time'] > now:
+            continue
+        discount = calculate_discount(coupon['type'], coupon['value'], order_total)
+        if discount is None:
+            continue
+        applicable.append(entry)
+        if best_entry is None or discount > best_discount:
+            best_entry = entry
+            best_discount = discount
+
+    return valid_entries, applicable, best_entry, best_discount
+
+
+def get_available_coupons():
+    """获取当前可领取的优惠券（全站共享缓存）"""
+    from .serializers import CouponSerializer
+
+    cache_key = available_coupons_key()
+    try:
+        data = caches['mall_cache'].get(cache_key)
+        if data is not None:
+            return data
+    except Exception as e:
+        print(f"可领取优惠券缓存读取失败: {e}")
+
+    now = timezone.now()
+    coupons = list(Coupon.objects.filter(
+        is_active=True,
+        start_time__lte=now,
+        end_time__gte=now,
+        remaining_quantity__gt=0
+    ))
+    data = CouponSerializer(coupons, many=True).data
+
+    # 缓存到最早失效的优惠券或下一张优惠券生效为止
+    boundaries = [coupon.end_time for coupon in coupons]
+    next_start = Coupon.objects.filter(
+        is_active=True,
+        start_time__gt=now
+    ).order_by('start_time').values_list('start_time', flat=True).first()
+    boundaries.append(next_start)
+
+    try:
+        caches['mall_cache'].set(cache_key, data, _boundary_ttl(boundaries, now))
+    except Exception as e:
+        print(f"可领取优惠券缓存写入失败: {e}")
+    return data
+
+
+def invalidate_available_coupons():
+    """优惠券库存变化时清除可领取列表缓存"""
+    try:
+        caches['mall_cache'].delete(available_coupons_key())
+    except Exception as e:
+        print(f"可领取优惠券缓存清除失败: {e}")
+
+
+def invalidate_coupons():
+    """优惠券被创建、修改或删除时，使所有用户的索引和可领取列表失效"""
+    try:
+        get_redis_connection('mall_cache').incr(COUPON_INDEX_VERSION_KEY)
+    except Exception as e:
+        print(f"优惠券索引版本更新失败: {e}")
+    invalidate_available_coupons()
@@ -0,0 +1,161 @@
+"""秒杀/活动缓存命名空间
+
+活动相关缓存键都带有版本号（mall_active:v{版本}:...）。
+活动数据变化时递增版本号，旧版本的缓存自然过期，无需逐个删除键；
+缓存有效期不会超过下一场活动的开始/结束时间，保证活动开始时立即可见。
+版本号保存在 Redis 原生键中，管理后台（sys_backend）也会递增同一个键。
+"""
+import os
+
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .models import FlashSale, FlashSaleProduct, Product
+
+
+# 版本号的 Redis 原生键（不经过 Django 缓存的键前缀），与管理后台共用
+ACTIVITY_VERSION_KEY = 'mall_active:version'
+
+# 活动缓存默认有效期（秒）
+FLASH_SALE_CACHE_TTL = int(os.getenv('FLASH_SALE_CACHE_TTL', 3600))
+
+
+def get_activity_version():
+    """获取当前活动缓存版本号"""
+    try:
+        version = get_redis_connection('mall_cache').get(ACTIVITY_VERSION_KEY)
+        return int(version) if version else 0
+    except Exception as e:
+        print(f"活动缓存版本读取失败: {e}")
+        return 0
+
+
+def bump_activity_version():
+    """递增活动缓存版本号，使所有活动缓存失效"""
+    try:
+        return get_redis_connection('mall_cache').incr(ACTIVITY_VERSION_KEY)
+    except Exception as e:
+        print(f"活动缓存版本更新失败: {e}")
+        return None
+
+
+def is_vip_user(user):
+    """判断用户是否为VIP"""
+    return bool(getattr(user, 'is_vip', False))
+
+
+def activity_cache_key(scope, is_vip, version=None):
+    """生成带版本号的活动缓存键
+
+    scope 为 home/flash/new/vip 等页面标识，按用户 VIP 状态区分
+    """
+    if version is None:
+        version = get_activity_version()
+    return f'mall_active:v{version}:{scope}:{"true" if is_vip else "false"}'
+
+
+def next_activity_boundary(now=None):
+    """获取下一个活动开始或结束的时间点"""
+    now = now or timezone.now()
+    next_start = FlashSale.objects.filter(
+        status=True,
+        start_time__gt=now
+    ).order_by('start_time').values_list('start_time', flat=True).first()
+    next_end = FlashSale.objects.filter(
+        status=True,
+        end_time__gt=now
+    ).order_by('end_time').values_list('end_time', flat=True).first()
+    boundaries = [boundary for boundary in (next_start, next_end) if boundary]
+    return min(boundaries) if boundaries else None
+
+
+def activity_cache_ttl(now=None):
+    """活动缓存有效期：默认有效期与距下一个活动边界时间的较小值"""
+    now = now or timezone.now()
+    ttl = FLASH_SALE_CACHE_TTL
+    boundary = next_activity_boundary(now)
+    if boundary:
+        ttl = min(ttl, int((boundary - now).total_seconds()) + 1)
+    return max(ttl, 1)
+
+
+def clear_flash_sale_cache():
+    """清除活动缓存（递增版本号）"""
+    version = bump_activity_version()
+    if version is not None:
+        print(f"活动缓存版本已更新: {version}")
+
+
+def build_current_flash_sales(now, is_vip):
+    """查询指定时间正在进行的秒杀活动（首页展示前3个）"""
+    query = FlashSale.objects.filter(
+        status=True,
+        start_time__lte=now,
+        end_time__gte=now
+    )
+    # 根据用户VIP状态筛选
+    if not is_vip:
+        query = query.filter(is_vip_only=False)
+    return list(query[:3])
+
+
+def build_flash_sale_page(now):
+    """查询秒杀活动页面的商品ID（秒杀商品和推荐商品），商品信息通过商品卡片缓存获取"""
+    current_flash_sales = FlashSale.objects.filter(
+        status=True,
+        start_time__lte=now,
+        end_time__gte=now
+    )
+
+    # 从当前活动中获取所有秒杀商品
+    flash_sale_product_ids = FlashSaleProduct.objects.filter(
+        flash_sale__in=current_flash_sales
+    ).values_list('product_id', flat=True)
+    product_ids = list(Product.objects.filter(
+        id__in=flash_sale_product_ids,
+        is_active=True,
+        product_stock__gt=0
+    ).order_by('-created_at').values_list('id', flat=True)[:20])
+
+    # 获取推荐商品
+    recommended_ids = list(Product.objects.filter(
+        is_active=True,
+        product_stock__gt=0
+    ).exclude(id__in=product_ids).order_by('?').values_list('id', flat=True)[:5])
+
+    return {
+        'products': [str(product_id) for product_id in product_ids],
+        'recommended': [str(product_id) for product_id in recommended_ids]
+    }
+
+
+def flash_stock_key(flash_sale_id):
+    """秒杀库存计数器（Redis 原生哈希，商品ID -> 剩余秒杀库存）"""
+    return f'flash_sale:{flash_sale_id}:stock'
+
+
+def flash_meta_key(flash_sale_id):
+    """秒杀活动元数据（Redis 原生哈希）"""
+    return f'flash_sale:{flash_sale_id}:meta'
+
+
+def get_cached_flash_stock(flash_sale_id, product_id):
+    """读取预热的秒杀库存，未预热时返回 None"""
+    try:
+        stock = get_redis_connection('mall_cache').hget(flash_stock_key(flash_sale_id), str(product_id))
+        return int(stock) if stock is not None else None
+    except Exception as e:
+        print(f"秒杀库存缓存读取失败: {e}")
+        return None
+
+
+def set_cached_flash_stock(flash_sale_id, product_id, stock):
+    """更新已预热的秒杀库存计数器"""
+    try:
+        redis_conn = get_redis_connection('mall_cache')
+        key = flash_stock_key(flash_sale_id)
+        # 只更新已预热的活动，避免生成没有过期时间的键
+        if redis_conn.exists(key):
+            redis_conn.hset(key, str(product_id), stock)
+    except Exception as e:
+        print(f"秒杀库存缓存更新失败: {e}")
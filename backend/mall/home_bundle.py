@@ -0,0 +1,183 @@
+"""商城首页数据包
+
+首页中变化不频繁的板块（轮播图、分类、情侣款商品、当前秒杀活动）合并为一个数据包接口返回。
+每个板块单独缓存在 mall_cache 中，缓存键带板块计数器（Redis 原生哈希 mall_home:versions），
+数据变化时由信号（以及管理后台）递增对应计数器；秒杀板块沿用活动缓存版本号（见 flash_sale_cache）。
+板块版本号取板块内容的摘要，整个数据包的 ETag 由各板块版本号计算，
+客户端携带 If-None-Match 重新验证时只需读取缓存，无需查询数据库或序列化数据。
+"""
+import hashlib
+import json
+import os
+
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .flash_sale_cache import activity_cache_key, activity_cache_ttl, build_current_flash_sales
+from .models import Category, HomeBanner, Product
+from .product_cards import get_product_cards
+
+
+# 板块计数器的 Redis 原生键，与管理后台共用
+SECTION_VERSIONS_KEY = 'mall_home:versions'
+
+# 板块缓存时间（秒），计数器未及时递增时最多延迟这么久
+HOME_SECTION_CACHE_TTL = int(os.getenv('HOME_SECTION_CACHE_TTL', 3600))
+
+# 由计数器失效的板块（秒杀板块使用活动缓存版本号）
+STATIC_SECTIONS = ('banners', 'categories', 'couple_products')
+
+
+def get_section_counters():
+    """获取各板块计数器"""
+    try:
+        counters = get_redis_connection('mall_cache').hgetall(SECTION_VERSIONS_KEY)
+        return {field.decode(): int(value) for field, value in counters.items()}
+    except Exception as e:
+        print(f"首页板块版本读取失败: {e}")
+        return {}
+
+
+def bump_section(section):
+    """递增板块计数器，使该板块缓存失效"""
+    try:
+        return get_redis_connection('mall_cache').hincrby(SECTION_VERSIONS_KEY, section, 1)
+    except Exception as e:
+        print(f"首页板块版本更新失败: {e}")
+        return None
+
+
+def section_cache_key(section, counters):
+    """板块缓存键"""
+    return f'mall_home:{section}:v{counters.get(section, 0)}'
+
+
+def build_banners():
+    """轮播图板块"""
+    return [
+        {
+            'id': banner.id,
+            'title': banner.title,
+            'image_url': banner.image.url if banner.image else '',
+            'link': banner.link or '',
+        }
+        for banner in HomeBanner.objects.filter(is_active=True).order_by('sort')[:5]
+    ]
+
+
+def build_categories():
+    """分类板块（顶级分类及其前5个子分类）"""
+    top_categories = list(Category.objects.filter(is_active=True, parent__isnull=True).order_by('sort')[:8])
+
+    # 一次查询所有子分类
+    children = {}
+    for child in Category.objects.filter(
+        is_active=True,
+        parent_id__in=[category.id for category in top_categories]
+    ).order_by('sort', '-created_at').values('id', 'name', 'parent_id'):
+        siblings = children.setdefault(child['parent_id'], [])
+        if len(siblings) < 5:
+            siblings.append({'id': child['id'], 'name': child['name']})
+
+    return [
+        {
+            'id': category.id,
+            'name': category.name,
+            'icon_url': category.icon.url if category.icon else '',
+            'children': children.get(category.id, []),
+        }
+        for category in top_categories
+    ]
+
+
+def build_couple_products():
+    """情侣款商品板块"""
+    product_ids = Product.objects.filter(
+        is_couple_product=True,
+        is_active=True
+    ).order_by('-created_at').values_list('id', flat=True)[:6]
+    return get_product_cards(product_ids)
+
+
+def build_flash_sales(now, is_vip):
+    """秒杀活动板块"""
+    return [
+        {
+            'id': flash_sale.id,
+            'name': flash_sale.name,
+            'description': flash_sale.description or '',
+            'cover_image_url': flash_sale.cover_image.url if flash_sale.cover_image else '',
+            'start_time': flash_sale.start_time,
+            'end_time': flash_sale.end_time,
+            'need_countdown': flash_sale.need_countdown,
+        }
+        for flash_sale in build_current_flash_sales(now, is_vip)
+    ]
+
+
+SECTION_BUILDERS = {
+    'banners': build_banners,
+    'categories': build_categories,
+    'couple_products': build_couple_products,
+}
+
+
+def _versioned(data):
+    """为板块数据附加内容摘要作为版本号"""
+    serialized = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return {'version': hashlib.md5(serialized.encode()).hexdigest()[:12], 'data': data}
+
+
+def get_home_sections(is_vip, sections=None):
+    """获取首页板块，返回 {板块: {'version': 版本号, 'data': 数据}}"""
+    sections = sections or STATIC_SECTIONS + ('flash_sales',)
+    counters = get_section_counters()
+    keys = {
+        section: (
+            activity_cache_key('home_bundle', is_vip)
+            if section == 'flash_sales' else section_cache_key(section, counters)
+        )
+        for section in sections
+    }
+
+    cache = caches['mall_cache']
+    try:
+        cached = cache.get_many(list(keys.values()))
+    except Exception as e:
+        print(f"首页板块缓存读取失败: {e}")
+        cached = {}
+
+    result = {}
+    for section, key in keys.items():
+        if key in cached:
+            result[section] = cached[key]
+            continue
+
+        if section == 'flash_sales':
+            now = timezone.now()
+            result[section] = _versioned(build_flash_sales(now, is_vip))
+            ttl = activity_cache_ttl(now)
+        else:
+            result[section] = _versioned(SECTION_BUILDERS[section]())
+            ttl = HOME_SECTION_CACHE_TTL
+        try:
+            cache.set(key, result[section], ttl)
+        except Exception as e:
+            print(f"首页板块缓存写入失败: {e}")
+    return result
+
+
+def get_home_bundle(is_vip):
+    """获取首页数据包，包含整体 ETag、各板块版本号和板块数据"""
+    sections = get_home_sections(is_vip)
+    versions = {section: value['version'] for section, value in sections.items()}
+    etag = hashlib.md5(
+        json.dumps(versions, sort_keys=True).encode()
+    ).hexdigest()
+    return {
+        'etag': etag,
+        'versions': versions,
+        'sections': {section: value['data'] for section, value in sections.items()},
+    }
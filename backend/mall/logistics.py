@@ -0,0 +1,159 @@
+"""物流轨迹存储
+
+物流轨迹按事件逐条保存在 LogisticsEvent 表中（按 物流信息+事件时间 建立索引），
+承运商推送的轨迹通过 ingest_events 批量写入。
+轨迹查询结果缓存在 mall_cache 中，只有新事件写入时才清除缓存。
+"""
+import os
+from datetime import datetime
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Logistics, LogisticsEvent
+
+
+# 物流轨迹缓存时间（秒）
+LOGISTICS_TRACK_CACHE_TTL = int(os.getenv('LOGISTICS_TRACK_CACHE_TTL', 86400))
+
+# 轨迹时间格式
+TRAJECTORY_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def logistics_track_key(logistics_id):
+    """物流轨迹缓存键"""
+    return f'logistics_track:{logistics_id}'
+
+
+def parse_event_time(value):
+    """解析轨迹时间，支持 datetime、ISO 格式和 %Y-%m-%d %H:%M:%S 字符串"""
+    if isinstance(value, datetime):
+        event_time = value
+    else:
+        event_time = parse_datetime(str(value))
+        if event_time is None:
+            event_time = datetime.strptime(str(value), TRAJECTORY_TIME_FORMAT)
+    if timezone.is_naive(event_time):
+        event_time = timezone.make_aware(event_time)
+    return event_time
+
+
+def serialize_event(event):
+    """轨迹事件转换为接口返回格式"""
+    return {
+        'time': timezone.localtime(event.event_time).strftime(TRAJECTORY_TIME_FORMAT),
+        'status': event.status,
+        'description': event.description
+    }
+
+
+def get_trajectory(logistics_id):
+    """获取物流轨迹，优先读取缓存"""
+    cache_key = logistics_track_key(logistics_id)
+    try:
+        trajectory = caches['mall_cache'].get(cache_key)
+        if trajectory is not None:
+            return trajectory
+    except Exception as e:
+        print(f"物流轨迹缓存读取失败: {e}")
+
+    trajectory = [
+        serialize_event(event)
+        for event in LogisticsEvent.objects.filter(logistics_id=logistics_id).order_by('event_time', 'id')
+    ]
+
+    try:
+        caches['mall_cache'].set(cache_key, trajectory, LOGISTICS_TRACK_CACHE_TTL)
+    except Exception as e:
+        print(f"物流轨迹缓存写入失败: {e}")
+    return trajectory
+
+
+def invalidate_trajectories(logistics_ids):
+    """新轨迹写入后清除缓存"""
+    try:
+        caches['mall_cache'].delete_many([logistics_track_key(logistics_id) for logistics_id in logistics_ids])
+    except Exception as e:
+        print(f"物流轨迹缓存清除失败: {e}")
+
+
+def ingest_events(events):
+    """批量写入物流轨迹事件
+
+    events 为字典列表，每项包含 logistics_id、time、status、description，
+    可选 logistics_status（物流状态值，用于同步更新 Logistics.status）。
+    已存在的相同事件（相同时间和描述）会被跳过，承运商重复推送不会产生重复轨迹。
+    返回新写入的事件数量。
+    """
+    valid_statuses = dict(Logistics.LOGISTICS_STATUS_CHOICES)
+    events_by_logistics = {}
+    for item in events:
+        # 承运商推送的状态可能为空或非字符串
+        status = str(item.get('status') or '')
+        event = LogisticsEvent(
+            logistics_id=item['logistics_id'],
+            event_time=parse_event_time(item['time']),
+            status=status[:50],
+            description=str(item.get('description') or status)[:500]
+        )
+        event.logistics_status = item.get('logistics_status')
+        events_by_logistics.setdefault(event.logistics_id, []).append(event)
+
+    if not events_by_logistics:
+        return 0
+
+    # 一次查询取出相关物流单已有事件，过滤重复推送
+    earliest = min(event.event_time for items in events_by_logistics.values() for event in items)
+    existing = set(LogisticsEvent.objects.filter(
+        logistics_id__in=events_by_logistics.keys(),
+        event_time__gte=earliest
+    ).values_list('logistics_id', 'event_time', 'description'))
+
+    new_events = []
+    latest_events = {}
+    for logistics_id, items in events_by_logistics.items():
+        for event in items:
+            event_key = (logistics_id, event.event_time, event.description)
+            if event_key in existing:
+                continue
+            existing.add(event_key)
+            new_events.append(event)
+            latest = latest_events.get(logistics_id)
+            if latest is None or event.event_time >= latest.event_time:
+                latest_events[logistics_id] = event
+
+    if not new_events:
+        return 0
+
+    with transaction.atomic():
+        LogisticsEvent.objects.bulk_create(new_events, batch_size=500)
+
+        # 同步最新状态描述，只更新比当前记录更新的事件
+        for logistics_id, event in latest_events.items():
+            update_data = {'latest_status': event.description[:200], 'updated_at': timezone.now()}
+            if event.logistics_status in valid_statuses:
+                update_data['status'] = event.logistics_status
+            Logistics.objects.filter(id=logistics_id).exclude(
+                events__event_time__gt=event.event_time
+            ).update(**update_data)
+
+    transaction.on_commit(lambda: invalidate_trajectories(list(latest_events.keys())))
+    return len(new_events)
+
+
+def replace_events(logistics_id, events):
+    """替换物流单的全部轨迹（用于模拟轨迹）"""
+    with transaction.atomic():
+        LogisticsEvent.objects.filter(logistics_id=logistics_id).delete()
+        LogisticsEvent.objects.bulk_create([
+            LogisticsEvent(
+                logistics_id=logistics_id,
+                event_time=parse_event_time(item['time']),
+                status=str(item.get('status') or '')[:50],
+                description=str(item.get('description') or '')[:500]
+            )
+            for item in events
+        ])
+    transaction.on_commit(lambda: invalidate_trajectories([logistics_id]))
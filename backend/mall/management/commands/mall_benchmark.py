@@ -0,0 +1,276 @@
+"""商城页面性能基准测试
+
+在独立的测试数据库中生成商品/订单数据，通过测试客户端请求商城主要页面，
+统计每个页面的 SQL 查询次数和耗时（p50/p95），写入 JSON 报告。
+查询次数超过预算或比基准报告增加时命令失败，用于在上线前发现 N+1 查询。
+
+用法：
+    python manage.py mall_benchmark
+    python manage.py mall_benchmark --products 5000 --order-items 100000 --baseline mall_benchmark.json
+"""
+import json
+import subprocess
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import User
+from mall.models import Address, CartItem, Category, Order, OrderItem, Product
+
+
+# 各页面允许的最大查询次数（缓存未命中时）
+QUERY_BUDGETS = {
+    'mall': 40,
+    'product_detail': 30,
+    'mallcart': 20,
+    'checkout': 20,
+    'submit_order': 60,
+    'category_products': 30,
+}
+
+# 批量写入的批次大小
+BATCH_SIZE = 5000
+
+# 每个订单的订单项数量
+ITEMS_PER_ORDER = 10
+
+# 基准用户购物车中的商品数量
+CART_SIZE = 10
+
+
+def percentile(values, pct):
+    """计算百分位数（最近秩法）"""
+    ordered = sorted(values)
+    index = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def current_commit():
+    """获取当前代码版本"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+class Command(BaseCommand):
+    help = '商城页面查询次数与耗时基准测试'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50000, help='生成的商品数量')
+        parser.add_argument('--order-items', type=int, default=1000000, help='生成的订单项数量')
+        parser.add_argument('--repeat', type=int, default=20, help='每个页面的请求次数')
+        parser.add_argument('--output', default='mall_benchmark.json', help='报告输出路径')
+        parser.add_argument('--baseline', help='用于对比的历史报告路径')
+        parser.add_argument('--keepdb', action='store_true', help='保留测试数据库（跳过重复生成数据）')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            # 使用本地内存缓存，避免污染线上 Redis
+            local_caches = {
+                alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'mall-benchmark-{alias}'}
+                for alias in settings.CACHES
+            }
+            with override_settings(CACHES=local_caches):
+                fixtures = self.seed(options['products'], options['order_items'])
+                results = self.run_scenarios(fixtures, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = {
+            'commit': current_commit(),
+            'created_at': timezone.now().isoformat(),
+            'products': options['products'],
+            'order_items': options['order_items'],
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        self.stdout.write(f"报告已写入: {options['output']}")
+
+        failures = self.check_results(results, options.get('baseline'))
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('所有页面查询次数均在预算内'))
+
+    def seed(self, product_count, order_item_count):
+        """生成基准数据"""
+        user = User.objects.filter(username='19900000000').first()
+        if user is None:
+            user = User.objects.create_user(username='19900000000', password='benchmark')
+        if Product.objects.count() >= product_count:
+            # --keepdb 时复用已有数据
+            self.stdout.write('复用已有基准数据')
+        else:
+            self.stdout.write(f'生成 {product_count} 个商品、{order_item_count} 个订单项...')
+            self.seed_catalog(product_count)
+            self.seed_orders(user, order_item_count)
+
+        # 基准用户的购物车和收货地址
+        address = Address.objects.filter(user=user).first() or Address.objects.create(
+            user=user, recipient='基准测试', phone='19900000000', province='北京市',
+            city='北京市', district='朝阳区', detail_address='测试地址', is_default=True
+        )
+        if not CartItem.objects.filter(user=user).exists():
+            CartItem.objects.bulk_create([
+                CartItem(user=user, product=product, quantity=1, selected=True)
+                for product in Product.objects.filter(is_active=True)[:CART_SIZE]
+            ])
+
+        return {
+            'user': user,
+            'address': address,
+            'product': Product.objects.filter(is_active=True).first(),
+            'category': Category.objects.filter(parent__isnull=False).first(),
+        }
+
+    def seed_catalog(self, product_count):
+        """生成分类和商品"""
+        Category.objects.bulk_create([
+            Category(name=f'分类{i}', sort=i) for i in range(20)
+        ])
+        parents = list(Category.objects.filter(parent__isnull=True))
+        Category.objects.bulk_create([
+            Category(name=f'{parent.name}-{j}', parent=parent, sort=j)
+            for parent in parents for j in range(5)
+        ])
+        children = list(Category.objects.filter(parent__isnull=False))
+
+        batch = []
+        for i in range(product_count):
+            price = Decimal(10 + i % 490)
+            batch.append(Product(
+                name=f'基准商品{i}',
+                description=f'基准商品{i}的描述',
+                price=price,
+                old_price=price + 20,
+                category=children[i % len(children)],
+                monthly_sales=i % 1000,
+                product_stock=1000,
+                is_couple_product=i % 10 == 0,
+                is_new=i % 5 == 0,
+            ))
+            if len(batch) >= BATCH_SIZE:
+                Product.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Product.objects.bulk_create(batch)
+
+    def seed_orders(self, user, order_item_count):
+        """生成订单和订单项"""
+        product_ids = list(Product.objects.values_list('id', flat=True)[:5000])
+        order_count = max(order_item_count // ITEMS_PER_ORDER, 1)
+        for start in range(0, order_count, BATCH_SIZE):
+            # 订单号显式指定，默认的时间戳订单号在批量生成时会重复
+            Order.objects.bulk_create([
+                Order(
+                    user=user,
+                    order_number=f'BENCH{i:09d}',
+                    total_amount=Decimal('100.00'),
+                    status='delivered'
+                )
+                for i in range(start, min(start + BATCH_SIZE, order_count))
+            ])
+
+        batch = []
+        for index, order_id in enumerate(Order.objects.filter(user=user).values_list('id', flat=True).iterator()):
+            for j in range(ITEMS_PER_ORDER):
+                batch.append(OrderItem(
+                    order_id=order_id,
+                    product_id=product_ids[(index * ITEMS_PER_ORDER + j) % len(product_ids)],
+                    quantity=1,
+                    price=Decimal('10.00'),
+                    total_price=Decimal('10.00'),
+                ))
+            if len(batch) >= BATCH_SIZE:
+                OrderItem.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            OrderItem.objects.bulk_create(batch)
+
+    def run_scenarios(self, fixtures, repeat):
+        """逐个页面请求并统计查询次数和耗时"""
+        client = Client()
+        client.force_login(fixtures['user'])
+        scenarios = {
+            'mall': lambda: client.get(reverse('mall:mall')),
+            'product_detail': lambda: client.get(reverse('mall:product_detail', args=[fixtures['product'].id])),
+            'mallcart': lambda: client.get(reverse('mall:mallcart')),
+            'checkout': lambda: client.get(reverse('mall:checkout')),
+            'submit_order': lambda: client.post(reverse('mall:submit_order'), {
+                'address_id': fixtures['address'].id,
+                'payment_method': 'wechat',
+            }),
+            'category_products': lambda: client.get(reverse('mall:category_products', args=[fixtures['category'].id])),
+        }
+
+        results = {}
+        for name, request in scenarios.items():
+            query_counts = []
+            timings = []
+            status_code = None
+            for _ in range(repeat):
+                # 每次请求后回滚，保证下单等写操作不影响后续请求
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        response = request()
+                        timings.append((time.perf_counter() - started) * 1000)
+                    transaction.set_rollback(True)
+                # 记录第一个非 200 的状态码
+                if status_code in (None, 200):
+                    status_code = response.status_code
+                query_counts.append(len(queries))
+
+            results[name] = {
+                'status_code': status_code,
+                'queries_cold': query_counts[0],
+                'queries_warm': min(query_counts),
+                'budget': QUERY_BUDGETS[name],
+                'p50_ms': round(percentile(timings, 50), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+            }
+            self.stdout.write(
+                f"{name}: 查询 {query_counts[0]}/{min(query_counts)} 次（冷/热），"
+                f"p50 {results[name]['p50_ms']}ms，p95 {results[name]['p95_ms']}ms"
+            )
+        return results
+
+    def check_results(self, results, baseline_path):
+        """检查查询预算并与基准报告对比"""
+        failures = []
+        for name, result in results.items():
+            # 重定向或报错的页面查询次数没有参考意义
+            if result['status_code'] != 200:
+                failures.append(f"{name}: 响应状态码 {result['status_code']}，应为 200")
+            if result['queries_cold'] > result['budget']:
+                failures.append(f"{name}: 查询 {result['queries_cold']} 次，超过预算 {result['budget']} 次")
+
+        if baseline_path:
+            with open(baseline_path, encoding='utf-8') as f:
+                baseline = json.load(f).get('results', {})
+            for name, result in results.items():
+                previous = baseline.get(name)
+                if not previous:
+                    continue
+                for field in ('queries_cold', 'queries_warm'):
+                    if result[field] > previous[field]:
+                        failures.append(f"{name}: {field} 从 {previous[field]} 增加到 {result[field]}")
+                self.stdout.write(
+                    f"{name}: p95 {previous['p95_ms']}ms -> {result['p95_ms']}ms"
+                )
+        return failures
@@ -0,0 +1,20 @@
+"""重建商品搜索索引
+
+用法：
+    python manage.py rebuild_product_search          # 仅同步有变化的商品
+    python manage.py rebuild_product_search --full   # 重建全部商品
+"""
+from django.core.management.base import BaseCommand
+
+from mall.search import sync_search_index
+
+
+class Command(BaseCommand):
+    help = '重建商品搜索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='重建全部商品的搜索文档')
+
+    def handle(self, *args, **options):
+        count = sync_search_index(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f'已更新 {count} 个商品的搜索文档'))
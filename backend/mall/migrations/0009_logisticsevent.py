@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:00
+
+import json
+
+from datetime import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def copy_trajectory_to_events(apps, schema_editor):
+    """将原有的 JSON 物流轨迹拆分为轨迹事件"""
+    Logistics = apps.get_model('mall', 'Logistics')
+    LogisticsEvent = apps.get_model('mall', 'LogisticsEvent')
+
+    events = []
+    for logistics in Logistics.objects.exclude(trajectory__isnull=True).exclude(trajectory='').iterator():
+        try:
+            trajectory = json.loads(logistics.trajectory)
+        except ValueError:
+            continue
+        # 历史数据格式不一致，只处理字典列表
+        if not isinstance(trajectory, list):
+            continue
+        for item in trajectory:
+            if not isinstance(item, dict):
+                continue
+            try:
+                event_time = timezone.make_aware(datetime.strptime(item['time'], '%Y-%m-%d %H:%M:%S'))
+            except (KeyError, TypeError, ValueError):
+                event_time = logistics.updated_at
+            events.append(LogisticsEvent(
+                logistics_id=logistics.id,
+                event_time=event_time,
+                status=str(item.get('status') or '')[:50],
+                description=str(item.get('description') or '')[:500],
+            ))
+        if len(events) >= 1000:
+            LogisticsEvent.objects.bulk_create(events)
+            events = []
+    if events:
+        LogisticsEvent.objects.bulk_create(events)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mall', '0008_alter_order_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogisticsEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_time', models.DateTimeField(verbose_name='事件时间')),
+                ('status', models.CharField(max_length=50, verbose_name='轨迹状态')),
+                ('description', models.CharField(max_length=500, verbose_name='轨迹描述')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('logistics', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='mall.logistics', verbose_name='物流信息')),
+            ],
+            options={
+                'verbose_name': '物流轨迹',
+                'verbose_name_plural': '物流轨迹',
+                'ordering': ['event_time', 'id'],
+                'indexes': [models.Index(fields=['logistics', 'event_time'], name='mall_logist_logisti_5dcc80_idx')],
+            },
+        ),
+        migrations.RunPython(copy_trajectory_to_events, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='logistics',
+            name='trajectory',
+        ),
+    ]
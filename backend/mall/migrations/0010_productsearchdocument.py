@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_search_documents(apps, schema_editor):
+    """为已有商品生成搜索文档"""
+    Product = apps.get_model('mall', 'Product')
+    ProductTagRelation = apps.get_model('mall', 'ProductTagRelation')
+    ProductSearchDocument = apps.get_model('mall', 'ProductSearchDocument')
+
+    tag_names = {}
+    for product_id, tag_name in ProductTagRelation.objects.filter(
+        tag__is_active=True
+    ).values_list('product_id', 'tag__name'):
+        tag_names.setdefault(product_id, []).append(tag_name)
+
+    documents = []
+    for product in Product.objects.values(
+        'id', 'name', 'description', 'price', 'category_id', 'is_active'
+    ).iterator():
+        documents.append(ProductSearchDocument(
+            product_id=product['id'],
+            name=product['name'],
+            content='\n'.join([
+                product['name'] or '',
+                ' '.join(tag_names.get(product['id'], [])),
+                product['description'] or ''
+            ]),
+            price=product['price'],
+            category_id=product['category_id'],
+            is_active=product['is_active']
+        ))
+        if len(documents) >= 1000:
+            ProductSearchDocument.objects.bulk_create(documents)
+            documents = []
+    if documents:
+        ProductSearchDocument.objects.bulk_create(documents)
+
+
+def add_fulltext_index(apps, schema_editor):
+    """content 字段建立 ngram 全文索引（仅 MySQL）"""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE mall_productsearchdocument '
+        'ADD FULLTEXT INDEX mall_productsearch_content_ft (content) WITH PARSER ngram'
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute('ALTER TABLE mall_productsearchdocument DROP INDEX mall_productsearch_content_ft')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mall', '0009_logisticsevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='mall.product', verbose_name='商品')),
+                ('name', models.CharField(db_index=True, max_length=200, verbose_name='商品名称')),
+                ('content', models.TextField(verbose_name='搜索内容')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='商品价格')),
+                ('is_active', models.BooleanField(default=True, verbose_name='是否上架')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='索引时间')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='mall.category', verbose_name='商品类别')),
+            ],
+            options={
+                'verbose_name': '商品搜索索引',
+                'verbose_name_plural': '商品搜索索引',
+                'indexes': [models.Index(fields=['is_active', 'category', 'price'], name='mall_produc_is_acti_c4157d_idx')],
+            },
+        ),
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(build_search_documents, migrations.RunPython.noop),
+    ]
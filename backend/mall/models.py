@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
 import uuid
 from django.utils import timezone
 from core.models import User
@@ -454,7 +456,6 @@ class Logistics(models.Model):
     logistics_no = models.CharField(max_length=50, verbose_name='物流单号')
     status = models.CharField(max_length=20, choices=LOGISTICS_STATUS_CHOICES, default='pending', verbose_name='物流状态')
     latest_status = models.CharField(max_length=200, blank=True, null=True, verbose_name='最新状态描述')
-    trajectory = models.TextField(blank=True, null=True, verbose_name='物流轨迹')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
 
@@ -466,6 +467,26 @@ class Logistics(models.Model):
         verbose_name_plural = '物流信息'
 
 
+class LogisticsEvent(models.Model):
+    """物流轨迹事件模型（只追加）"""
+    logistics = models.ForeignKey(Logistics, on_delete=models.CASCADE, related_name='events', verbose_name='物流信息')
+    event_time = models.DateTimeField(verbose_name='事件时间')
+    status = models.CharField(max_length=50, verbose_name='轨迹状态')
+    description = models.CharField(max_length=500, verbose_name='轨迹描述')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+
+    def __str__(self):
+        return f'{self.logistics.logistics_no} - {self.status}'
+
+    class Meta:
+        verbose_name = '物流轨迹'
+        verbose_name_plural = '物流轨迹'
+        ordering = ['event_time', 'id']
+        indexes = [
+            models.Index(fields=['logistics', 'event_time']),
+        ]
+
+
 class ProductMark(models.Model):
     """商品收藏模型"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='product_marks', verbose_name='用户')
@@ -530,6 +551,33 @@ class ProductTagRelation(models.Model):
         unique_together = ('product', 'tag')
 
 
+class ProductSearchDocument(models.Model):
+    """商品搜索文档（名称、描述、标签合并后建立全文索引）"""
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+        verbose_name='商品'
+    )
+    name = models.CharField(max_length=200, db_index=True, verbose_name='商品名称')
+    content = models.TextField(verbose_name='搜索内容')
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='商品价格')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='商品类别')
+    is_active = models.BooleanField(default=True, verbose_name='是否上架')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='索引时间')
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = '商品搜索索引'
+        verbose_name_plural = '商品搜索索引'
+        indexes = [
+            models.Index(fields=['is_active', 'category', 'price']),
+        ]
+
+
 class UserBehavior(models.Model):
     """用户行为记录模型"""
     BEHAVIOR_TYPE_CHOICES = (
@@ -635,3 +683,104 @@ class RefundApplication(models.Model):
         verbose_name = '退款申请'
         verbose_name_plural = '退款申请'
         ordering = ['-created_at']
+
+
+# 信号处理函数
+@receiver(post_save, sender=FlashSale)
+@receiver(post_delete, sender=FlashSale)
+@receiver(post_save, sender=FlashSaleProduct)
+@receiver(post_delete, sender=FlashSaleProduct)
+def bump_flash_sale_cache_version(sender, instance, **kwargs):
+    """秒杀活动或活动商品变化时递增活动缓存版本号"""
+    # 仅扣减秒杀库存时不影响活动缓存
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) == {'flash_stock'}:
+        return
+    from .flash_sale_cache import clear_flash_sale_cache
+    clear_flash_sale_cache()
+
+
+@receiver(post_save, sender=ProductTagRelation)
+@receiver(post_delete, sender=ProductTagRelation)
+def reindex_tagged_product(sender, instance, **kwargs):
+    """商品标签变化时更新商品搜索索引"""
+    from .search import index_products
+    product_id = instance.product_id
+    transaction.on_commit(lambda: index_products([product_id]))
+
+
+@receiver(post_save, sender=ProductTag)
+def reindex_tag_products(sender, instance, created, **kwargs):
+    """标签名称或状态变化时更新相关商品的搜索索引"""
+    if created:
+        return
+    from .search import index_products
+    product_ids = list(instance.products.values_list('product_id', flat=True))
+    if product_ids:
+        transaction.on_commit(lambda: index_products(product_ids))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_card(sender, instance, **kwargs):
+    """商品变化时清除商品卡片缓存"""
+    from .product_cards import invalidate_product_cards
+    invalidate_product_cards([instance.pk])
+
+
+@receiver(post_save, sender=ProductMark)
+def add_to_user_marks(sender, instance, created, **kwargs):
+    """收藏后更新用户收藏集合缓存"""
+    if not created:
+        return
+    from .product_marks import add_mark
+    user_id, product_id = instance.user_id, instance.product_id
+    transaction.on_commit(lambda: add_mark(user_id, product_id))
+
+
+@receiver(post_delete, sender=ProductMark)
+def remove_from_user_marks(sender, instance, **kwargs):
+    """取消收藏后更新用户收藏集合缓存"""
+    from .product_marks import remove_mark
+    user_id, product_id = instance.user_id, instance.product_id
+    transaction.on_commit(lambda: remove_mark(user_id, product_id))
+
+
+@receiver(post_save, sender=HomeBanner)
+@receiver(post_delete, sender=HomeBanner)
+def bump_home_banners(sender, instance, **kwargs):
+    """轮播图变化时使首页轮播图板块缓存失效"""
+    from .home_bundle import bump_section
+    transaction.on_commit(lambda: bump_section('banners'))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_home_categories(sender, instance, **kwargs):
+    """分类变化时使首页分类板块缓存失效"""
+    from .home_bundle import bump_section
+    transaction.on_commit(lambda: bump_section('categories'))
+
+
+@receiver(post_init, sender=Product)
+def remember_couple_product_flag(sender, instance, **kwargs):
+    """记录加载时的情侣款标记，保存时判断标记是否被取消（延迟加载的字段不触发查询）"""
+    instance._was_couple_product = instance.__dict__.get('is_couple_product')
+
+
+@receiver(post_save, sender=Product)
+def bump_home_couple_products(sender, instance, **kwargs):
+    """情侣款商品变化（包括取消情侣款标记）时使首页情侣款板块缓存失效"""
+    was_couple_product = getattr(instance, '_was_couple_product', None)
+    if not instance.is_couple_product and was_couple_product is False:
+        return
+    instance._was_couple_product = instance.is_couple_product
+    from .home_bundle import bump_section
+    transaction.on_commit(lambda: bump_section('couple_products'))
+
+
+@receiver(post_delete, sender=Product)
+def bump_home_couple_products_on_delete(sender, instance, **kwargs):
+    """删除商品时使首页情侣款板块缓存失效（内存中的标记可能已被修改，不按标记判断）"""
+    from .home_bundle import bump_section
+    transaction.on_commit(lambda: bump_section('couple_products'))
@@ -0,0 +1,74 @@
+"""支付回调幂等处理
+
+支付网关会频繁重试回调通知，同一笔交易的重复通知先通过 Redis SETNX（cache.add）去重，
+不触及订单表；首次通知再通过带状态条件的 UPDATE 完成支付单和订单的状态流转，
+即使缓存不可用，重复通知也只会命中 0 行，不会重复写入。
+"""
+import os
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, Payment
+
+
+# 回调去重标记保留时间（秒），覆盖网关的重试周期
+PAYMENT_NOTIFY_DEDUPE_TTL = int(os.getenv('PAYMENT_NOTIFY_DEDUPE_TTL', 86400))
+
+
+def generate_transaction_id():
+    """生成模拟的第三方交易号"""
+    return f"TRX{int(timezone.now().timestamp())}{uuid.uuid4().hex[:8].upper()}"
+
+
+def notify_dedupe_key(idempotency_key):
+    """支付回调去重键"""
+    return f'payment_notify:{idempotency_key}'
+
+
+def claim_notification(idempotency_key):
+    """登记支付回调，返回 False 表示重复通知
+
+    缓存不可用时放行，由条件更新保证幂等
+    """
+    try:
+        return caches['mall_cache'].add(notify_dedupe_key(idempotency_key), 1, PAYMENT_NOTIFY_DEDUPE_TTL)
+    except Exception as e:
+        print(f"支付回调去重失败: {e}")
+        return True
+
+
+def release_notification(idempotency_key):
+    """处理失败时清除去重标记，允许网关重试"""
+    try:
+        caches['mall_cache'].delete(notify_dedupe_key(idempotency_key))
+    except Exception as e:
+        print(f"支付回调去重标记清除失败: {e}")
+
+
+def mark_payment_success(payment_id, order_id, method, transaction_id):
+    """支付成功状态流转，返回 False 表示状态已变更（重复处理）"""
+    now = timezone.now()
+    with transaction.atomic():
+        # 只有待支付的支付单才会被更新
+        updated = Payment.objects.filter(id=payment_id, status='pending').update(
+            status='success',
+            transaction_id=transaction_id,
+            paid_at=now
+        )
+        if not updated:
+            return False
+
+        # 只有待付款的订单才会被更新
+        updated = Order.objects.filter(id=order_id, status='pending').update(
+            status='paid',
+            paid_at=now,
+            payment_method=method
+        )
+        if not updated:
+            # 订单已取消或已支付，回滚支付单状态
+            transaction.set_rollback(True)
+            return False
+    return True
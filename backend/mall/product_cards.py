@@ -0,0 +1,85 @@
+"""商品卡片投影缓存
+
+列表页展示的商品信息（名称、价格、折扣、评分、主图地址等）按商品预先序列化为一条卡片记录，
+缓存在 mall_cache 中（product_card:{商品ID}），商品变化时清除。
+列表页只需查询商品ID，再通过一次 get_many（MGET）取出全部卡片；
+用户收藏状态不写入卡片，在请求时通过 apply_marks 叠加（收藏集合见 product_marks）。
+"""
+import os
+
+from django.core.cache import caches
+
+from .models import Product
+
+
+# 商品卡片缓存时间（秒）
+PRODUCT_CARD_CACHE_TTL = int(os.getenv('PRODUCT_CARD_CACHE_TTL', 86400))
+
+
+def product_card_key(product_id):
+    """商品卡片缓存键"""
+    return f'product_card:{product_id}'
+
+
+def build_product_card(product):
+    """构建商品卡片"""
+    if product.old_price > product.price:
+        discount = int((1 - product.price / product.old_price) * 100)
+    else:
+        discount = 0
+    return {
+        'id': str(product.id),
+        'name': product.name,
+        'price': product.price,
+        'old_price': product.old_price,
+        'discount': discount,
+        'rating': product.rating,
+        'is_new': product.is_new,
+        'image_url': product.main_image.url if product.main_image else '',
+    }
+
+
+def get_product_cards(product_ids):
+    """批量获取商品卡片，按传入的ID顺序返回（已删除的商品会被跳过）"""
+    product_ids = [str(product_id) for product_id in product_ids]
+    if not product_ids:
+        return []
+
+    keys = {product_id: product_card_key(product_id) for product_id in product_ids}
+    cards = {}
+    try:
+        cached = caches['mall_cache'].get_many(list(keys.values()))
+        cards = {product_id: cached[key] for product_id, key in keys.items() if key in cached}
+    except Exception as e:
+        print(f"商品卡片缓存读取失败: {e}")
+
+    missing_ids = [product_id for product_id in product_ids if product_id not in cards]
+    if missing_ids:
+        built = {}
+        for product in Product.objects.filter(id__in=missing_ids):
+            card = build_product_card(product)
+            built[card['id']] = card
+        cards.update(built)
+
+        try:
+            caches['mall_cache'].set_many(
+                {product_card_key(product_id): card for product_id, card in built.items()},
+                PRODUCT_CARD_CACHE_TTL
+            )
+        except Exception as e:
+            print(f"商品卡片缓存写入失败: {e}")
+
+    return [cards[product_id] for product_id in product_ids if product_id in cards]
+
+
+def invalidate_product_cards(product_ids):
+    """商品变化时清除卡片缓存"""
+    try:
+        caches['mall_cache'].delete_many([product_card_key(product_id) for product_id in product_ids])
+    except Exception as e:
+        print(f"商品卡片缓存清除失败: {e}")
+
+
+def apply_marks(cards, marked_ids, **overrides):
+    """在卡片上叠加用户收藏状态（返回新的字典，不修改缓存数据）"""
+    return [dict(card, is_marked=card['id'] in marked_ids, **overrides) for card in cards]
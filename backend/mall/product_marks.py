@@ -0,0 +1,122 @@
+"""用户收藏商品集合缓存
+
+每个用户收藏的商品ID保存在 Redis 集合 user_marks:{用户ID} 中（Redis 原生键），
+集合中额外保存一个占位成员，用于区分“未加载”和“没有收藏”。
+收藏/取消收藏时由 ProductMark 信号增量更新集合，页面的收藏状态和收藏数量都从集合读取。
+Redis 不可用时回退到数据库查询。
+"""
+import os
+
+from django_redis import get_redis_connection
+
+from .models import ProductMark
+
+
+# 收藏集合缓存时间（秒）
+USER_MARKS_CACHE_TTL = int(os.getenv('USER_MARKS_CACHE_TTL', 86400))
+
+# 占位成员（已加载标记）
+LOADED_MEMBER = '-'
+
+# 集合已加载时才增量更新，避免生成缺少其他收藏的不完整集合
+_UPDATE_IF_LOADED = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call(ARGV[1], KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def user_marks_key(user_id):
+    """用户收藏集合键"""
+    return f'user_marks:{user_id}'
+
+
+def _load_marks(redis_conn, user_id):
+    """从数据库加载用户收藏集合"""
+    marked_ids = {
+        str(product_id)
+        for product_id in ProductMark.objects.filter(user_id=user_id).values_list('product_id', flat=True)
+    }
+    key = user_marks_key(user_id)
+    pipe = redis_conn.pipeline()
+    pipe.delete(key)
+    pipe.sadd(key, LOADED_MEMBER, *marked_ids)
+    pipe.expire(key, USER_MARKS_CACHE_TTL)
+    pipe.execute()
+    return marked_ids
+
+
+def get_marked_ids(user_id):
+    """获取用户收藏的商品ID集合（字符串形式）"""
+    try:
+        redis_conn = get_redis_connection('mall_cache')
+        members = redis_conn.smembers(user_marks_key(user_id))
+        if members:
+            return {member.decode() for member in members} - {LOADED_MEMBER}
+        return _load_marks(redis_conn, user_id)
+    except Exception as e:
+        print(f"收藏集合缓存读取失败: {e}")
+        return {
+            str(product_id)
+            for product_id in ProductMark.objects.filter(user_id=user_id).values_list('product_id', flat=True)
+        }
+
+
+def is_marked(user_id, product_id):
+    """判断用户是否收藏了商品"""
+    try:
+        redis_conn = get_redis_connection('mall_cache')
+        key = user_marks_key(user_id)
+        pipe = redis_conn.pipeline()
+        pipe.exists(key)
+        pipe.sismember(key, str(product_id))
+        loaded, marked = pipe.execute()
+        if loaded:
+            return bool(marked)
+        return str(product_id) in _load_marks(redis_conn, user_id)
+    except Exception as e:
+        print(f"收藏集合缓存读取失败: {e}")
+        return ProductMark.objects.filter(user_id=user_id, product_id=product_id).exists()
+
+
+def get_mark_count(user_id):
+    """获取用户收藏数量"""
+    try:
+        redis_conn = get_redis_connection('mall_cache')
+        count = redis_conn.scard(user_marks_key(user_id))
+        if count:
+            # 减去占位成员
+            return count - 1
+        return len(_load_marks(redis_conn, user_id))
+    except Exception as e:
+        print(f"收藏集合缓存读取失败: {e}")
+        return ProductMark.objects.filter(user_id=user_id).count()
+
+
+def _update_marks(command, user_id, product_id):
+    """增量更新已加载的收藏集合"""
+    try:
+        redis_conn = get_redis_connection('mall_cache')
+        redis_conn.eval(_UPDATE_IF_LOADED, 1, user_marks_key(user_id), command, str(product_id))
+    except Exception as e:
+        print(f"收藏集合缓存更新失败: {e}")
+        invalidate_marks(user_id)
+
+
+def add_mark(user_id, product_id):
+    """收藏后加入集合"""
+    _update_marks('sadd', user_id, product_id)
+
+
+def remove_mark(user_id, product_id):
+    """取消收藏后移出集合"""
+    _update_marks('srem', user_id, product_id)
+
+
+def invalidate_marks(user_id):
+    """清除用户收藏集合，下次读取时重新加载"""
+    try:
+        get_redis_connection('mall_cache').delete(user_marks_key(user_id))
+    except Exception as e:
+        print(f"收藏集合缓存清除失败: {e}")
@@ -0,0 +1,181 @@
+"""退款处理
+
+退款申请审核通过后由 Celery 任务异步调用支付渠道退款，接口立即返回：
+    pending（待审核） -> approved（审核通过，已排队） -> refunded（已退款）
+渠道调用失败时任务按指数退避重试；定时对账任务修复状态不一致的记录并重新排队超时未完成的退款。
+状态变化通过站内业务消息通知用户。
+"""
+import os
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from message.models import Message
+from .models import Order, Payment, RefundApplication
+
+
+# 退款任务最大重试次数
+REFUND_MAX_RETRIES = int(os.getenv('REFUND_MAX_RETRIES', 5))
+
+# 审核通过后超过该时间（秒）仍未完成的退款会被对账任务重新排队
+REFUND_RECONCILE_AFTER = int(os.getenv('REFUND_RECONCILE_AFTER', 1800))
+
+# 对账任务每次重新排队的最大数量
+REFUND_RECONCILE_BATCH_SIZE = 500
+
+
+class RefundGatewayError(Exception):
+    """支付渠道退款失败（可重试）"""
+
+
+def call_refund_gateway(payment, refund_amount, refund_request_no):
+    """调用支付渠道退款接口，返回退款交易号
+
+    refund_request_no 对同一申请保持不变，渠道据此对重试请求去重；
+    渠道暂时不可用时应抛出 RefundGatewayError 以触发重试。
+    """
+    # 模拟渠道退款
+    return f"RFD{int(timezone.now().timestamp())}{uuid.uuid4().hex[:8].upper()}"
+
+
+def notify_refund_status(application_id, user_id, order_id, content):
+    """发送退款状态业务消息"""
+    try:
+        Message.objects.create(
+            user_id=user_id,
+            type='business',
+            content=content,
+            related_id=order_id
+        )
+    except Exception as e:
+        print(f"退款状态通知失败: {application_id} {e}")
+
+
+def enqueue_refund(application_id):
+    """提交后排队处理退款"""
+    from .tasks import process_refund
+    transaction.on_commit(lambda: process_refund.delay(application_id))
+
+
+def approve_refund(application):
+    """审核通过退款申请并排队处理，返回 False 表示申请状态已变更"""
+    updated = RefundApplication.objects.filter(id=application.id, status='pending').update(
+        status='approved',
+        updated_at=timezone.now()
+    )
+    if not updated:
+        return False
+    enqueue_refund(application.id)
+    notify_refund_status(
+        application.id, application.user_id, application.order_id,
+        f'您的订单退款申请已审核通过，退款 ¥{application.refund_amount} 正在处理中'
+    )
+    return True
+
+
+def reject_refund(application, remark=None):
+    """拒绝退款申请并恢复订单状态"""
+    with transaction.atomic():
+        updated = RefundApplication.objects.filter(id=application.id, status='pending').update(
+            status='rejected',
+            remark=remark,
+            updated_at=timezone.now()
+        )
+        if not updated:
+            return False
+        # 订单没有其他进行中的申请时恢复为已付款
+        has_active = RefundApplication.objects.filter(
+            order_id=application.order_id,
+            status__in=['pending', 'approved']
+        ).exists()
+        if not has_active:
+            Order.objects.filter(id=application.order_id, status='refunding').update(status='paid')
+    notify_refund_status(
+        application.id, application.user_id, application.order_id,
+        f'您的订单退款申请未通过审核{"：" + remark if remark else ""}'
+    )
+    return True
+
+
+def execute_refund(application_id):
+    """执行退款（由 process_refund 任务调用，可重复执行）"""
+    application = RefundApplication.objects.filter(id=application_id, status='approved').first()
+    if application is None:
+        return False
+
+    payment = Payment.objects.filter(
+        order_id=application.order_id,
+        status='success'
+    ).order_by('-paid_at').first()
+    if payment is None:
+        # 支付单可能已退款（重复执行），同步申请和订单状态
+        reconcile_refund_statuses(order_ids=[application.order_id])
+        return False
+
+    refund_transaction_id = call_refund_gateway(payment, application.refund_amount, f'REFUND{application.id}')
+    now = timezone.now()
+    with transaction.atomic():
+        updated = Payment.objects.filter(id=payment.id, status='success').update(
+            status='refunded',
+            refund_amount=application.refund_amount,
+            refund_transaction_id=refund_transaction_id,
+            refunded_at=now
+        )
+        if not updated:
+            return False
+        RefundApplication.objects.filter(id=application.id, status='approved').update(
+            status='refunded',
+            updated_at=now
+        )
+        Order.objects.filter(id=application.order_id, status='refunding').update(status='refunded')
+
+    notify_refund_status(
+        application.id, application.user_id, application.order_id,
+        f'您的订单退款 ¥{application.refund_amount} 已原路退回'
+    )
+    return True
+
+
+def reconcile_refund_statuses(order_ids=None):
+    """批量修复支付单已退款但申请/订单状态未更新的记录"""
+    now = timezone.now()
+    payments = Payment.objects.filter(status='refunded')
+    if order_ids is not None:
+        payments = payments.filter(order_id__in=order_ids)
+    refunded_order_ids = payments.values('order_id')
+    applications = RefundApplication.objects.filter(status='approved', order_id__in=refunded_order_ids).update(
+        status='refunded',
+        updated_at=now
+    )
+    orders = Order.objects.filter(status='refunding', id__in=refunded_order_ids).update(status='refunded')
+    return applications, orders
+
+
+def requeue_stale_refunds():
+    """重新排队审核通过后超时仍未完成的退款，返回排队数量"""
+    now = timezone.now()
+    stale_ids = list(RefundApplication.objects.filter(
+        status='approved',
+        updated_at__lt=now - timedelta(seconds=REFUND_RECONCILE_AFTER)
+    ).order_by('updated_at').values_list('id', flat=True)[:REFUND_RECONCILE_BATCH_SIZE])
+    if not stale_ids:
+        return 0
+
+    # 刷新更新时间，避免下一轮对账重复排队
+    RefundApplication.objects.filter(id__in=stale_ids, status='approved').update(updated_at=now)
+    from .tasks import process_refund
+    for application_id in stale_ids:
+        process_refund.delay(application_id)
+    return len(stale_ids)
+
+
+def notify_refund_failed(application_id):
+    """重试耗尽后通知用户退款延迟（申请保持审核通过，由对账任务稍后重试）"""
+    application = RefundApplication.objects.filter(id=application_id, status='approved').first()
+    if application is not None:
+        notify_refund_status(
+            application.id, application.user_id, application.order_id,
+            '您的订单退款处理延迟，系统将自动重试，请耐心等待'
+        )
@@ -0,0 +1,6 @@
+from django.urls import path
+from mall.consumers import FlashSaleConsumer
+
+websocket_urlpatterns = [
+    path('ws/mall/flash-sale/', FlashSaleConsumer.as_asgi()),
+]
@@ -0,0 +1,162 @@
+"""商品搜索
+
+每个商品的名称、描述和标签合并为一条 ProductSearchDocument，
+content 字段在 MySQL 中建立 ngram 全文索引（见迁移 0010），按相关度排序返回结果；
+name 字段建立普通索引，用于前缀联想。
+索引由定时任务按商品更新时间增量同步，标签变化时通过信号立即更新。
+"""
+import os
+import re
+
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Case, F, Q, When
+from django.db.models.expressions import RawSQL
+
+from .models import Product, ProductSearchDocument, ProductTagRelation
+
+
+# 单次搜索最多返回的商品数量
+SEARCH_RESULT_LIMIT = int(os.getenv('PRODUCT_SEARCH_RESULT_LIMIT', 500))
+
+# 搜索联想缓存时间（秒）
+AUTOCOMPLETE_CACHE_TTL = int(os.getenv('PRODUCT_AUTOCOMPLETE_CACHE_TTL', 60))
+
+# ngram 分词长度（MySQL 默认 ngram_token_size=2），更短的关键词无法命中全文索引
+NGRAM_TOKEN_SIZE = 2
+
+# 同步索引时每批处理的商品数量
+INDEX_BATCH_SIZE = 1000
+
+
+def build_search_content(name, description, tag_names):
+    """合并商品名称、描述和标签作为全文索引内容"""
+    return '\n'.join([name or '', ' '.join(tag_names), description or ''])
+
+
+def index_products(product_ids):
+    """重建指定商品的搜索文档"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0
+
+    products = Product.objects.filter(id__in=product_ids).values(
+        'id', 'name', 'description', 'price', 'category_id', 'is_active'
+    )
+    tag_names = {}
+    for product_id, tag_name in ProductTagRelation.objects.filter(
+        product_id__in=product_ids,
+        tag__is_active=True
+    ).values_list('product_id', 'tag__name'):
+        tag_names.setdefault(product_id, []).append(tag_name)
+
+    documents = [
+        ProductSearchDocument(
+            product_id=product['id'],
+            name=product['name'],
+            content=build_search_content(product['name'], product['description'], tag_names.get(product['id'], [])),
+            price=product['price'],
+            category_id=product['category_id'],
+            is_active=product['is_active']
+        )
+        for product in products
+    ]
+
+    with transaction.atomic():
+        ProductSearchDocument.objects.filter(product_id__in=product_ids).delete()
+        ProductSearchDocument.objects.bulk_create(documents)
+    return len(documents)
+
+
+def sync_search_index(full=False):
+    """增量同步搜索索引：处理没有搜索文档或文档早于商品更新时间的商品"""
+    queryset = Product.objects.all()
+    if not full:
+        queryset = queryset.filter(
+            Q(search_document__isnull=True) | Q(updated_at__gt=F('search_document__updated_at'))
+        )
+
+    total = 0
+    batch = []
+    for product_id in queryset.values_list('id', flat=True).iterator():
+        batch.append(product_id)
+        if len(batch) >= INDEX_BATCH_SIZE:
+            total += index_products(batch)
+            batch = []
+    if batch:
+        total += index_products(batch)
+    return total
+
+
+def _split_terms(keyword):
+    """拆分关键词并去掉全文检索的布尔运算符"""
+    return [term for term in re.split(r'\s+', re.sub(r'[+\-<>()~*"@]', ' ', keyword)) if term]
+
+
+def _ranked_document_ids(documents, keyword):
+    """按相关度返回匹配的商品ID"""
+    terms = _split_terms(keyword)
+    if not terms:
+        return []
+
+    if connection.vendor == 'mysql' and all(len(term) >= NGRAM_TOKEN_SIZE for term in terms):
+        # 布尔模式要求每个词都以短语形式出现，自然语言模式计算相关度
+        boolean_query = ' '.join(f'+"{term}"' for term in terms)
+        documents = documents.annotate(
+            score=RawSQL('MATCH(content) AGAINST (%s IN NATURAL LANGUAGE MODE)', (keyword,))
+        ).extra(
+            where=['MATCH(content) AGAINST (%s IN BOOLEAN MODE)'],
+            params=[boolean_query]
+        ).order_by('-score', '-product__monthly_sales')
+    else:
+        # 单字关键词无法使用全文索引，退化为模糊匹配
+        for term in terms:
+            documents = documents.filter(content__icontains=term)
+        documents = documents.order_by('-product__monthly_sales')
+
+    return list(documents.values_list('product_id', flat=True)[:SEARCH_RESULT_LIMIT])
+
+
+def search_products(keyword, category_id=None, min_price=None, max_price=None):
+    """搜索商品，返回按相关度排序的商品查询集"""
+    documents = ProductSearchDocument.objects.filter(is_active=True)
+    if category_id:
+        documents = documents.filter(category_id=category_id)
+    if min_price is not None:
+        documents = documents.filter(price__gte=min_price)
+    if max_price is not None:
+        documents = documents.filter(price__lte=max_price)
+
+    product_ids = _ranked_document_ids(documents, keyword)
+    if not product_ids:
+        return Product.objects.none()
+
+    # 保持相关度顺序
+    ordering = Case(*[When(id=product_id, then=position) for position, product_id in enumerate(product_ids)])
+    return Product.objects.filter(id__in=product_ids, is_active=True).order_by(ordering)
+
+
+def autocomplete(prefix, limit=10):
+    """商品名称前缀联想"""
+    prefix = prefix.strip()[:50]
+    if not prefix:
+        return []
+
+    cache_key = f'product_autocomplete:{prefix.lower()}:{limit}'
+    try:
+        suggestions = caches['mall_cache'].get(cache_key)
+        if suggestions is not None:
+            return suggestions
+    except Exception as e:
+        print(f"搜索联想缓存读取失败: {e}")
+
+    suggestions = list(ProductSearchDocument.objects.filter(
+        is_active=True,
+        name__istartswith=prefix
+    ).order_by('-product__monthly_sales').values_list('name', flat=True)[:limit])
+
+    try:
+        caches['mall_cache'].set(cache_key, suggestions, AUTOCOMPLETE_CACHE_TTL)
+    except Exception as e:
+        print(f"搜索联想缓存写入失败: {e}")
+    return suggestions
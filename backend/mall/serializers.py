@@ -6,6 +6,7 @@ from .models import (
     ProductMark, HomeBanner, ProductTag, ProductTagRelation, UserBehavior, RefundApplication
 )
 from core.serializers import UserSerializer
+from .logistics import get_trajectory
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -223,11 +224,16 @@ class UserCouponSerializer(serializers.ModelSerializer):
 class LogisticsSerializer(serializers.ModelSerializer):
     """物流信息序列化器"""
     order = serializers.SerializerMethodField()
+    trajectory = serializers.SerializerMethodField()
 
     def get_order(self, obj):
         """获取订单信息"""
         return obj.order.order_number
 
+    def get_trajectory(self, obj):
+        """获取物流轨迹（读取轨迹缓存）"""
+        return get_trajectory(obj.id)
+
     class Meta:
         model = Logistics
         fields = [
@@ -0,0 +1,158 @@
+"""商城异步任务"""
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from celery import shared_task
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .consumers import FLASH_SALE_GROUP
+from .flash_sale_cache import (
+    activity_cache_key, activity_cache_ttl, bump_activity_version, build_current_flash_sales,
+    build_flash_sale_page, flash_meta_key, flash_stock_key
+)
+from .models import FlashSale, FlashSaleProduct
+from .refunds import (
+    REFUND_MAX_RETRIES, RefundGatewayError, execute_refund, notify_refund_failed,
+    reconcile_refund_statuses, requeue_stale_refunds
+)
+from .search import sync_search_index
+
+
+def prewarm_marker_key(flash_sale):
+    """预热标记键，活动开始时间变化后可重新预热"""
+    return f'flash_sale:prewarm:{flash_sale.id}:{int(flash_sale.start_time.timestamp())}'
+
+
+@shared_task
+def prewarm_flash_sales():
+    """预热即将开始的秒杀活动（由 celery beat 定时调用）
+
+    预加载活动信息和秒杀库存计数器，并在活动开始时间调度缓存切换任务
+    """
+    now = timezone.now()
+    lead_time = timedelta(seconds=settings.FLASH_SALE_PREWARM_LEAD_SECONDS)
+    upcoming_sales = FlashSale.objects.filter(
+        status=True,
+        start_time__gt=now,
+        start_time__lte=now + lead_time
+    )
+
+    redis_conn = get_redis_connection('mall_cache')
+    for flash_sale in upcoming_sales:
+        # 每场活动只预热一次
+        expire_seconds = int((flash_sale.end_time - now).total_seconds()) + 60
+        if expire_seconds <= 0:
+            continue
+        if not redis_conn.set(prewarm_marker_key(flash_sale), 1, nx=True, ex=expire_seconds):
+            continue
+
+        # 预加载活动信息
+        pipe = redis_conn.pipeline()
+        meta_key = flash_meta_key(flash_sale.id)
+        pipe.hset(meta_key, mapping={
+            'name': flash_sale.name,
+            'start_time': flash_sale.start_time.isoformat(),
+            'end_time': flash_sale.end_time.isoformat(),
+            'is_vip_only': int(flash_sale.is_vip_only),
+        })
+        pipe.expire(meta_key, expire_seconds)
+
+        # 预加载秒杀库存计数器
+        stocks = dict(FlashSaleProduct.objects.filter(
+            flash_sale=flash_sale
+        ).values_list('product_id', 'flash_stock'))
+        stock_key = flash_stock_key(flash_sale.id)
+        pipe.delete(stock_key)
+        if stocks:
+            pipe.hset(stock_key, mapping={str(product_id): stock for product_id, stock in stocks.items()})
+            pipe.expire(stock_key, expire_seconds)
+        pipe.execute()
+
+        # 活动开始时切换缓存
+        activate_flash_sale.apply_async(
+            args=[flash_sale.id, flash_sale.start_time.timestamp()],
+            eta=flash_sale.start_time
+        )
+        print(f"秒杀活动已预热: {flash_sale.name}")
+
+
+@shared_task
+def activate_flash_sale(flash_sale_id, expected_start=None):
+    """秒杀活动开始：写入新版本活动缓存并推送开始通知
+
+    expected_start 为调度时的活动开始时间戳，活动改期后旧的调度任务直接返回
+    """
+    flash_sale = FlashSale.objects.filter(id=flash_sale_id, status=True).first()
+    if flash_sale is None:
+        return
+
+    now = timezone.now()
+    if expected_start is not None and flash_sale.start_time.timestamp() != expected_start:
+        return
+    if flash_sale.start_time > now:
+        return
+
+    # 先查询好数据，再切换版本，避免切换后出现缓存空窗
+    home_data = {is_vip: build_current_flash_sales(now, is_vip) for is_vip in (False, True)}
+    flash_data = build_flash_sale_page(now)
+    ttl = activity_cache_ttl(now)
+
+    version = bump_activity_version()
+    if version is not None:
+        cache = caches['mall_cache']
+        for is_vip, current_flash_sales in home_data.items():
+            cache.set(activity_cache_key('home', is_vip, version), current_flash_sales, ttl)
+            cache.set(activity_cache_key('flash', is_vip, version), flash_data, ttl)
+
+    # 推送秒杀开始通知
+    try:
+        async_to_sync(get_channel_layer().group_send)(FLASH_SALE_GROUP, {
+            'type': 'flash_sale_started',
+            'flash_sale_id': flash_sale.id,
+            'name': flash_sale.name,
+            'end_time': flash_sale.end_time.isoformat(),
+        })
+    except Exception as e:
+        print(f"秒杀开始通知推送失败: {e}")
+
+
+@shared_task
+def sync_product_search():
+    """增量同步商品搜索索引（由 celery beat 定时调用）"""
+    count = sync_search_index()
+    if count:
+        print(f"商品搜索索引已同步: {count} 个商品")
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(RefundGatewayError,),
+    max_retries=REFUND_MAX_RETRIES,
+    retry_backoff=True,
+    retry_backoff_max=600,
+    retry_jitter=True
+)
+def process_refund(self, application_id):
+    """执行审核通过的退款申请，渠道调用失败时按指数退避重试"""
+    try:
+        return execute_refund(application_id)
+    except RefundGatewayError:
+        if self.request.retries >= self.max_retries:
+            notify_refund_failed(application_id)
+        raise
+
+
+@shared_task
+def reconcile_refunds():
+    """退款对账（由 celery beat 定时调用）
+
+    批量修复支付单已退款但申请/订单状态未更新的记录，并重新排队超时未完成的退款
+    """
+    applications, orders = reconcile_refund_statuses()
+    requeued = requeue_stale_refunds()
+    if applications or orders or requeued:
+        print(f"退款对账完成: 修复申请 {applications} 条, 订单 {orders} 条, 重新排队 {requeued} 条")
@@ -11,7 +11,7 @@ from .views import (
     delete_cart_item, submit_order, order_list, order_detail, add_mark, remove_mark, order_review,
     flash_sale, coupon_list, address_manage, add_address, edit_address, delete_address,
     logistics_track, couple_zone, search_result,get_coupon_detail, refresh_recommended, category_products, new_products, vip_products,
-    process_payment, refund_apply, submit_refund
+    process_payment, refund_apply, submit_refund, home_bundle
 )
 
 app_name = 'mall'
@@ -93,6 +93,9 @@ web_urlpatterns = [
     
     # 推荐商品
     path('api/recommended/refresh/', refresh_recommended, name='refresh_recommended'),
+
+    # 首页数据包
+    path('api/home/', home_bundle, name='home_bundle'),
 ]
 
 urlpatterns = [
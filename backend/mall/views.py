@@ -1,12 +1,13 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods, require_POST
 from django.http import JsonResponse, HttpResponse
+from django.utils.http import parse_etags
 from django.core.cache import cache
 from django.conf import settings
 from django.utils import timezone
@@ -14,8 +15,8 @@ from django.db import transaction
 from django.db.models import F, Avg, Sum, Case, When, IntegerField, FloatField
 import json
 import hashlib
+from decimal import Decimal, InvalidOperation
 import time
-import uuid
 import os
 
 from .models import (
@@ -31,6 +32,33 @@ from .serializers import (
     UserBehaviorSerializer, RefundApplicationSerializer, OrderCreateSerializer, CouponApplySerializer,
     FlashSalePurchaseSerializer
 )
+from .flash_sale_cache import (
+    activity_cache_key, activity_cache_ttl, build_current_flash_sales, build_flash_sale_page,
+    get_cached_flash_stock, is_vip_user, set_cached_flash_stock
+)
+from .coupons import (
+    get_user_coupon_index, invalidate_user_coupon_index, evaluate_coupons, calculate_discount,
+    get_available_coupons, invalidate_available_coupons, invalidate_coupons
+)
+from .logistics import get_trajectory, ingest_events, replace_events
+from .search import search_products, autocomplete
+from .product_cards import get_product_cards, apply_marks
+from .product_marks import get_marked_ids, is_marked as is_product_marked, get_mark_count
+from .refunds import approve_refund, reject_refund
+from .home_bundle import get_home_bundle, get_home_sections
+from .payments import (
+    generate_transaction_id, claim_notification, release_notification, mark_payment_success
+)
+
+
+def parse_price(value):
+    """解析价格筛选参数，无效值返回 None"""
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        return None
 
 
 # API视图集
@@ -70,14 +98,25 @@ class ProductViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        """获取商品列表，支持按类别、标签、情侣款筛选"""
+        """获取商品列表，支持关键词搜索及按类别、标签、情侣款、价格筛选"""
         queryset = self.queryset
+        keyword = self.request.query_params.get('keyword', '').strip()
         category_id = self.request.query_params.get('category')
         tag_id = self.request.query_params.get('tag')
         is_couple = self.request.query_params.get('is_couple')
+        min_price = parse_price(self.request.query_params.get('min_price'))
+        max_price = parse_price(self.request.query_params.get('max_price'))
 
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
+        if keyword:
+            # 关键词搜索走全文索引，结果按相关度排序
+            queryset = search_products(keyword, category_id, min_price, max_price)
+        else:
+            if min_price is not None:
+                queryset = queryset.filter(price__gte=min_price)
+            if max_price is not None:
+                queryset = queryset.filter(price__lte=max_price)
+            if category_id:
+                queryset = queryset.filter(category_id=category_id)
         if tag_id:
             queryset = queryset.filter(tags__tag_id=tag_id)
         if is_couple == 'true':
@@ -85,6 +124,12 @@ class ProductViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """商品名称搜索联想"""
+        prefix = request.query_params.get('q', '')
+        return Response({'suggestions': autocomplete(prefix)})
+
     @action(detail=False, methods=['get'])
     def hot(self, request):
         """获取热门商品"""
@@ -292,22 +337,44 @@ class PaymentViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['put'])
     def refund(self, request, pk=None):
-        """申请退款"""
+        """申请退款（退款由后台任务处理，接口立即返回）"""
         payment = self.get_object()
-        if payment.status == 'success':
-            refund_amount = request.data.get('refund_amount', payment.amount)
-            payment.refund_amount = refund_amount
-            payment.status = 'refunded'
-            payment.refunded_at = timezone.now()
-            payment.save()
+        if payment.status != 'success':
+            return Response({'error': '支付状态不允许退款'}, status=status.HTTP_400_BAD_REQUEST)
 
-            # 更新订单状态
-            order = payment.order
-            order.status = 'refunded'
-            order.save()
+        # 检查是否超过售后有效期
+        delivered_at = payment.order.delivered_at
+        if delivered_at and (timezone.now().date() - delivered_at.date()).days > 7:
+            return Response({'error': '商品已超过7天售后有效期'}, status=status.HTTP_400_BAD_REQUEST)
 
-            return Response({'status': 'refunded', 'refund_amount': refund_amount})
-        return Response({'error': '支付状态不允许退款'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            refund_amount = Decimal(str(request.data.get('refund_amount', payment.amount)))
+        except (InvalidOperation, TypeError, ValueError):
+            return Response({'error': '无效的退款金额'}, status=status.HTTP_400_BAD_REQUEST)
+        if not refund_amount.is_finite() or not Decimal(0) < refund_amount <= payment.amount:
+            return Response({'error': '退款金额必须大于0且不超过支付金额'}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # 同一订单已有进行中的退款时不再重复提交
+            updated = Order.objects.filter(
+                id=payment.order_id,
+                status__in=['paid', 'shipped', 'delivered']
+            ).update(status='refunding')
+            if not updated:
+                return Response({'error': '订单状态不允许退款'}, status=status.HTTP_400_BAD_REQUEST)
+
+            application = RefundApplication.objects.create(
+                user=request.user,
+                order_id=payment.order_id,
+                refund_amount=refund_amount,
+                reason=request.data.get('reason', '用户申请退款')
+            )
+            approve_refund(application)
+
+        return Response(
+            {'status': 'refunding', 'refund_amount': refund_amount, 'refund_id': application.id},
+            status=status.HTTP_202_ACCEPTED
+        )
 
     @action(detail=False, methods=['post'])
     def create_payment(self, request):
@@ -393,22 +460,26 @@ class PaymentViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def notify(self, request, pk=None):
-        """支付回调处理"""
+        """支付回调处理（同一交易的重复通知只处理一次）"""
         payment = self.get_object()
-        
-        # 模拟支付回调
-        payment.status = 'success'
-        payment.transaction_id = f"TRX{int(timezone.now().timestamp())}{uuid.uuid4().hex[:8].upper()}"
-        payment.paid_at = timezone.now()
-        payment.save()
-
-        # 更新订单状态
-        order = payment.order
-        order.status = 'paid'
-        order.paid_at = timezone.now()
-        order.payment_method = payment.method
-        order.save()
 
+        # 网关未提供交易号时（模拟支付）按支付单去重
+        transaction_id = request.data.get('transaction_id')
+        idempotency_key = transaction_id or f'payment:{payment.id}'
+        if not claim_notification(idempotency_key):
+            return Response({'success': True, 'message': '重复通知，已处理'})
+
+        try:
+            processed = mark_payment_success(
+                payment.id, payment.order_id, payment.method,
+                transaction_id or generate_transaction_id()
+            )
+        except Exception as e:
+            release_notification(idempotency_key)
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not processed:
+            return Response({'success': True, 'message': '支付状态已更新，无需重复处理'})
         return Response({'success': True, 'message': '支付成功'})
 
     @action(detail=True, methods=['get'])
@@ -455,6 +526,11 @@ class FlashSaleViewSet(viewsets.ModelViewSet):
             product_id = data['product_id']
             quantity = data['quantity']
 
+            # 预热的库存计数器不足时直接拒绝，避免售罄后请求继续争抢行锁
+            cached_stock = get_cached_flash_stock(flash_sale.id, product_id)
+            if cached_stock is not None and cached_stock < quantity:
+                return Response({'error': '秒杀库存不足'}, status=status.HTTP_400_BAD_REQUEST)
+
             try:
                 with transaction.atomic():
                     # 检查秒杀商品
@@ -481,7 +557,10 @@ class FlashSaleViewSet(viewsets.ModelViewSet):
 
                     # 扣减库存
                     flash_product.flash_stock -= quantity
-                    flash_product.save()
+                    flash_product.save(update_fields=['flash_stock'])
+                    transaction.on_commit(lambda: set_cached_flash_stock(
+                        flash_sale.id, product_id, flash_product.flash_stock
+                    ))
 
                     # 跳转到结算页面
                     return Response({'success': True, 'product_id': product_id})
@@ -496,17 +575,25 @@ class CouponViewSet(viewsets.ModelViewSet):
     serializer_class = CouponSerializer
     permission_classes = [IsAuthenticated]
 
+    def perform_create(self, serializer):
+        """创建优惠券"""
+        serializer.save()
+        invalidate_coupons()
+
+    def perform_update(self, serializer):
+        """更新优惠券"""
+        serializer.save()
+        invalidate_coupons()
+
+    def perform_destroy(self, instance):
+        """删除优惠券"""
+        instance.delete()
+        invalidate_coupons()
+
     @action(detail=False, methods=['get'])
     def available(self, request):
         """获取可领取的优惠券"""
-        now = timezone.now()
-        available_coupons = self.queryset.filter(
-            start_time__lte=now,
-            end_time__gte=now,
-            remaining_quantity__gt=0
-        )
-        serializer = self.get_serializer(available_coupons, many=True)
-        return Response(serializer.data)
+        return Response(get_available_coupons())
 
 
 class UserCouponViewSet(viewsets.ModelViewSet):
@@ -545,11 +632,32 @@ class UserCouponViewSet(viewsets.ModelViewSet):
                         coupon=coupon
                     )
 
-                    return Response({'success': True, 'coupon_id': user_coupon.id})
+                # 优惠券状态变化，清除索引缓存
+                invalidate_user_coupon_index(request.user.id)
+                invalidate_available_coupons()
+
+                return Response({'success': True, 'coupon_id': user_coupon.id})
             except Exception as e:
                 return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'])
+    def applicable(self, request):
+        """根据订单金额获取可用优惠券及最优优惠"""
+        try:
+            amount = Decimal(request.query_params.get('amount', '0'))
+        except InvalidOperation:
+            return Response({'error': '无效的订单金额'}, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = get_user_coupon_index(request.user.id)
+        _, applicable, best_entry, best_discount = evaluate_coupons(entries, amount)
+
+        return Response({
+            'applicable': applicable,
+            'best_coupon_id': best_entry['id'] if best_entry else None,
+            'best_discount': best_discount
+        })
+
 
 class LogisticsViewSet(viewsets.ModelViewSet):
     """物流视图集"""
@@ -565,13 +673,41 @@ class LogisticsViewSet(viewsets.ModelViewSet):
     def track(self, request, pk=None):
         """查询物流轨迹"""
         logistics = self.get_object()
-        if logistics.trajectory:
-            try:
-                trajectory = json.loads(logistics.trajectory)
-                return Response({'trajectory': trajectory})
-            except:
-                return Response({'trajectory': []})
-        return Response({'trajectory': []})
+        return Response({'trajectory': get_trajectory(logistics.id)})
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def ingest(self, request):
+        """批量接收承运商推送的物流轨迹
+
+        请求体：{"events": [{"logistics_no", "time", "status", "description", "logistics_status"}]}
+        """
+        items = request.data.get('events')
+        if not isinstance(items, list) or not items:
+            return Response({'error': '缺少轨迹数据'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 一次查询按物流单号匹配物流信息
+        logistics_nos = {item.get('logistics_no') for item in items if isinstance(item, dict)}
+        logistics_ids = dict(Logistics.objects.filter(
+            logistics_no__in=logistics_nos
+        ).values_list('logistics_no', 'id'))
+
+        events = []
+        unknown = []
+        for item in items:
+            if not isinstance(item, dict) or not item.get('time') or not item.get('status'):
+                return Response({'error': '轨迹数据格式错误'}, status=status.HTTP_400_BAD_REQUEST)
+            logistics_id = logistics_ids.get(item.get('logistics_no'))
+            if logistics_id is None:
+                unknown.append(item.get('logistics_no'))
+                continue
+            events.append(dict(item, logistics_id=logistics_id))
+
+        try:
+            created = ingest_events(events)
+        except ValueError:
+            return Response({'error': '轨迹时间格式错误'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'success': True, 'created': created, 'unknown_logistics_nos': unknown})
 
     @action(detail=False, methods=['post'])
     def create_logistics(self, request):
@@ -610,15 +746,12 @@ class LogisticsViewSet(viewsets.ModelViewSet):
             order.save()
 
             # 生成初始物流轨迹
-            trajectory = [
-                {
-                    'time': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'status': '已发货',
-                    'description': '【{}】您的订单已发货，请注意查收'.format(logistics_company)
-                }
-            ]
-            logistics.trajectory = json.dumps(trajectory)
-            logistics.save()
+            ingest_events([{
+                'logistics_id': logistics.id,
+                'time': timezone.now(),
+                'status': '已发货',
+                'description': '【{}】您的订单已发货，请注意查收'.format(logistics_company)
+            }])
 
             return Response({
                 'success': True,
@@ -659,24 +792,14 @@ class LogisticsViewSet(viewsets.ModelViewSet):
                 order.delivered_at = timezone.now()
                 order.save()
 
-            # 更新物流轨迹
-            if logistics.trajectory:
-                try:
-                    trajectory = json.loads(logistics.trajectory)
-                except:
-                    trajectory = []
-            else:
-                trajectory = []
-
             # 添加新的轨迹记录
-            trajectory.append({
-                'time': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
+            ingest_events([{
+                'logistics_id': logistics.id,
+                'time': timezone.now(),
                 'status': dict(Logistics.LOGISTICS_STATUS_CHOICES).get(new_status),
-                'description': status_description or dict(Logistics.LOGISTICS_STATUS_CHOICES).get(new_status)
-            })
-
-            logistics.trajectory = json.dumps(trajectory)
-            logistics.save()
+                'description': status_description or dict(Logistics.LOGISTICS_STATUS_CHOICES).get(new_status),
+                'logistics_status': new_status
+            }])
 
             return Response({
                 'success': True,
@@ -734,8 +857,7 @@ class LogisticsViewSet(viewsets.ModelViewSet):
             })
 
         # 更新物流轨迹
-        logistics.trajectory = json.dumps(trajectory)
-        logistics.save()
+        replace_events(logistics.id, trajectory)
 
         return Response({'trajectory': trajectory})
 
@@ -786,6 +908,11 @@ class ProductMarkViewSet(viewsets.ModelViewSet):
         """创建商品收藏"""
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def count(self, request):
+        """获取收藏数量"""
+        return Response({'count': get_mark_count(request.user.id)})
+
 
 class HomeBannerViewSet(viewsets.ModelViewSet):
     """首页轮播图视图集"""
@@ -834,13 +961,31 @@ class RefundApplicationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        """获取当前用户的退款申请"""
+        """获取当前用户的退款申请（管理员可查看全部）"""
+        if self.action in ['approve', 'reject']:
+            return self.queryset
         return self.queryset.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         """创建退款申请"""
         serializer.save(user=self.request.user)
 
+    @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
+    def approve(self, request, pk=None):
+        """审核通过退款申请，退款由后台任务处理"""
+        application = self.get_object()
+        if not approve_refund(application):
+            return Response({'error': '退款申请状态不允许审核'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'status': 'approved'}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
+    def reject(self, request, pk=None):
+        """拒绝退款申请"""
+        application = self.get_object()
+        if not reject_refund(application, request.data.get('remark')):
+            return Response({'error': '退款申请状态不允许审核'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'status': 'rejected'})
+
 
 # Web视图函数
 
@@ -1049,7 +1194,7 @@ def mall(request):
     # 获取当前秒杀活动
     now = timezone.now()
     # 尝试从缓存获取
-    cache_key = f'mall_active:{now.year}:{now.month}:{now.day}:{request.user.is_vip if hasattr(request.user, "is_vip") else "false"}'
+    cache_key = activity_cache_key('home', is_vip_user(request.user))
     current_flash_sales = None
     
     try:
@@ -1060,51 +1205,23 @@ def mall(request):
         print(f"缓存读取失败: {e}")
     
     if current_flash_sales is None:
-        # 构建查询
-        query = FlashSale.objects.filter(
-            status=True,
-            start_time__lte=now,
-            end_time__gte=now
-        )
-        
-        # 根据用户VIP状态筛选
-        if not hasattr(request.user, "is_vip") or not request.user.is_vip:
-            query = query.filter(is_vip_only=False)
-        
-        current_flash_sales = query[:3]
+        current_flash_sales = build_current_flash_sales(now, is_vip_user(request.user))
         
         # 缓存结果
         try:
             from django.core.cache import caches
             cache = caches['mall_cache']
-            cache.set(cache_key, current_flash_sales, 3600)  # 缓存1小时
+            cache.set(cache_key, current_flash_sales, activity_cache_ttl(now))  # 缓存至下一个活动边界
         except Exception as e:
             print(f"缓存写入失败: {e}")
 
-    # 获取首页轮播图
-    banners = HomeBanner.objects.filter(is_active=True).order_by('sort')[:5]
-
-    # 获取商品分类（顶级分类及其子分类）
-    top_categories = Category.objects.filter(is_active=True, parent__isnull=True).order_by('sort')[:8]
-    # 为每个顶级分类获取子分类
-    categories_with_children = []
-    for category in top_categories:
-        category_dict = {
-            'id': category.id,
-            'name': category.name,
-            'icon': category.icon.url if category.icon else '',
-            'children': [
-                {
-                    'id': child.id,
-                    'name': child.name
-                }
-                for child in category.children.filter(is_active=True).order_by('sort')[:5]
-            ]
-        }
-        categories_with_children.append(category_dict)
-    
+    # 获取首页轮播图和商品分类（与首页数据包共用板块缓存）
+    home_sections = get_home_sections(is_vip_user(request.user), ('banners', 'categories'))
+    banners = home_sections['banners']['data']
+    categories_with_children = home_sections['categories']['data']
+
     # 获取用户收藏的商品
-    user_marks = ProductMark.objects.filter(user=request.user).values_list('product_id', flat=True)
+    user_marks = get_marked_ids(request.user.id)
 
     return render(request, 'mall/mall.html', {
         'recommended_products': recommended_products,
@@ -1149,7 +1266,7 @@ def product_detail(request, product_id):
     skus = ProductSKU.objects.filter(product=product, is_active=True)
 
     # 检查是否已收藏
-    is_marked = ProductMark.objects.filter(user=request.user, product=product).exists()
+    is_marked = is_product_marked(request.user.id, product.id)
 
     # 获取商品评论
     reviews = ProductReview.objects.filter(product=product, is_approved=True).order_by('-created_at')[:10]
@@ -1367,29 +1484,62 @@ def delete_cart_item(request):
         return JsonResponse({'status': 'error', 'message': str(e)})
 
 
+def render_product_cards(request, product_ids, recommended_ids):
+    """一次取出列表商品和推荐商品的卡片，并叠加当前用户的收藏状态"""
+    product_ids = list(product_ids)
+    cards = get_product_cards(product_ids + list(recommended_ids))
+    cards = apply_marks(cards, get_marked_ids(request.user.id))
+    # 卡片按传入顺序返回，已删除的商品会被跳过，按ID重新拆分
+    list_ids = {str(product_id) for product_id in product_ids}
+    products = [card for card in cards if card['id'] in list_ids]
+    recommended_products = [card for card in cards if card['id'] not in list_ids]
+    return products, recommended_products
+
+
+# 首页数据包
+@require_http_methods(['GET', 'HEAD'])
+def home_bundle(request):
+    """首页数据包（轮播图、分类、情侣款商品、秒杀活动），支持 ETag/If-None-Match 重新验证"""
+    is_vip = is_vip_user(request.user)
+    bundle = get_home_bundle(is_vip)
+    etag = '"%s"' % bundle['etag']
+
+    # VIP 用户看到的秒杀活动不同，不允许共享缓存
+    cache_control = 'private, no-cache' if is_vip else 'public, no-cache'
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        response = HttpResponse(status=304)
+    else:
+        response = JsonResponse({
+            'version': bundle['etag'],
+            'versions': bundle['versions'],
+            **bundle['sections']
+        })
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
 # 刷新推荐商品
 @login_required
 def refresh_recommended(request):
     """刷新推荐商品"""
     try:
         # 随机获取5个已上架商品作为新的推荐
-        recommended_products = Product.objects.filter(is_active=True).order_by('?')[:5]
-
-        # 获取用户收藏的商品
-        user_marks = ProductMark.objects.filter(user=request.user).values_list('product_id', flat=True)
-
-        # 构建商品数据
-        products_data = []
-        for product in recommended_products:
-            products_data.append({
-                'id': product.id,
-                'name': product.name,
-                'price': product.price,
-                'rating': product.rating,
-                'main_image': product.main_image.url if product.main_image else None,
-                'is_marked': product.id in user_marks,
-                'is_new': product.is_new
-            })
+        recommended_ids = Product.objects.filter(is_active=True).order_by('?').values_list('id', flat=True)[:5]
+
+        # 构建商品数据（商品卡片缓存 + 用户收藏状态）
+        cards = apply_marks(get_product_cards(recommended_ids), get_marked_ids(request.user.id))
+        products_data = [{
+            'id': card['id'],
+            'name': card['name'],
+            'price': card['price'],
+            'rating': card['rating'],
+            'main_image': card['image_url'] or None,
+            'is_marked': card['is_marked'],
+            'is_new': card['is_new']
+        } for card in cards]
 
         return JsonResponse({
             'success': True,
@@ -1403,34 +1553,6 @@ def refresh_recommended(request):
         })
 
 
-# 清除活动缓存的函数
-def clear_flash_sale_cache():
-    """清除活动缓存"""
-    try:
-        from django.core.cache import caches
-        from datetime import datetime
-        cache = caches['mall_cache']
-        # 清除当前日期的活动缓存
-        now = datetime.now()
-        # 清除不同类型活动的缓存，统一在mall_active键名下
-        cache_keys = [
-            # 首页活动列表缓存
-            f'mall_active:{now.year}:{now.month}:{now.day}:false',
-            f'mall_active:{now.year}:{now.month}:{now.day}:true',
-            # 活动详情页缓存
-            f'mall_active:flash:{now.year}:{now.month}:{now.day}:false',
-            f'mall_active:flash:{now.year}:{now.month}:{now.day}:true',
-            f'mall_active:new:{now.year}:{now.month}:{now.day}:false',
-            f'mall_active:new:{now.year}:{now.month}:{now.day}:true',
-            f'mall_active:vip:{now.year}:{now.month}:{now.day}:false',
-            f'mall_active:vip:{now.year}:{now.month}:{now.day}:true'
-        ]
-        for cache_key in cache_keys:
-            cache.delete(cache_key)
-            print(f"已清除活动缓存: {cache_key}")
-    except Exception as e:
-        print(f"清除活动缓存失败: {e}")
-
 # 分类商品页面
 @login_required
 def category_products(request, category_id):
@@ -1438,45 +1560,25 @@ def category_products(request, category_id):
     # 获取分类
     category = get_object_or_404(Category, id=category_id, is_active=True)
     
-    # 获取分类下的商品
-    products_queryset = Product.objects.filter(
+    # 获取分类下的商品ID
+    product_ids = list(Product.objects.filter(
         is_active=True,
         category=category,
         product_stock__gt=0
-    ).order_by('-created_at')[:20]
-    
-    # 为商品添加discount属性
-    products = []
-    for product in products_queryset:
-        if product.old_price > product.price:
-            product.discount = int((1 - product.price / product.old_price) * 100)
-        else:
-            product.discount = 0
-        products.append(product)
+    ).order_by('-created_at').values_list('id', flat=True)[:20])
     
-    # 获取推荐商品
-    recommended_queryset = Product.objects.filter(
+    # 获取推荐商品ID
+    recommended_ids = list(Product.objects.filter(
         is_active=True,
         product_stock__gt=0
-    ).exclude(category=category).order_by('?')[:5]
+    ).exclude(category=category).order_by('?').values_list('id', flat=True)[:5])
     
-    # 为推荐商品添加discount属性
-    recommended_products = []
-    for product in recommended_queryset:
-        if product.old_price > product.price:
-            product.discount = int((1 - product.price / product.old_price) * 100)
-        else:
-            product.discount = 0
-        recommended_products.append(product)
-    
-    # 获取用户收藏的商品
-    user_marks = ProductMark.objects.filter(user=request.user).values_list('product_id', flat=True)
+    products, recommended_products = render_product_cards(request, product_ids, recommended_ids)
     
     return render(request, 'mall/category_products.html', {
         'category': category,
         'products': products,
         'recommended_products': recommended_products,
-        'user_marks': user_marks,
         'user': request.user
     })
 
@@ -1486,68 +1588,49 @@ def category_products(request, category_id):
 def new_products(request):
     """新品商品页面"""
     # 获取新品商品
-    now = timezone.now()
     # 尝试从缓存获取
-    cache_key = f'mall_active:new:{now.year}:{now.month}:{now.day}:{request.user.is_vip if hasattr(request.user, "is_vip") else "false"}'
-    products = None
-    recommended_products = None
-    user_marks = None
+    cache_key = activity_cache_key('new', is_vip_user(request.user))
+    product_ids = None
+    recommended_ids = None
     
     try:
         from django.core.cache import caches
         cache = caches['mall_cache']
         cached_data = cache.get(cache_key)
         if cached_data:
-            products = cached_data['products']
-            recommended_products = cached_data['recommended']
-            user_marks = cached_data['user_marks']
+            product_ids = cached_data['products']
+            recommended_ids = cached_data['recommended']
     except Exception as e:
         print(f"缓存读取失败: {e}")
     
-    if products is None or recommended_products is None:
-        products_queryset = Product.objects.filter(
+    if product_ids is None or recommended_ids is None:
+        product_ids = [str(product_id) for product_id in Product.objects.filter(
             is_active=True,
             is_new=True,
             product_stock__gt=0
-        ).order_by('-created_at')[:20]
-        
-        # 为商品添加discount属性（新品不显示折扣）
-        products = []
-        for product in products_queryset:
-            # 新品不显示折扣
-            product.discount = 0
-            products.append(product)
+        ).order_by('-created_at').values_list('id', flat=True)[:20]]
         
         # 获取推荐商品
-        recommended_queryset = Product.objects.filter(
+        recommended_ids = [str(product_id) for product_id in Product.objects.filter(
             is_active=True,
             product_stock__gt=0
-        ).exclude(is_new=True).order_by('?')[:5]
-        
-        # 为推荐商品添加discount属性
-        recommended_products = []
-        for product in recommended_queryset:
-            if product.old_price > product.price:
-                product.discount = int((1 - product.price / product.old_price) * 100)
-            else:
-                product.discount = 0
-            recommended_products.append(product)
+        ).exclude(is_new=True).order_by('?').values_list('id', flat=True)[:5]]
         
-        # 获取用户收藏的商品
-        user_marks = ProductMark.objects.filter(user=request.user).values_list('product_id', flat=True)
-        
-        # 缓存结果
+        # 缓存结果（只缓存商品ID，商品信息从商品卡片缓存获取）
         try:
             from django.core.cache import caches
             cache = caches['mall_cache']
             cache.set(cache_key, {
-                'products': products,
-                'recommended': recommended_products,
-                'user_marks': user_marks
+                'products': product_ids,
+                'recommended': recommended_ids
             }, 3600)  # 缓存1小时
         except Exception as e:
             print(f"缓存写入失败: {e}")
     
+    # 新品不显示折扣
+    products, recommended_products = render_product_cards(request, product_ids, recommended_ids)
+    products = [dict(card, discount=0) for card in products]
+    
     # 创建一个虚拟的分类对象用于模板显示
     class VirtualCategory:
         def __init__(self):
@@ -1561,7 +1644,6 @@ def new_products(request):
         'category': virtual_category,
         'products': products,
         'recommended_products': recommended_products,
-        'user_marks': user_marks,
         'user': request.user
     })
 
@@ -1572,10 +1654,9 @@ def vip_products(request):
     """VIP专属活动页面"""
     now = timezone.now()
     # 尝试从缓存获取
-    cache_key = f'mall_active:vip:{now.year}:{now.month}:{now.day}:{request.user.is_vip if hasattr(request.user, "is_vip") else "false"}'
-    products = None
-    recommended_products = None
-    user_marks = None
+    cache_key = activity_cache_key('vip', is_vip_user(request.user))
+    product_ids = None
+    recommended_ids = None
     vip_activity = None
     
     try:
@@ -1583,14 +1664,13 @@ def vip_products(request):
         cache = caches['mall_cache']
         cached_data = cache.get(cache_key)
         if cached_data:
-            products = cached_data['products']
-            recommended_products = cached_data['recommended']
-            user_marks = cached_data['user_marks']
+            product_ids = cached_data['products']
+            recommended_ids = cached_data['recommended']
             vip_activity = cached_data['activity']
     except Exception as e:
         print(f"缓存读取失败: {e}")
     
-    if products is None or recommended_products is None:
+    if product_ids is None or recommended_ids is None:
         try:
             # 获取ID为3的活动（VIP专属活动）
             vip_activity = FlashSale.objects.get(id=3, status=True)
@@ -1600,59 +1680,38 @@ def vip_products(request):
                 flash_sale=vip_activity
             ).values_list('product_id', flat=True)
             
-            # 获取商品详情
-            products_queryset = Product.objects.filter(
+            # 获取商品ID
+            product_ids = [str(product_id) for product_id in Product.objects.filter(
                 id__in=flash_sale_product_ids,
                 is_active=True,
                 product_stock__gt=0
-            ).order_by('-created_at')[:20]
-            
-            # 为商品添加discount属性
-            products = []
-            for product in products_queryset:
-                if product.old_price > product.price:
-                    product.discount = int((1 - product.price / product.old_price) * 100)
-                else:
-                    product.discount = 0
-                products.append(product)
+            ).order_by('-created_at').values_list('id', flat=True)[:20]]
             
             # 获取推荐商品
-            recommended_queryset = Product.objects.filter(
+            recommended_ids = [str(product_id) for product_id in Product.objects.filter(
                 is_active=True,
                 product_stock__gt=0
-            ).exclude(id__in=[p.id for p in products]).order_by('?')[:5]
+            ).exclude(id__in=product_ids).order_by('?').values_list('id', flat=True)[:5]]
             
-            # 为推荐商品添加discount属性
-            recommended_products = []
-            for product in recommended_queryset:
-                if product.old_price > product.price:
-                    product.discount = int((1 - product.price / product.old_price) * 100)
-                else:
-                    product.discount = 0
-                recommended_products.append(product)
-            
-            # 获取用户收藏的商品
-            user_marks = ProductMark.objects.filter(user=request.user).values_list('product_id', flat=True)
-            
-            # 缓存结果
+            # 缓存结果（只缓存商品ID，商品信息从商品卡片缓存获取）
             try:
                 from django.core.cache import caches
                 cache = caches['mall_cache']
                 cache.set(cache_key, {
-                    'products': products,
-                    'recommended': recommended_products,
-                    'user_marks': user_marks,
+                    'products': product_ids,
+                    'recommended': recommended_ids,
                     'activity': vip_activity
-                }, 3600)  # 缓存1小时
+                }, activity_cache_ttl(now))  # 缓存至下一个活动边界
             except Exception as e:
                 print(f"缓存写入失败: {e}")
         except FlashSale.DoesNotExist:
             # 如果活动不存在，显示空页面
-            products = []
-            recommended_products = []
-            user_marks = []
+            product_ids = []
+            recommended_ids = []
             vip_activity = None
     
+    products, recommended_products = render_product_cards(request, product_ids, recommended_ids)
+    
     # 创建一个虚拟的分类对象用于模板显示
     class VirtualCategory:
         def __init__(self, name):
@@ -1675,7 +1734,6 @@ def vip_products(request):
         'category': virtual_category,
         'products': products,
         'recommended_products': recommended_products,
-        'user_marks': user_marks,
         'user': request.user
     })
 
@@ -1751,19 +1809,14 @@ def checkout(request):
     addresses = Address.objects.filter(user=request.user)
     default_address = addresses.filter(is_default=True).first()
 
-    # 获取可用优惠券
-    now = timezone.now()
-    available_coupons = UserCoupon.objects.filter(
-        user=request.user,
-        is_used=False,
-        coupon__end_time__gte=now
+    # 获取可用优惠券（从用户优惠券索引中一次计算）
+    coupon_entries = get_user_coupon_index(request.user.id)
+    available_coupons, applicable_coupons, best_coupon, best_discount = evaluate_coupons(
+        coupon_entries, order_total
     )
 
-    # 计算真正可用的优惠券数量（满足最低消费条件）
-    truly_available_count = 0
-    for user_coupon in available_coupons:
-        if user_coupon.coupon.min_spend <= order_total:
-            truly_available_count += 1
+    # 真正可用的优惠券数量（满足最低消费条件）
+    truly_available_count = len(applicable_coupons)
 
     return render(request, 'mall/checkout.html', {
         'selected_items': selected_items,
@@ -1774,6 +1827,8 @@ def checkout(request):
         'default_address': default_address,
         'available_coupons': available_coupons,
         'truly_available_count': truly_available_count,
+        'best_coupon': best_coupon,
+        'best_discount': best_discount,
         'direct_purchase': direct_purchase,
         'product_id': product_id,
         'quantity': quantity
@@ -1872,23 +1927,11 @@ def submit_order(request):
                 if coupon.min_spend > 0 and order_total < coupon.min_spend:
                     return JsonResponse({'status': 'error', 'message': f'订单金额未达到优惠券使用条件（满{coupon.min_spend}元）'})
                 
-                # 计算优惠金额
-                if coupon.type == '满减券':
-                    discount_amount = coupon.value
-                    order_total -= discount_amount
-                elif coupon.type == '折扣券':
-                    discount_amount = order_total * (1 - coupon.value / 10)
-                    order_total *= (coupon.value / 10)
-                elif coupon.type == '现金券':
-                    discount_amount = coupon.value
-                    order_total -= discount_amount
-                else:
+                # 计算优惠金额（优惠金额不超过订单金额）
+                discount_amount = calculate_discount(coupon.type, coupon.value, order_total)
+                if discount_amount is None:
                     return JsonResponse({'status': 'error', 'message': '优惠券类型错误'})
-                
-                # 确保订单金额不小于0
-                if order_total < 0:
-                    discount_amount += order_total
-                    order_total = 0
+                order_total -= discount_amount
                 
                 used_coupon = user_coupon
             except UserCoupon.DoesNotExist:
@@ -1965,6 +2008,9 @@ def submit_order(request):
                     # 日志记录失败不影响订单提交
                     pass
 
+                # 优惠券已使用，清除用户优惠券索引缓存
+                invalidate_user_coupon_index(request.user.id)
+
             # 清空购物车中已下单的商品
             if selected_items:
                 selected_items.delete()
@@ -2129,31 +2175,8 @@ def cart_count(request):
 def mark_count(request):
     """获取收藏数量"""
     try:
-        # 从缓存获取
-        user_id = request.user.id
-        mark_key = f'user_mark:{user_id}'
-        count = None
-        
-        # 尝试使用商城缓存
-        try:
-            from django.core.cache import caches
-            mall_cache = caches['mall_cache']
-            count = mall_cache.get(mark_key)
-        except Exception as e:
-            print(f"Redis缓存读取失败: {e}")
-            count = cache.get(mark_key)
-        
-        if count is None:
-            # 从数据库获取
-            count = ProductMark.objects.filter(user=request.user).count()
-            # 缓存结果，有效期5分钟
-            try:
-                from django.core.cache import caches
-                mall_cache = caches['mall_cache']
-                mall_cache.set(mark_key, count, 300)
-            except Exception as e:
-                print(f"Redis缓存写入失败: {e}")
-                cache.set(mark_key, count, 300)
+        # 从用户收藏集合缓存获取
+        count = get_mark_count(request.user.id)
         
         return JsonResponse({'status': 'success', 'count': count})
     except Exception as e:
@@ -2180,29 +2203,21 @@ def process_payment(request):
         if order.status != 'pending':
             return JsonResponse({'status': 'error', 'message': '订单状态不允许支付'})
         
-        # 更新订单状态
-        order.status = 'paid'
-        order.payment_method = payment_method
-        order.paid_at = timezone.now()
-        order.save()
-        
-        # 更新支付记录
-        payment = Payment.objects.filter(order=order).first()
-        if payment:
-            payment.status = 'success'
-            payment.transaction_id = f"TRX{int(timezone.now().timestamp())}{uuid.uuid4().hex[:8].upper()}"
-            payment.paid_at = timezone.now()
-            payment.save()
-        else:
-            # 如果没有支付记录，创建一个
-            Payment.objects.create(
-                order=order,
-                amount=order.total_amount,
-                method=payment_method,
-                status='success',
-                transaction_id=f"TRX{int(timezone.now().timestamp())}{uuid.uuid4().hex[:8].upper()}",
-                paid_at=timezone.now()
-            )
+        with transaction.atomic():
+            # 获取待支付的支付记录，没有则创建一个
+            payment = Payment.objects.filter(order=order, status='pending').order_by('-created_at').first()
+            if payment is None:
+                payment = Payment.objects.create(
+                    order=order,
+                    amount=order.total_amount,
+                    method=payment_method,
+                    status='pending'
+                )
+
+            # 条件更新支付记录和订单状态，重复提交不会重复写入
+            processed = mark_payment_success(payment.id, order.id, payment_method, generate_transaction_id())
+        if not processed:
+            return JsonResponse({'status': 'error', 'message': '订单状态不允许支付'})
         
         # 清除缓存
         cart_key = f'user_cart:{request.user.id}'
@@ -2398,16 +2413,7 @@ def add_mark(request):
                 product=product,
                 behavior_type='mark'
             )
-            # 清除缓存
-            user_id = request.user.id
-            mark_key = f'user_mark:{user_id}'
-            try:
-                from django.core.cache import caches
-                mall_cache = caches['mall_cache']
-                mall_cache.delete(mark_key)
-            except Exception as e:
-                print(f"Redis缓存操作失败: {e}")
-                cache.delete(mark_key)
+            # 收藏集合缓存由 ProductMark 信号更新
             return JsonResponse({'status': 'success', 'message': '收藏成功'})
         else:
             return JsonResponse({'status': 'info', 'message': '已收藏'})
@@ -2437,19 +2443,9 @@ def remove_mark(request):
         product = get_object_or_404(Product, id=product_id)
 
         mark = get_object_or_404(ProductMark, user=request.user, product=product)
+        # 收藏集合缓存由 ProductMark 信号更新
         mark.delete()
 
-        # 清除缓存
-        user_id = request.user.id
-        mark_key = f'user_mark:{user_id}'
-        try:
-            from django.core.cache import caches
-            mall_cache = caches['mall_cache']
-            mall_cache.delete(mark_key)
-        except Exception as e:
-            print(f"Redis缓存操作失败: {e}")
-            cache.delete(mark_key)
-
         return JsonResponse({'status': 'success', 'message': '已取消收藏'})
     except json.JSONDecodeError:
         return JsonResponse({'status': 'error', 'message': 'JSON数据解析失败'})
@@ -2464,82 +2460,35 @@ def flash_sale(request):
     # 获取当前秒杀活动
     now = timezone.now()
     # 尝试从缓存获取
-    cache_key = f'mall_active:flash:{now.year}:{now.month}:{now.day}:{request.user.is_vip if hasattr(request.user, "is_vip") else "false"}'
-    flash_sale_products = None
-    recommended_products = None
-    user_marks = None
+    cache_key = activity_cache_key('flash', is_vip_user(request.user))
+    product_ids = None
+    recommended_ids = None
     
     try:
         from django.core.cache import caches
         cache = caches['mall_cache']
         cached_data = cache.get(cache_key)
         if cached_data:
-            flash_sale_products = cached_data['products']
-            recommended_products = cached_data['recommended']
-            user_marks = cached_data['user_marks']
+            product_ids = cached_data['products']
+            recommended_ids = cached_data['recommended']
     except Exception as e:
         print(f"缓存读取失败: {e}")
     
-    if flash_sale_products is None or recommended_products is None:
-        current_flash_sales = FlashSale.objects.filter(
-            status=True,
-            start_time__lte=now,
-            end_time__gte=now
-        )
-
-        # 获取秒杀商品
-        flash_sale_products = []
-        if current_flash_sales:
-            # 从当前活动中获取所有秒杀商品
-            flash_sale_product_ids = FlashSaleProduct.objects.filter(
-                flash_sale__in=current_flash_sales
-            ).values_list('product_id', flat=True)
-            
-            # 获取商品详情
-            products_queryset = Product.objects.filter(
-                id__in=flash_sale_product_ids,
-                is_active=True,
-                product_stock__gt=0
-            ).order_by('-created_at')[:20]
-            
-            # 为商品添加discount属性
-            for product in products_queryset:
-                if product.old_price > product.price:
-                    product.discount = int((1 - product.price / product.old_price) * 100)
-                else:
-                    product.discount = 0
-                flash_sale_products.append(product)
-
-        # 获取推荐商品
-        recommended_queryset = Product.objects.filter(
-            is_active=True,
-            product_stock__gt=0
-        ).exclude(id__in=[p.id for p in flash_sale_products]).order_by('?')[:5]
-        
-        # 为推荐商品添加discount属性
-        recommended_products = []
-        for product in recommended_queryset:
-            if product.old_price > product.price:
-                product.discount = int((1 - product.price / product.old_price) * 100)
-            else:
-                product.discount = 0
-            recommended_products.append(product)
-
-        # 获取用户收藏的商品
-        user_marks = ProductMark.objects.filter(user=request.user).values_list('product_id', flat=True)
+    if product_ids is None or recommended_ids is None:
+        page_data = build_flash_sale_page(now)
+        product_ids = page_data['products']
+        recommended_ids = page_data['recommended']
         
-        # 缓存结果
+        # 缓存结果（活动数据全站共享，不包含用户个人数据）
         try:
             from django.core.cache import caches
             cache = caches['mall_cache']
-            cache.set(cache_key, {
-                'products': flash_sale_products,
-                'recommended': recommended_products,
-                'user_marks': user_marks
-            }, 3600)  # 缓存1小时
+            cache.set(cache_key, page_data, activity_cache_ttl(now))  # 缓存至下一个活动边界
         except Exception as e:
             print(f"缓存写入失败: {e}")
 
+    flash_sale_products, recommended_products = render_product_cards(request, product_ids, recommended_ids)
+
     # 创建一个虚拟的分类对象用于模板显示
     class VirtualCategory:
         def __init__(self):
@@ -2553,7 +2502,6 @@ def flash_sale(request):
         'category': virtual_category,
         'products': flash_sale_products,
         'recommended_products': recommended_products,
-        'user_marks': user_marks,
         'user': request.user
     })
 
@@ -2698,11 +2646,7 @@ def logistics_track(request, order_number):
     if order.logistics_no:
         try:
             logistics = Logistics.objects.get(order=order)
-            if logistics.trajectory:
-                try:
-                    trajectory = json.loads(logistics.trajectory)
-                except:
-                    pass
+            trajectory = get_trajectory(logistics.id)
         except Logistics.DoesNotExist:
             pass
 
@@ -2741,19 +2685,13 @@ def couple_zone(request):
 def search_result(request):
     """搜索结果页面"""
     # 获取搜索关键词
-    keyword = request.GET.get('keyword', '')
-
-    # 搜索商品
-    products = Product.objects.filter(
-        is_active=True,
-        name__icontains=keyword
-    ) | Product.objects.filter(
-        is_active=True,
-        description__icontains=keyword
-    )
+    keyword = request.GET.get('keyword', '').strip()
+    category_id = request.GET.get('category')
+    min_price = parse_price(request.GET.get('min_price'))
+    max_price = parse_price(request.GET.get('max_price'))
 
-    # 去重
-    products = products.distinct().order_by('-created_at')
+    # 搜索商品（按相关度排序）
+    products = search_products(keyword, category_id, min_price, max_price) if keyword else Product.objects.none()
 
     return render(request, 'mall/search_result.html', {
         'products': products,
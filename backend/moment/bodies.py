@@ -0,0 +1,143 @@
+"""动态正文缓存
+
+动态的正文部分（内容、图片、标签、作者信息、评论）按动态缓存在 master_cache 中，
+不包含互动计数，点赞、收藏、浏览不会使其失效，因此可以长期缓存；
+评论、分享状态变化或删除时清除。计数通过 counters.hydrate_counters 在读取时合并。
+
+正文中的作者信息（名称、头像、VIP）和评论者信息会随用户资料变化：每个用户有一个版本号
+moment:author:version:{用户ID}（原生键），资料、头像、VIP 保存时递增；正文缓存时记录其中各用户的版本号，
+读取时一次 MGET 比对，版本不一致的正文视为未命中重新构建。
+标签的动态数量不写入缓存，读取时按整页标签一次查询合并。
+
+同一条动态有多种展示格式（API 序列化、分页加载卡片），按 kind 区分缓存键。
+"""
+import os
+
+from django.core.cache import caches
+from django.db.models import Count
+from django_redis import get_redis_connection
+
+from .counters import COUNTER_FIELDS, hydrate_counters
+from .models import Tag
+
+
+# 正文缓存时间（秒）
+MOMENT_BODY_CACHE_TTL = int(os.getenv('MOMENT_BODY_CACHE_TTL', 86400))
+
+# 正文展示格式
+BODY_KINDS = ('feed', 'card')
+
+
+def body_key(kind, moment_id):
+    """正文缓存键"""
+    return f'moment:body:{kind}:{moment_id}'
+
+
+def author_version_key(user_id):
+    """用户信息版本号键"""
+    return f'moment:author:version:{user_id}'
+
+
+def bump_author_version(user_id):
+    """用户资料、头像或 VIP 变化时递增版本号，包含该用户信息的正文缓存随之失效"""
+    try:
+        get_redis_connection('master_cache').incr(author_version_key(user_id))
+    except Exception as e:
+        print(f"用户信息版本更新失败: {e}")
+
+
+def _body_user_ids(body):
+    """正文中出现的用户ID（作者和评论者）"""
+    user_ids = {body['user']['id']}
+    for comment in body.get('latest_comments') or []:
+        user_ids.add(comment['user']['id'])
+    return user_ids
+
+
+def get_author_versions(user_ids):
+    """批量获取用户信息版本号，返回 {用户ID: 版本号}"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    values = get_redis_connection('master_cache').mget([author_version_key(user_id) for user_id in user_ids])
+    return {user_id: int(value) if value else 0 for user_id, value in zip(user_ids, values)}
+
+
+def get_bodies(kind, moment_ids, build):
+    """批量获取动态正文，按传入的ID顺序返回（已删除的动态会被跳过）
+
+    build(缺失的动态ID列表) 返回正文字典列表，字典中需包含 id
+    """
+    moment_ids = list(moment_ids)
+    if not moment_ids:
+        return []
+
+    keys = {moment_id: body_key(kind, moment_id) for moment_id in moment_ids}
+    bodies = {}
+    try:
+        cached = caches['master_cache'].get_many(list(keys.values()))
+        bodies = {moment_id: cached[key] for moment_id, key in keys.items() if key in cached}
+        # 丢弃用户信息已变化的正文
+        versions = get_author_versions({user_id for body in bodies.values() for user_id in body.get('_authors', {})})
+        bodies = {
+            moment_id: body for moment_id, body in bodies.items()
+            if '_authors' in body and all(versions[user_id] == version for user_id, version in body['_authors'].items())
+        }
+    except Exception as e:
+        print(f"动态正文缓存读取失败: {e}")
+        bodies = {}
+
+    missing_ids = [moment_id for moment_id in moment_ids if moment_id not in bodies]
+    if missing_ids:
+        built = {}
+        for body in build(missing_ids):
+            # 计数不写入正文缓存
+            built[body['id']] = {field: value for field, value in body.items() if field not in COUNTER_FIELDS}
+        bodies.update(built)
+        try:
+            versions = get_author_versions({user_id for body in built.values() for user_id in _body_user_ids(body)})
+            for body in built.values():
+                body['_authors'] = {user_id: versions[user_id] for user_id in _body_user_ids(body)}
+            caches['master_cache'].set_many(
+                {body_key(kind, moment_id): body for moment_id, body in built.items()},
+                MOMENT_BODY_CACHE_TTL
+            )
+        except Exception as e:
+            print(f"动态正文缓存写入失败: {e}")
+
+    items = []
+    for moment_id in moment_ids:
+        if moment_id in bodies:
+            item = dict(bodies[moment_id])
+            item.pop('_authors', None)
+            items.append(item)
+    return items
+
+
+def hydrate_tag_counts(items):
+    """把标签的最新动态数量合并到正文中（原地修改）"""
+    tag_ids = {tag['id'] for item in items for tag in item.get('tags') or []}
+    if not tag_ids:
+        return items
+    counts = dict(Tag.objects.filter(id__in=tag_ids).annotate(
+        moment_count=Count('moments')
+    ).values_list('id', 'moment_count'))
+    for item in items:
+        if item.get('tags'):
+            item['tags'] = [dict(tag, moment_count=counts.get(tag['id'], 0)) for tag in item['tags']]
+    return items
+
+
+def get_feed_items(kind, moment_ids, build):
+    """获取动态正文并合并最新计数"""
+    return hydrate_tag_counts(hydrate_counters(get_bodies(kind, moment_ids, build)))
+
+
+def invalidate_bodies(*moment_ids):
+    """清除动态正文缓存"""
+    try:
+        caches['master_cache'].delete_many([
+            body_key(kind, moment_id) for moment_id in moment_ids for kind in BODY_KINDS
+        ])
+    except Exception as e:
+        print(f"动态正文缓存清除失败: {e}")
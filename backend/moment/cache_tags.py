@@ -0,0 +1,97 @@
+"""社区缓存的版本失效
+
+替代 delete_pattern 扫描删除缓存键：
+- 代计数器（generation）：缓存键带列表的代号，列表成员或顺序变化（发布、分享、取消分享、删除）时递增代号，
+  旧键不再被读取并自然过期；按用户区分的缓存（收藏列表等）使用带用户ID的代号。
+- 动态版本号：缓存页面时记录页面中每条动态的版本号，读取时通过一次 MGET 校验，
+  点赞、收藏、评论只递增该动态的版本号，只有包含这条动态的缓存页面失效。
+计数器和版本号保存在 master_cache 的 Redis 原生键中。
+"""
+from django.core.cache import caches
+from django_redis import get_redis_connection
+
+
+# 所有动态列表（社区列表、热门、分页加载）共用的代号
+MOMENT_LIST_GENERATION = 'moment_list'
+
+
+def generation_key(name):
+    """代计数器键"""
+    return f'cache_gen:{name}'
+
+
+def moment_version_key(moment_id):
+    """动态版本号键"""
+    return f'cache_ver:moment:{moment_id}'
+
+
+def get_generation(name):
+    """获取代号"""
+    try:
+        generation = get_redis_connection('master_cache').get(generation_key(name))
+        return int(generation) if generation else 0
+    except Exception as e:
+        print(f"缓存代号读取失败: {e}")
+        return 0
+
+
+def bump_generation(*names):
+    """递增代号，使对应的缓存失效"""
+    try:
+        pipe = get_redis_connection('master_cache').pipeline()
+        for name in names:
+            pipe.incr(generation_key(name))
+        pipe.execute()
+    except Exception as e:
+        print(f"缓存代号更新失败: {e}")
+
+
+def bump_moment_versions(*moment_ids):
+    """递增动态版本号，使包含这些动态的缓存页面失效"""
+    try:
+        pipe = get_redis_connection('master_cache').pipeline()
+        for moment_id in moment_ids:
+            pipe.incr(moment_version_key(moment_id))
+        pipe.execute()
+    except Exception as e:
+        print(f"动态版本号更新失败: {e}")
+
+
+def get_moment_versions(moment_ids):
+    """批量获取动态版本号"""
+    if not moment_ids:
+        return []
+    versions = get_redis_connection('master_cache').mget([moment_version_key(moment_id) for moment_id in moment_ids])
+    return [int(version) if version else 0 for version in versions]
+
+
+def tagged_key(base_key, generation_name):
+    """生成带代号的缓存键"""
+    return f'{base_key}:g{get_generation(generation_name)}'
+
+
+def get_tagged(key):
+    """读取缓存，包含的动态版本号有变化时视为未命中"""
+    try:
+        entry = caches['master_cache'].get(key)
+        if entry is None:
+            return None
+        if get_moment_versions(entry['moment_ids']) != entry['versions']:
+            return None
+        return entry['data']
+    except Exception as e:
+        print(f"缓存读取失败: {e}")
+        return None
+
+
+def set_tagged(key, data, moment_ids, timeout):
+    """写入缓存并记录包含的动态的当前版本号"""
+    try:
+        moment_ids = list(moment_ids)
+        caches['master_cache'].set(key, {
+            'data': data,
+            'moment_ids': moment_ids,
+            'versions': get_moment_versions(moment_ids),
+        }, timeout)
+    except Exception as e:
+        print(f"缓存写入失败: {e}")
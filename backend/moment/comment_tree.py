@@ -0,0 +1,77 @@
+"""动态评论树
+
+一次查询取出评论（连同用户和用户资料），一次查询取出当前用户点赞过的评论ID，
+在内存中组装“一级评论 + 二级回复”的结构，查询次数与评论数量无关。
+
+一级评论按发布时间倒序（按ID）支持游标分页：传入 page_size 时只加载当前页的一级评论
+及其回复，游标为上一页最后一条一级评论的ID；不传时返回全部评论。
+"""
+from .models import Comment, CommentLike
+from .timeline import decode_cursor, encode_cursor
+
+
+# 每页一级评论数量上限
+MAX_COMMENT_PAGE_SIZE = 50
+
+
+def _avatar_url(user):
+    """获取评论用户头像"""
+    profile = getattr(user, 'profile', None)
+    return profile.userAvatar.url if profile and profile.userAvatar else ''
+
+
+def _serialize(comment, viewer_id, liked_ids):
+    """序列化单条评论"""
+    return {
+        'id': comment.id,
+        'user': comment.user.name,
+        'avatar': _avatar_url(comment.user),
+        'content': comment.content,
+        'created_at': comment.created_at,
+        'parent_id': comment.parent_id,
+        'is_author': comment.user_id == viewer_id,
+        'likes': comment.likes,
+        'is_liked': comment.id in liked_ids,
+    }
+
+
+def load_comment_tree(moment, viewer=None, cursor=None, page_size=None):
+    """加载动态的评论树，返回 (一级评论列表, 下一页游标或 None)"""
+    viewer_id = viewer.id if viewer is not None and viewer.is_authenticated else None
+    comments = Comment.objects.filter(moment=moment).select_related('user__profile')
+
+    next_cursor = None
+    if page_size:
+        page_size = max(1, min(page_size, MAX_COMMENT_PAGE_SIZE))
+        threads = comments.filter(parent_id__isnull=True).order_by('-id')
+        before_id = decode_cursor(cursor) if cursor else None
+        if before_id:
+            threads = threads.filter(id__lt=before_id)
+        threads = list(threads[:page_size + 1])
+        if len(threads) > page_size:
+            threads = threads[:page_size]
+            next_cursor = encode_cursor(threads[-1].id)
+        replies = list(comments.filter(parent_id__in=[thread.id for thread in threads]))
+    else:
+        all_comments = list(comments.order_by('-created_at', '-id'))
+        threads = [comment for comment in all_comments if comment.parent_id is None]
+        replies = [comment for comment in all_comments if comment.parent_id is not None]
+
+    # 当前用户点赞过的评论（一次查询）
+    liked_ids = set()
+    if viewer_id:
+        liked_ids = set(CommentLike.objects.filter(
+            user_id=viewer_id,
+            comment_id__in=[comment.id for comment in threads + replies]
+        ).values_list('comment_id', flat=True))
+
+    replies_by_parent = {}
+    for reply in replies:
+        replies_by_parent.setdefault(reply.parent_id, []).append(_serialize(reply, viewer_id, liked_ids))
+
+    tree = []
+    for thread in threads:
+        item = _serialize(thread, viewer_id, liked_ids)
+        item['replies'] = replies_by_parent.get(thread.id, [])
+        tree.append(item)
+    return tree, next_cursor
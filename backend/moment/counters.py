@@ -0,0 +1,266 @@
+"""动态互动计数
+
+每条动态的点赞、评论、收藏、浏览数保存在 Redis 哈希 moment:counters:{动态ID} 中（原生键），
+与动态正文缓存（见 bodies）分开，列表页通过一次管道读取整页计数后合并到正文中。
+
+点赞、收藏、浏览数采用写缓冲：请求只对增量哈希 moment:counters:delta:{动态ID} 执行 HINCRBY，
+并把动态ID加入待落库集合，不再逐次更新 Moment 行（热门动态的行锁争用）；
+定时任务 flush_counters 把增量合并为批量 UPDATE 写入数据库，并重新计算热度分和热门排行。
+读取的计数 = 数据库中的值 + 尚未落库的增量；评论数仍由评论接口直接写入数据库。
+
+计数哈希未命中时从数据库加载，加载后由 Lua 脚本原子地合并增量并写入；数据库中的计数被修改前后
+（落库、评论数变化）递增纪元 moment:counters:epoch，加载期间纪元变化时只返回结果不写入缓存，
+避免把读取时已过期的数据库值缓存一天；落库提交与扣除增量之间纪元不变，
+这段时间写入的计数哈希可能重复计入增量，扣除增量时删除已落库动态的计数哈希。
+"""
+import os
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django_redis import get_redis_connection
+
+from .models import Moment
+
+
+# 计数字段
+COUNTER_FIELDS = ('likes', 'comments', 'favorites', 'view_count')
+
+# 写缓冲的计数字段
+BUFFERED_FIELDS = ('likes', 'favorites', 'view_count')
+
+# 计数哈希缓存时间（秒）
+COUNTERS_CACHE_TTL = int(os.getenv('MOMENT_COUNTERS_CACHE_TTL', 86400))
+
+# 每批落库的动态数量
+COUNTERS_FLUSH_BATCH_SIZE = int(os.getenv('MOMENT_COUNTERS_FLUSH_BATCH_SIZE', 500))
+
+# 待落库的动态ID集合
+DIRTY_KEY = 'moment:counters:dirty'
+
+# 计数纪元，数据库中的计数被修改时递增
+EPOCH_KEY = 'moment:counters:epoch'
+
+# 记录增量，计数哈希已加载时同步更新，返回更新后的计数（未加载时返回 nil）
+_INCR_COUNTER = """
+redis.call('hincrby', KEYS[1], ARGV[1], ARGV[2])
+redis.call('sadd', KEYS[2], ARGV[3])
+if redis.call('exists', KEYS[3]) == 1 then
+    return redis.call('hincrby', KEYS[3], ARGV[1], ARGV[2])
+end
+return false
+"""
+
+# 扣除已落库的增量，增量全部为0时删除增量哈希并移出待落库集合
+_SETTLE_DELTA = """
+for i = 1, #ARGV - 1, 2 do
+    redis.call('hincrby', KEYS[1], ARGV[i], -tonumber(ARGV[i + 1]))
+end
+for _, value in ipairs(redis.call('hvals', KEYS[1])) do
+    if tonumber(value) ~= 0 then
+        return 0
+    end
+end
+redis.call('del', KEYS[1])
+redis.call('srem', KEYS[2], ARGV[#ARGV])
+return 1
+"""
+
+
+# 加载计数哈希：计数 = 数据库值 + 当前增量，纪元未变化且哈希不存在时才写入，返回各字段计数
+_LOAD_COUNTERS = """
+local result = {}
+if redis.call('exists', KEYS[1]) == 1 then
+    for i = 2, #ARGV - 1, 2 do
+        result[#result + 1] = redis.call('hget', KEYS[1], ARGV[i])
+    end
+    return result
+end
+for i = 2, #ARGV - 1, 2 do
+    result[#result + 1] = tonumber(ARGV[i + 1]) + tonumber(redis.call('hget', KEYS[2], ARGV[i]) or 0)
+end
+if (redis.call('get', KEYS[3]) or '') == ARGV[1] then
+    for n = 1, #result do
+        redis.call('hset', KEYS[1], ARGV[2 * n], result[n])
+    end
+    redis.call('expire', KEYS[1], ARGV[#ARGV])
+end
+return result
+"""
+
+
+def counters_key(moment_id):
+    """计数哈希键"""
+    return f'moment:counters:{moment_id}'
+
+
+def delta_key(moment_id):
+    """未落库增量哈希键"""
+    return f'moment:counters:delta:{moment_id}'
+
+
+def _decode_hash(values):
+    """把 Redis 哈希转换为 {字段: 整数}"""
+    return {field.decode(): int(value) for field, value in values.items()}
+
+
+def _load_counters(moment_ids, redis_conn=None):
+    """从数据库读取计数，并加上尚未落库的增量"""
+    counters = {
+        row['id']: {field: row[field] for field in COUNTER_FIELDS}
+        for row in Moment.objects.filter(id__in=moment_ids).values('id', *COUNTER_FIELDS)
+    }
+    if redis_conn is None:
+        return counters
+
+    moment_ids = list(counters)
+    pipe = redis_conn.pipeline()
+    for moment_id in moment_ids:
+        pipe.hgetall(delta_key(moment_id))
+    for moment_id, delta in zip(moment_ids, pipe.execute()):
+        for field, amount in _decode_hash(delta).items():
+            counters[moment_id][field] += amount
+    return counters
+
+
+def get_counters(moment_ids):
+    """批量获取计数，返回 {动态ID: {字段: 数值}}"""
+    moment_ids = list(moment_ids)
+    if not moment_ids:
+        return {}
+
+    try:
+        redis_conn = get_redis_connection('master_cache')
+        pipe = redis_conn.pipeline()
+        for moment_id in moment_ids:
+            pipe.hgetall(counters_key(moment_id))
+        cached = pipe.execute()
+    except Exception as e:
+        print(f"动态计数缓存读取失败: {e}")
+        return _load_counters(moment_ids)
+
+    counters = {}
+    missing_ids = []
+    for moment_id, values in zip(moment_ids, cached):
+        if values:
+            counters[moment_id] = _decode_hash(values)
+        else:
+            missing_ids.append(moment_id)
+
+    if missing_ids:
+        try:
+            # 先读取纪元再读取数据库，加载期间计数被修改时不写入缓存
+            epoch = redis_conn.get(EPOCH_KEY)
+            epoch = epoch.decode() if epoch else ''
+            loaded_ids = []
+            pipe = redis_conn.pipeline()
+            for moment_id, values in _load_counters(missing_ids).items():
+                args = [value for field in COUNTER_FIELDS for value in (field, values[field])]
+                pipe.eval(
+                    _LOAD_COUNTERS, 3, counters_key(moment_id), delta_key(moment_id), EPOCH_KEY,
+                    epoch, *args, COUNTERS_CACHE_TTL
+                )
+                loaded_ids.append(moment_id)
+            loaded = {
+                moment_id: {field: int(value or 0) for field, value in zip(COUNTER_FIELDS, values)}
+                for moment_id, values in zip(loaded_ids, pipe.execute())
+            }
+        except Exception as e:
+            print(f"动态计数缓存写入失败: {e}")
+            loaded = _load_counters(missing_ids)
+        counters.update(loaded)
+    return counters
+
+
+def incr_counter(moment_id, field, amount=1):
+    """增加计数（写入缓冲，由 flush_counters 落库），返回更新后的计数"""
+    try:
+        redis_conn = get_redis_connection('master_cache')
+        value = redis_conn.eval(
+            _INCR_COUNTER, 3, delta_key(moment_id), DIRTY_KEY, counters_key(moment_id),
+            field, amount, moment_id
+        )
+        if value is not None:
+            return int(value)
+        return get_counters([moment_id]).get(moment_id, {}).get(field, 0)
+    except Exception as e:
+        print(f"动态计数缓冲写入失败: {e}")
+        # 回退到直接更新数据库
+        Moment.objects.filter(id=moment_id).update(**{field: F(field) + amount})
+        return Moment.objects.filter(id=moment_id).values_list(field, flat=True).first() or 0
+
+
+def reset_counters(moment_id):
+    """数据库中的计数被直接修改后（如评论数）清除计数哈希，下次读取时重新加载"""
+    try:
+        pipe = get_redis_connection('master_cache').pipeline()
+        pipe.incr(EPOCH_KEY)
+        pipe.delete(counters_key(moment_id))
+        pipe.execute()
+    except Exception as e:
+        print(f"动态计数缓存清除失败: {e}")
+
+
+def hydrate_counters(items):
+    """把最新计数合并到以动态ID为键的字典列表中（原地修改）"""
+    counters = get_counters([item['id'] for item in items])
+    for item in items:
+        item.update(counters.get(item['id'], {}))
+    return items
+
+
+def _flush_batch(redis_conn, moment_ids):
+    """把一批动态的增量写入数据库，返回实际有增量的动态ID"""
+    pipe = redis_conn.pipeline()
+    for moment_id in moment_ids:
+        pipe.hgetall(delta_key(moment_id))
+    deltas = {}
+    for moment_id, delta in zip(moment_ids, pipe.execute()):
+        delta = {field: amount for field, amount in _decode_hash(delta).items() if field in BUFFERED_FIELDS and amount}
+        if delta:
+            deltas[moment_id] = delta
+        else:
+            # 增量已为0（如点赞后又取消），直接清理
+            redis_conn.eval(_SETTLE_DELTA, 2, delta_key(moment_id), DIRTY_KEY, moment_id)
+    if not deltas:
+        return []
+
+    # 每个字段一个 CASE 表达式，整批动态一条 UPDATE
+    updates = {}
+    for field in BUFFERED_FIELDS:
+        whens = [When(id=moment_id, then=Value(delta[field])) for moment_id, delta in deltas.items() if field in delta]
+        if whens:
+            updates[field] = F(field) + Case(*whens, default=Value(0), output_field=IntegerField())
+    # 落库前后各递增一次纪元，期间加载的计数不会写入缓存
+    redis_conn.incr(EPOCH_KEY)
+    with transaction.atomic():
+        Moment.objects.filter(id__in=list(deltas)).update(**updates)
+
+    # 落库成功后再扣除增量，落库失败时增量保留到下次；
+    # 落库提交后、扣除增量前加载的计数哈希会把增量重复计入，扣除时一并删除，下次读取时重新加载
+    pipe = redis_conn.pipeline()
+    for moment_id, delta in deltas.items():
+        args = [value for item in delta.items() for value in item]
+        pipe.eval(_SETTLE_DELTA, 2, delta_key(moment_id), DIRTY_KEY, *args, moment_id)
+        pipe.delete(counters_key(moment_id))
+    pipe.incr(EPOCH_KEY)
+    pipe.execute()
+    return list(deltas)
+
+
+def flush_counters(batch_size=COUNTERS_FLUSH_BATCH_SIZE):
+    """把缓冲的计数增量批量写入数据库并重新计算热度分，返回落库的动态数量"""
+    from .hot_score import refresh_hot_scores
+    from .ranking import update_rankings
+
+    redis_conn = get_redis_connection('master_cache')
+    # SSCAN 可能返回重复成员
+    moment_ids = list(dict.fromkeys(int(moment_id) for moment_id in redis_conn.sscan_iter(DIRTY_KEY, count=batch_size)))
+
+    total = 0
+    for start in range(0, len(moment_ids), batch_size):
+        flushed_ids = _flush_batch(redis_conn, moment_ids[start:start + batch_size])
+        if flushed_ids:
+            refresh_hot_scores(flushed_ids)
+            update_rankings(flushed_ids)
+            total += len(flushed_ids)
+    return total
@@ -0,0 +1,58 @@
+"""动态热度分
+
+热度分持久化在 Moment.hot_score 字段，并建立 (is_shared, hot_score) 联合索引，
+热门列表直接按索引顺序分页，无需把所有动态加载到内存中排序。
+
+热度分 = log10(max(互动加权分, 1)) + (发布时间 - 基准时间) / 衰减周期
+互动加权与 Moment.get_hot_score 一致；发布时间项让新动态自然排在旧动态之前（时间衰减），
+发布时间每晚一个衰减周期（默认12.5小时），需要多10倍的互动才能排在同一位置。
+因为时间项在发布时就已确定，热度分只需在互动数变化时重新计算，不需要定期全表刷新。
+"""
+import math
+import os
+
+
+# 热度分的时间基准（2024-01-01 00:00:00 UTC）
+HOT_SCORE_EPOCH = 1704067200
+
+# 衰减周期（秒）
+HOT_SCORE_DECAY_SECONDS = int(os.getenv('MOMENT_HOT_SCORE_DECAY_SECONDS', 45000))
+
+
+def compute_hot_score(likes, comments, favorites, view_count, created_at):
+    """计算带时间衰减的热度分"""
+    weighted = likes * 1.0 + comments * 2.0 + favorites * 1.5 + view_count * 0.1
+    age_score = (created_at.timestamp() - HOT_SCORE_EPOCH) / HOT_SCORE_DECAY_SECONDS
+    return round(math.log10(max(weighted, 1)) + age_score, 7)
+
+
+def update_hot_score(moment):
+    """根据动态当前的互动数更新热度分（moment 需为刷新后的实例）"""
+    from .models import Moment
+    moment.hot_score = compute_hot_score(
+        moment.likes, moment.comments, moment.favorites, moment.view_count, moment.created_at
+    )
+    Moment.objects.filter(id=moment.id).update(hot_score=moment.hot_score)
+    return moment.hot_score
+
+
+def refresh_hot_scores(moment_ids=None, batch_size=1000):
+    """批量重新计算热度分（moment_ids 为空时处理全部动态），返回更新数量"""
+    from .models import Moment
+    queryset = Moment.objects.all()
+    if moment_ids is not None:
+        queryset = queryset.filter(id__in=list(moment_ids))
+
+    moments = []
+    total = 0
+    for moment in queryset.only('id', 'likes', 'comments', 'favorites', 'view_count', 'created_at').iterator():
+        moment.hot_score = compute_hot_score(
+            moment.likes, moment.comments, moment.favorites, moment.view_count, moment.created_at
+        )
+        moments.append(moment)
+        if len(moments) >= batch_size:
+            total += Moment.objects.bulk_update(moments, ['hot_score'])
+            moments = []
+    if moments:
+        total += Moment.objects.bulk_update(moments, ['hot_score'])
+    return total
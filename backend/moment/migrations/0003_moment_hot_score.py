@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+def backfill_hot_score(apps, schema_editor):
+    """按现有互动数计算热度分"""
+    from moment.hot_score import compute_hot_score
+    Moment = apps.get_model('moment', 'Moment')
+    moments = []
+    for moment in Moment.objects.only('id', 'likes', 'comments', 'favorites', 'view_count', 'created_at').iterator():
+        moment.hot_score = compute_hot_score(
+            moment.likes, moment.comments, moment.favorites, moment.view_count, moment.created_at
+        )
+        moments.append(moment)
+        if len(moments) >= 1000:
+            Moment.objects.bulk_update(moments, ['hot_score'])
+            moments = []
+    if moments:
+        Moment.objects.bulk_update(moments, ['hot_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moment', '0002_comment_likes_commentlike'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moment',
+            name='hot_score',
+            field=models.FloatField(default=0, verbose_name='热度分'),
+        ),
+        migrations.AddIndex(
+            model_name='moment',
+            index=models.Index(fields=['is_shared', '-hot_score'], name='moment_mome_is_shar_fc467b_idx'),
+        ),
+        migrations.RunPython(backfill_hot_score, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:00
+
+from django.db import migrations
+
+
+def add_fulltext_index(apps, schema_editor):
+    """content 字段建立 ngram 全文索引（仅 MySQL）"""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE moment_moment '
+        'ADD FULLTEXT INDEX moment_moment_content_ft (content) WITH PARSER ngram'
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute('ALTER TABLE moment_moment DROP INDEX moment_moment_content_ft')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moment', '0003_moment_hot_score'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moment', '0004_moment_content_fulltext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='momentimage',
+            name='thumbnail_widths',
+            field=models.JSONField(blank=True, default=list, verbose_name='缩略图宽度'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moment', '0005_momentimage_thumbnail_widths'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moment',
+            index=models.Index(fields=['is_shared', '-created_at', '-id'], name='moment_mome_is_shar_7f2e3a_idx'),
+        ),
+    ]
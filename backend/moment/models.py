@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from core.models import User
+from .hot_score import compute_hot_score
 
 
 # 发布动态
@@ -21,6 +25,15 @@ class Moment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     is_shared = models.BooleanField(default=False)  
     tags = models.ManyToManyField(Tag, blank=True, related_name='moments')  
+    hot_score = models.FloatField(default=0, verbose_name='热度分')
+
+    def save(self, *args, **kwargs):
+        # 新动态按发布时间计算初始热度分
+        if self._state.adding and not self.hot_score:
+            self.hot_score = compute_hot_score(
+                self.likes, self.comments, self.favorites, self.view_count, self.created_at or timezone.now()
+            )
+        super().save(*args, **kwargs)
 
     def get_hot_score(self):
         """计算热度值"""
@@ -30,6 +43,12 @@ class Moment(models.Model):
     class Meta:
         verbose_name = '社区动态'
         verbose_name_plural = '社区动态'
+        indexes = [
+            # 热门列表按热度分倒序分页
+            models.Index(fields=['is_shared', '-hot_score']),
+            # 最新列表按发布时间游标分页
+            models.Index(fields=['is_shared', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return f'{self.user.username} 的动态 - {self.created_at}'
@@ -38,6 +57,7 @@ class Moment(models.Model):
 class MomentImage(models.Model):
     moment = models.ForeignKey(Moment, on_delete=models.CASCADE, related_name='moment_images')
     image = models.ImageField(upload_to='moment_images/%Y/%m/%d/')
+    thumbnail_widths = models.JSONField(default=list, blank=True, verbose_name='缩略图宽度')
 
     def __str__(self):
         return f'图片 for {self.moment}'
@@ -85,4 +105,68 @@ class Like(models.Model):
         return f'{self.user.username} 点赞了 {self.moment}'
 
 
+def enqueue_fan_out(moment_id):
+    """提交后把分享的动态推送到粉丝的关注时间线"""
+    from .tasks import fan_out_moment_to_followers
+    transaction.on_commit(lambda: fan_out_moment_to_followers.delay(moment_id))
+
+
+# 信号处理函数
+@receiver(post_save, sender=Moment)
+def fan_out_created_moment(sender, instance, created, **kwargs):
+    """直接以分享状态发布的动态推送到粉丝的关注时间线（通过 publish 发布的由异步任务推送）"""
+    if created and instance.is_shared and not getattr(instance, '_defer_side_effects', False):
+        enqueue_fan_out(instance.id)
+
+
+@receiver(post_save, sender='user.Follow')
+def reset_follower_timeline(sender, instance, **kwargs):
+    """关注或取消关注后重建关注者的时间线"""
+    from .timeline import invalidate_timeline
+    follower_id = instance.follower_id
+    transaction.on_commit(lambda: invalidate_timeline(follower_id))
+
+
+@receiver(m2m_changed, sender=Moment.tags.through)
+def count_moment_tag_changes(sender, instance, action, reverse, pk_set, **kwargs):
+    """分享的动态添加或移除标签时更新热门标签计数"""
+    if reverse or not pk_set or not isinstance(instance, Moment) or not instance.is_shared:
+        return
+    from .trending import record_tag_usage
+    if action == 'post_add':
+        record_tag_usage(pk_set, instance.created_at, 1)
+    elif action == 'post_remove':
+        record_tag_usage(pk_set, instance.created_at, -1)
+
+
+@receiver(pre_delete, sender=Moment)
+def uncount_deleted_moment_tags(sender, instance, **kwargs):
+    """删除分享的动态时扣除其标签的使用次数"""
+    if instance.is_shared:
+        from .trending import record_moment_tags
+        record_moment_tags(instance, -1)
+
+
+@receiver(post_delete, sender=Moment)
+def remove_deleted_moment_from_rankings(sender, instance, **kwargs):
+    """删除的动态移出热门排行"""
+    from .ranking import remove_from_rankings
+    moment_id = instance.id
+    transaction.on_commit(lambda: remove_from_rankings(moment_id))
+
+
+@receiver(post_save, sender=MomentImage)
+def create_moment_image_thumbnails(sender, instance, created, **kwargs):
+    """上传动态图片后异步生成缩略图（批量发布的图片由 process_new_moment 处理）"""
+    if created:
+        from core.thumbnails import enqueue_thumbnails
+        enqueue_thumbnails(instance, 'image')
+
 
+@receiver(post_save, sender='core.Profile')
+@receiver(post_save, sender='vip.VIPMember')
+def bump_moment_author_version(sender, instance, **kwargs):
+    """用户资料、头像或 VIP 变化后，使包含该用户信息的动态正文缓存失效"""
+    from .bodies import bump_author_version
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_author_version(user_id))
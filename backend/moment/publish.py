@@ -0,0 +1,65 @@
+"""发布动态
+
+发布时只在一个事务中写入动态、标签和图片：
+- 标签：一次 IN 查询找出已有标签，缺少的用 bulk_create(ignore_conflicts) 批量创建，再一次性关联；
+- 图片：MomentImage 批量插入；
+- 图片缩略图、成就解锁、动态列表缓存失效、关注时间线推送、热门排行等副作用在事务提交后交给异步任务 process_new_moment，
+  不在请求中逐条触发。
+"""
+from django.db import transaction
+
+from .models import Moment, MomentImage, Tag
+
+
+# 标签名称最大长度（与 Tag.name 一致）
+TAG_NAME_MAX_LENGTH = 50
+
+
+def normalize_tag_names(tag_names):
+    """去掉 # 号和空白，去重并保持顺序"""
+    names = []
+    for tag_name in tag_names:
+        tag_name = tag_name.replace('#', '').strip()[:TAG_NAME_MAX_LENGTH]
+        if tag_name and tag_name not in names:
+            names.append(tag_name)
+    return names
+
+
+def resolve_tags(tag_names):
+    """批量获取或创建标签，返回标签ID列表"""
+    tag_names = normalize_tag_names(tag_names)
+    if not tag_names:
+        return []
+
+    tag_ids = dict(Tag.objects.filter(name__in=tag_names).values_list('name', 'id'))
+    missing_names = [tag_name for tag_name in tag_names if tag_name not in tag_ids]
+    if missing_names:
+        # 并发创建同名标签时忽略冲突，再查询一次取得ID
+        Tag.objects.bulk_create([Tag(name=tag_name) for tag_name in missing_names], ignore_conflicts=True)
+        tag_ids.update(Tag.objects.filter(name__in=missing_names).values_list('name', 'id'))
+    return [tag_ids[tag_name] for tag_name in tag_names if tag_name in tag_ids]
+
+
+def enqueue_moment_side_effects(moment_id):
+    """提交后异步处理发布动态的副作用"""
+    from .tasks import process_new_moment
+    transaction.on_commit(lambda: process_new_moment.delay(moment_id))
+
+
+def publish_moment(user, content, tag_names=(), images=(), is_shared=False):
+    """发布动态，返回创建的动态"""
+    with transaction.atomic():
+        moment = Moment(user=user, content=content, is_shared=is_shared)
+        # 副作用由 process_new_moment 处理，post_save 信号中跳过
+        moment._defer_side_effects = True
+        moment.save()
+
+        tag_ids = resolve_tags(tag_names)
+        if tag_ids:
+            moment.tags.add(*tag_ids)
+
+        if images:
+            MomentImage.objects.bulk_create([MomentImage(moment=moment, image=image) for image in images])
+
+        enqueue_moment_side_effects(moment.id)
+    return moment
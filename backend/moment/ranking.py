@@ -0,0 +1,218 @@
+"""热门排行
+
+热门动态、热门收藏等排行统一由本模块维护：每种排行（得分公式）× 每个时间窗口对应一个
+Redis 有序集合 ranking:{排行}:{窗口}（原生键，成员为动态ID，分数为得分），只保留前 RANKING_MAX_SIZE 条。
+- 动态计数落库、评论数变化、分享/取消分享时调用 update_rankings 重新计算这些动态的得分；
+- 删除的动态通过信号移出排行；
+- 发布时间超出窗口的动态由定时任务 prune_rankings 按 ranking:published（发布时间）移出；
+- 首次使用（或 Redis 数据丢失后）从数据库回填。
+读取排行只需一次 ZREVRANGE，只统计分享到社区的动态。
+"""
+import datetime
+import os
+
+from django.db.models import F, Value
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .models import Moment
+
+
+# 排行得分公式：计数字段的加权和
+RANKINGS = {
+    # 热门动态，与 Moment.get_hot_score 一致
+    'hot': {'likes': 1.0, 'comments': 2.0, 'favorites': 1.5, 'view_count': 0.1},
+    # 热门收藏
+    'favorites': {'favorites': 1.0},
+}
+
+# 时间窗口（天数，None 表示全部）
+RANKING_WINDOWS = {
+    '7days': 7,
+    '30days': 30,
+    'all': None,
+}
+
+# 每个排行保留的动态数量
+RANKING_MAX_SIZE = int(os.getenv('MOMENT_RANKING_MAX_SIZE', 1000))
+
+# 动态发布时间（用于移出超出窗口的动态）
+PUBLISHED_KEY = 'ranking:published'
+
+# 已回填标记
+SEEDED_KEY = 'ranking:seeded'
+
+# 最长的有限窗口（天数）
+_MAX_WINDOW_DAYS = max(days for days in RANKING_WINDOWS.values() if days)
+
+
+def ranking_key(name, window):
+    """排行键"""
+    return f'ranking:{name}:{window}'
+
+
+def _all_keys():
+    return [ranking_key(name, window) for name in RANKINGS for window in RANKING_WINDOWS]
+
+
+def compute_score(name, counters):
+    """按排行公式计算得分"""
+    return sum(counters[field] * weight for field, weight in RANKINGS[name].items())
+
+
+def _score_expression(name):
+    """排行公式对应的数据库表达式"""
+    expression = Value(0.0)
+    for field, weight in RANKINGS[name].items():
+        expression = expression + F(field) * weight
+    return expression
+
+
+def _trim(pipe):
+    for key in _all_keys():
+        pipe.zremrangebyrank(key, 0, -(RANKING_MAX_SIZE + 1))
+
+
+def seed_rankings(redis_conn):
+    """从数据库回填所有排行（只执行一次）"""
+    if not redis_conn.set(SEEDED_KEY, 1, nx=True):
+        return
+
+    now = timezone.now()
+    try:
+        pipe = redis_conn.pipeline()
+        for name in RANKINGS:
+            for window, days in RANKING_WINDOWS.items():
+                queryset = Moment.objects.filter(is_shared=True)
+                if days:
+                    queryset = queryset.filter(created_at__gte=now - datetime.timedelta(days=days))
+                rows = queryset.annotate(
+                    ranking_score=_score_expression(name)
+                ).order_by('-ranking_score').values_list('id', 'ranking_score')[:RANKING_MAX_SIZE]
+                key = ranking_key(name, window)
+                pipe.delete(key)
+                scores = {moment_id: score for moment_id, score in rows}
+                if scores:
+                    pipe.zadd(key, scores)
+
+        published = {
+            moment_id: created_at.timestamp()
+            for moment_id, created_at in Moment.objects.filter(
+                is_shared=True,
+                created_at__gte=now - datetime.timedelta(days=_MAX_WINDOW_DAYS)
+            ).values_list('id', 'created_at').iterator()
+        }
+        pipe.delete(PUBLISHED_KEY)
+        if published:
+            pipe.zadd(PUBLISHED_KEY, published)
+        pipe.execute()
+    except Exception:
+        # 回填失败时清除标记，下次重新回填
+        redis_conn.delete(SEEDED_KEY)
+        raise
+
+
+def remove_from_rankings(*moment_ids):
+    """把动态移出所有排行"""
+    if not moment_ids:
+        return
+    try:
+        pipe = get_redis_connection('master_cache').pipeline()
+        for key in _all_keys() + [PUBLISHED_KEY]:
+            pipe.zrem(key, *moment_ids)
+        pipe.execute()
+    except Exception as e:
+        print(f"热门排行更新失败: {e}")
+
+
+def update_rankings(moment_ids):
+    """重新计算动态在各排行中的得分（计数以数据库为准）"""
+    moment_ids = list(moment_ids)
+    if not moment_ids:
+        return
+    try:
+        redis_conn = get_redis_connection('master_cache')
+        # 尚未回填时跳过，回填会从数据库读取
+        if not redis_conn.exists(SEEDED_KEY):
+            return
+
+        now = timezone.now()
+        fields = {field for weights in RANKINGS.values() for field in weights}
+        rows = Moment.objects.filter(id__in=moment_ids).values('id', 'is_shared', 'created_at', *fields)
+
+        pipe = redis_conn.pipeline()
+        stale_ids = set(moment_ids)
+        for row in rows:
+            if not row['is_shared']:
+                continue
+            stale_ids.discard(row['id'])
+            for name in RANKINGS:
+                score = compute_score(name, row)
+                for window, days in RANKING_WINDOWS.items():
+                    key = ranking_key(name, window)
+                    if days is None or row['created_at'] >= now - datetime.timedelta(days=days):
+                        pipe.zadd(key, {row['id']: score})
+                    else:
+                        pipe.zrem(key, row['id'])
+            if row['created_at'] >= now - datetime.timedelta(days=_MAX_WINDOW_DAYS):
+                pipe.zadd(PUBLISHED_KEY, {row['id']: row['created_at'].timestamp()})
+
+        # 已删除或未分享的动态
+        if stale_ids:
+            for key in _all_keys() + [PUBLISHED_KEY]:
+                pipe.zrem(key, *stale_ids)
+        _trim(pipe)
+        pipe.execute()
+    except Exception as e:
+        print(f"热门排行更新失败: {e}")
+
+
+def prune_rankings():
+    """把发布时间超出窗口的动态移出对应排行（由定时任务调用），返回移出的数量"""
+    redis_conn = get_redis_connection('master_cache')
+    now = timezone.now()
+    removed = 0
+    for window, days in RANKING_WINDOWS.items():
+        if not days:
+            continue
+        cutoff = (now - datetime.timedelta(days=days)).timestamp()
+        expired_ids = redis_conn.zrangebyscore(PUBLISHED_KEY, '-inf', cutoff)
+        if not expired_ids:
+            continue
+        pipe = redis_conn.pipeline()
+        for name in RANKINGS:
+            pipe.zrem(ranking_key(name, window), *expired_ids)
+        removed += sum(pipe.execute())
+
+    redis_conn.zremrangebyscore(PUBLISHED_KEY, '-inf', (now - datetime.timedelta(days=_MAX_WINDOW_DAYS)).timestamp())
+    return removed
+
+
+def get_ranking_ids(name, window='7days', limit=20):
+    """获取排行中的动态ID（按得分倒序）"""
+    if window not in RANKING_WINDOWS:
+        window = '7days'
+
+    try:
+        redis_conn = get_redis_connection('master_cache')
+        seed_rankings(redis_conn)
+        return [int(moment_id) for moment_id in redis_conn.zrevrange(ranking_key(name, window), 0, limit - 1)]
+    except Exception as e:
+        print(f"热门排行读取失败: {e}")
+
+    # 回退到数据库查询
+    queryset = Moment.objects.filter(is_shared=True)
+    days = RANKING_WINDOWS[window]
+    if days:
+        queryset = queryset.filter(created_at__gte=timezone.now() - datetime.timedelta(days=days))
+    return list(queryset.annotate(
+        ranking_score=_score_expression(name)
+    ).order_by('-ranking_score').values_list('id', flat=True)[:limit])
+
+
+def get_ranked_moments(name, window='7days', limit=20):
+    """获取排行中的动态（按得分倒序）"""
+    moment_ids = get_ranking_ids(name, window, limit)
+    # 排行可能滞后于管理后台的隐藏、删除操作，读取时再次过滤
+    moments = Moment.objects.filter(is_shared=True).select_related('user__profile').in_bulk(moment_ids)
+    return [moments[moment_id] for moment_id in moment_ids if moment_id in moments]
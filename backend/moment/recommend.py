@@ -0,0 +1,108 @@
+"""推荐动态流
+
+推荐流从候选池中按“用户 + 种子”确定性打乱生成：
+- 候选池为热度最高的若干条分享动态（走 is_shared + hot_score 索引），缓存在 master_cache 中定期刷新；
+- 首次请求生成随机种子，打乱后的ID列表保存为 Redis 列表 moment:recommend:feed:{用户ID}:{种子}；
+- 游标编码了种子和偏移量，翻页时只读取列表的一段（LRANGE），与动态总数无关，
+  同一次浏览中各页不会重复或遗漏；列表过期后用同一种子重新生成，顺序保持一致。
+"""
+import base64
+import os
+import random
+
+from django.core.cache import caches
+from django_redis import get_redis_connection
+
+from .models import Moment
+
+
+# 候选池大小
+RECOMMEND_POOL_SIZE = int(os.getenv('MOMENT_RECOMMEND_POOL_SIZE', 1000))
+
+# 候选池缓存时间（秒）
+RECOMMEND_POOL_TTL = int(os.getenv('MOMENT_RECOMMEND_POOL_TTL', 300))
+
+# 单个推荐流（种子）的保留时间（秒）
+RECOMMEND_FEED_TTL = int(os.getenv('MOMENT_RECOMMEND_FEED_TTL', 1800))
+
+CANDIDATES_CACHE_KEY = 'moment:recommend:candidates'
+
+
+def get_candidate_ids():
+    """获取推荐候选池（按热度排序的动态ID）"""
+    try:
+        candidate_ids = caches['master_cache'].get(CANDIDATES_CACHE_KEY)
+        if candidate_ids is not None:
+            return candidate_ids
+    except Exception as e:
+        print(f"推荐候选池缓存读取失败: {e}")
+
+    candidate_ids = list(Moment.objects.filter(
+        is_shared=True
+    ).order_by('-hot_score', '-id').values_list('id', flat=True)[:RECOMMEND_POOL_SIZE])
+
+    try:
+        caches['master_cache'].set(CANDIDATES_CACHE_KEY, candidate_ids, RECOMMEND_POOL_TTL)
+    except Exception as e:
+        print(f"推荐候选池缓存写入失败: {e}")
+    return candidate_ids
+
+
+def feed_key(user_id, seed):
+    """推荐流列表键"""
+    return f'moment:recommend:feed:{user_id or 0}:{seed}'
+
+
+def encode_cursor(seed, offset):
+    """生成翻页游标"""
+    return base64.urlsafe_b64encode(f'{seed}:{offset}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析翻页游标，无效时返回 None"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        seed, offset = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+        seed, offset = int(seed), int(offset)
+        if offset < 0:
+            return None
+        return seed, offset
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def build_feed(user_id, seed):
+    """按用户和种子确定性打乱候选池"""
+    moment_ids = list(get_candidate_ids())
+    random.Random(f'{user_id or 0}:{seed}').shuffle(moment_ids)
+    return moment_ids
+
+
+def get_recommended_page(user_id, cursor=None, page_size=10):
+    """获取一页推荐动态ID，返回 (动态ID列表, 下一页游标或 None)"""
+    decoded = decode_cursor(cursor) if cursor else None
+    if decoded is None:
+        seed, offset = random.getrandbits(32), 0
+    else:
+        seed, offset = decoded
+
+    # 多取一条判断是否还有下一页
+    end = offset + page_size
+    key = feed_key(user_id, seed)
+    try:
+        redis_conn = get_redis_connection('master_cache')
+        page_ids = [int(moment_id) for moment_id in redis_conn.lrange(key, offset, end)]
+        if not page_ids and not redis_conn.exists(key):
+            moment_ids = build_feed(user_id, seed)
+            if moment_ids:
+                pipe = redis_conn.pipeline()
+                pipe.rpush(key, *moment_ids)
+                pipe.expire(key, RECOMMEND_FEED_TTL)
+                pipe.execute()
+            page_ids = moment_ids[offset:end + 1]
+    except Exception as e:
+        print(f"推荐流缓存读取失败: {e}")
+        page_ids = build_feed(user_id, seed)[offset:end + 1]
+
+    next_cursor = encode_cursor(seed, end) if len(page_ids) > page_size else None
+    return page_ids[:page_size], next_cursor
@@ -0,0 +1,71 @@
+"""动态搜索
+
+动态内容在 MySQL 中建立 ngram 全文索引（见迁移 0004），按相关度排序返回结果，
+替代对内容、用户名、昵称的三重模糊匹配（需要关联用户表全表扫描）。
+作者搜索单独进行：按昵称、手机号前缀匹配（走索引），只返回允许被搜索的用户。
+"""
+import os
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from core.models import User
+from .models import Moment
+
+
+# 单次搜索最多返回的动态数量
+MOMENT_SEARCH_RESULT_LIMIT = int(os.getenv('MOMENT_SEARCH_RESULT_LIMIT', 500))
+
+# 作者搜索最多返回的用户数量
+AUTHOR_SEARCH_LIMIT = 20
+
+# ngram 分词长度（MySQL 默认 ngram_token_size=2），更短的关键词无法命中全文索引
+NGRAM_TOKEN_SIZE = 2
+
+
+def _split_terms(keyword):
+    """拆分关键词并去掉全文检索的布尔运算符"""
+    return [term for term in re.split(r'\s+', re.sub(r'[+\-<>()~*"@]', ' ', keyword)) if term]
+
+
+def search_moment_ids(keyword, queryset=None):
+    """按相关度返回内容匹配的动态ID"""
+    terms = _split_terms(keyword)
+    if not terms:
+        return []
+
+    if queryset is None:
+        queryset = Moment.objects.filter(is_shared=True)
+
+    if connection.vendor == 'mysql' and all(len(term) >= NGRAM_TOKEN_SIZE for term in terms):
+        # 布尔模式要求每个词都以短语形式出现，自然语言模式计算相关度
+        boolean_query = ' '.join(f'+"{term}"' for term in terms)
+        queryset = queryset.annotate(
+            score=RawSQL('MATCH(moment_moment.content) AGAINST (%s IN NATURAL LANGUAGE MODE)', (keyword,))
+        ).extra(
+            where=['MATCH(moment_moment.content) AGAINST (%s IN BOOLEAN MODE)'],
+            params=[boolean_query]
+        ).order_by('-score', '-hot_score')
+    else:
+        # 单字关键词无法使用全文索引，退化为模糊匹配
+        for term in terms:
+            queryset = queryset.filter(content__icontains=term)
+        queryset = queryset.order_by('-hot_score')
+
+    return list(queryset.values_list('id', flat=True)[:MOMENT_SEARCH_RESULT_LIMIT])
+
+
+def search_authors(keyword, limit=AUTHOR_SEARCH_LIMIT):
+    """按昵称或手机号前缀搜索作者"""
+    keyword = keyword.strip()[:30]
+    if not keyword:
+        return User.objects.none()
+
+    return User.objects.filter(
+        Q(name__istartswith=keyword) | Q(username__startswith=keyword),
+        is_active=True
+    ).exclude(
+        profile__allow_search=False
+    ).select_related('profile').order_by('id')[:limit]
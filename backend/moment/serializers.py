@@ -1,6 +1,8 @@
+from django.db.models import Count, Prefetch
 from rest_framework import serializers
 from .models import Moment, MomentImage, Comment, Tag, Like
 from core.serializers import UserSerializer
+from core.thumbnails import build_srcset
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -8,7 +10,9 @@ class TagSerializer(serializers.ModelSerializer):
     moment_count = serializers.SerializerMethodField()
     
     def get_moment_count(self, obj):
-        """获取标签关联的动态数量"""
+        """获取标签关联的动态数量（热门标签使用已统计的数量）"""
+        if hasattr(obj, 'moment_count'):
+            return obj.moment_count
         return obj.moments.count()
     
     class Meta:
@@ -18,9 +22,15 @@ class TagSerializer(serializers.ModelSerializer):
 
 class MomentImageSerializer(serializers.ModelSerializer):
     """动态图片序列化器"""
+    srcset = serializers.SerializerMethodField()
+    
+    def get_srcset(self, obj):
+        """缩略图 srcset"""
+        return build_srcset(obj.image, obj.thumbnail_widths, self.context.get('request'))
+    
     class Meta:
         model = MomentImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'srcset']
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -52,21 +62,58 @@ class MomentSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         """创建动态"""
-        images_data = self.context['request'].FILES.getlist('images')
-        tags_data = self.context['request'].data.getlist('tags', [])
-        
-        moment = Moment.objects.create(**validated_data)
+        from .publish import publish_moment
         
-        # 处理图片
-        for image_data in images_data:
-            MomentImage.objects.create(moment=moment, image=image_data)
+        request = self.context['request']
+        images_data = request.FILES.getlist('images')
+        tags_data = request.data.getlist('tags', [])
         
-        # 处理标签
-        for tag_name in tags_data:
-            tag, created = Tag.objects.get_or_create(name=tag_name)
-            moment.tags.add(tag)
-        
-        return moment
+        # 标签和图片批量写入，副作用异步处理
+        return publish_moment(
+            validated_data.get('user', request.user),
+            validated_data['content'],
+            tag_names=tags_data,
+            images=images_data,
+            is_shared=validated_data.get('is_shared', False)
+        )
+
+
+# 动态列表中每条动态展示的最新评论数量
+FEED_LATEST_COMMENTS = 3
+
+
+def feed_queryset(queryset):
+    """为动态列表预加载作者、图片、标签和最新评论，一页动态的查询次数固定"""
+    return queryset.select_related('user__profile', 'user__vip').prefetch_related(
+        'moment_images',
+        Prefetch('tags', queryset=Tag.objects.annotate(moment_count=Count('moments'))),
+        Prefetch(
+            'comment_set',
+            queryset=Comment.objects.select_related('user__profile', 'user__vip').order_by('-created_at')[:FEED_LATEST_COMMENTS],
+            to_attr='latest_comments'
+        ),
+    )
+
+
+class FeedCommentSerializer(serializers.ModelSerializer):
+    """动态列表中的评论（不含回复）"""
+    user = UserSerializer(read_only=True)
+    
+    class Meta:
+        model = Comment
+        fields = ['id', 'user', 'content', 'created_at', 'parent']
+
+
+class MomentFeedSerializer(serializers.ModelSerializer):
+    """动态列表序列化器：只包含最新几条评论，配合 feed_queryset 使用"""
+    user = UserSerializer(read_only=True)
+    moment_images = MomentImageSerializer(many=True, read_only=True)
+    latest_comments = FeedCommentSerializer(many=True, read_only=True)
+    tags = TagSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = Moment
+        fields = ['id', 'user', 'content', 'likes', 'comments', 'favorites', 'created_at', 'is_shared', 'moment_images', 'latest_comments', 'tags', 'view_count']
 
 
 class LikeSerializer(serializers.ModelSerializer):
@@ -0,0 +1,59 @@
+"""动态异步任务"""
+from celery import shared_task
+
+from core.thumbnails import generate_thumbnails
+
+from .bodies import invalidate_bodies
+from .cache_tags import MOMENT_LIST_GENERATION, bump_generation
+from .counters import flush_counters
+from .models import Moment
+from .ranking import prune_rankings, update_rankings
+from .timeline import fan_out_moment
+
+
+@shared_task
+def fan_out_moment_to_followers(moment_id):
+    """把分享的动态写入粉丝的关注时间线"""
+    count = fan_out_moment(moment_id)
+    if count:
+        print(f"动态已推送到 {count} 个粉丝的时间线: {moment_id}")
+
+
+@shared_task
+def flush_moment_counters():
+    """把缓冲的点赞、收藏、浏览数批量写入数据库"""
+    count = flush_counters()
+    if count:
+        print(f"已落库 {count} 条动态的计数")
+
+
+@shared_task
+def prune_moment_rankings():
+    """把发布时间超出窗口的动态移出热门排行"""
+    count = prune_rankings()
+    if count:
+        print(f"已从热门排行移出 {count} 条过期动态")
+
+
+@shared_task
+def process_new_moment(moment_id):
+    """处理发布动态的副作用：图片缩略图、成就解锁、动态列表缓存失效、关注时间线推送、热门排行"""
+    from user.models import unlock_record_moment_achievement
+
+    moment = Moment.objects.select_related('user').filter(id=moment_id).first()
+    if moment is None:
+        return
+
+    # 生成动态图片的缩略图（批量插入的图片不会触发 post_save）
+    for moment_image in moment.moment_images.all():
+        try:
+            generate_thumbnails(moment_image, 'image')
+        except Exception as e:
+            print(f"缩略图生成失败: 动态图片 {moment_image.id} {e}")
+    invalidate_bodies(moment.id)
+    
+    unlock_record_moment_achievement(Moment, moment, created=True)
+    bump_generation(MOMENT_LIST_GENERATION)
+    if moment.is_shared:
+        fan_out_moment(moment.id)
+        update_rankings([moment.id])
@@ -0,0 +1,199 @@
+"""关注动态时间线
+
+写扩散：动态分享后由异步任务把动态ID写入每个粉丝的收件箱 timeline:{用户ID}，
+收件箱是按动态ID排序的 Redis 有序集合（原生键），只保留最新的 TIMELINE_MAX_LENGTH 条。
+读扩散兜底：粉丝数超过 TIMELINE_FANOUT_LIMIT 的大V动态不写入收件箱，读取时按作者单独查询后合并。
+
+收件箱中额外保存一个占位成员（分数为0），用于区分“未加载”和“没有动态”；
+收件箱不存在时（首次访问、过期或关注关系变化后）从数据库重建。
+取消分享或删除的动态不会从收件箱中移除，读取时过滤。
+"""
+import base64
+import os
+
+from django.core.cache import caches
+from django.db.models import Count
+from django_redis import get_redis_connection
+
+from .models import Moment
+
+
+# 每个收件箱保留的最大动态数量
+TIMELINE_MAX_LENGTH = int(os.getenv('MOMENT_TIMELINE_MAX_LENGTH', 800))
+
+# 粉丝数超过该值的作者不做写扩散
+TIMELINE_FANOUT_LIMIT = int(os.getenv('MOMENT_TIMELINE_FANOUT_LIMIT', 5000))
+
+# 收件箱缓存时间（秒）
+TIMELINE_CACHE_TTL = int(os.getenv('MOMENT_TIMELINE_CACHE_TTL', 7 * 86400))
+
+# 大V列表缓存时间（秒）
+CELEBRITY_CACHE_TTL = 600
+
+# 写扩散时每批处理的粉丝数量
+FANOUT_BATCH_SIZE = 500
+
+# 占位成员（已加载标记）
+LOADED_MEMBER = '0'
+
+CELEBRITIES_CACHE_KEY = 'timeline:celebrities'
+
+# 只写入已加载的收件箱，避免生成缺少其他动态的不完整收件箱
+_FANOUT_IF_LOADED = """
+for i, key in ipairs(KEYS) do
+    if redis.call('exists', key) == 1 then
+        redis.call('zadd', key, ARGV[1], ARGV[1])
+        redis.call('zremrangebyrank', key, 1, -(tonumber(ARGV[2]) + 1))
+    end
+end
+return 0
+"""
+
+
+def timeline_key(user_id):
+    """收件箱键"""
+    return f'timeline:{user_id}'
+
+
+def get_celebrity_ids():
+    """获取粉丝数超过写扩散上限的作者ID"""
+    try:
+        celebrity_ids = caches['master_cache'].get(CELEBRITIES_CACHE_KEY)
+        if celebrity_ids is not None:
+            return celebrity_ids
+    except Exception as e:
+        print(f"大V列表缓存读取失败: {e}")
+
+    from user.models import Follow
+    celebrity_ids = set(Follow.objects.filter(is_deleted=False).values('following_id').annotate(
+        follower_count=Count('id')
+    ).filter(follower_count__gt=TIMELINE_FANOUT_LIMIT).values_list('following_id', flat=True))
+
+    try:
+        caches['master_cache'].set(CELEBRITIES_CACHE_KEY, celebrity_ids, CELEBRITY_CACHE_TTL)
+    except Exception as e:
+        print(f"大V列表缓存写入失败: {e}")
+    return celebrity_ids
+
+
+def get_following_ids(user_id):
+    """获取用户关注的作者ID"""
+    from user.models import Follow
+    return list(Follow.objects.filter(
+        follower_id=user_id,
+        is_deleted=False
+    ).values_list('following_id', flat=True))
+
+
+def fan_out_moment(moment_id):
+    """把分享的动态写入作者所有粉丝的收件箱（由异步任务调用）"""
+    from user.models import Follow
+    moment = Moment.objects.filter(id=moment_id, is_shared=True).only('id', 'user_id').first()
+    if moment is None or moment.user_id in get_celebrity_ids():
+        return 0
+
+    redis_conn = get_redis_connection('master_cache')
+    follower_ids = Follow.objects.filter(
+        following_id=moment.user_id,
+        is_deleted=False
+    ).values_list('follower_id', flat=True)
+
+    total = 0
+    batch = []
+    for follower_id in follower_ids.iterator():
+        batch.append(timeline_key(follower_id))
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            redis_conn.eval(_FANOUT_IF_LOADED, len(batch), *batch, moment.id, TIMELINE_MAX_LENGTH)
+            total += len(batch)
+            batch = []
+    if batch:
+        redis_conn.eval(_FANOUT_IF_LOADED, len(batch), *batch, moment.id, TIMELINE_MAX_LENGTH)
+        total += len(batch)
+    return total
+
+
+def invalidate_timeline(user_id):
+    """关注关系变化时清除收件箱，下次读取时重建"""
+    try:
+        get_redis_connection('master_cache').delete(timeline_key(user_id))
+    except Exception as e:
+        print(f"时间线缓存清除失败: {e}")
+
+
+def _load_timeline(redis_conn, user_id):
+    """从数据库重建收件箱（不包含大V的动态）"""
+    celebrity_ids = get_celebrity_ids()
+    author_ids = [author_id for author_id in get_following_ids(user_id) if author_id not in celebrity_ids]
+    moment_ids = []
+    if author_ids:
+        moment_ids = list(Moment.objects.filter(
+            user_id__in=author_ids,
+            is_shared=True
+        ).order_by('-id').values_list('id', flat=True)[:TIMELINE_MAX_LENGTH])
+
+    key = timeline_key(user_id)
+    pipe = redis_conn.pipeline()
+    pipe.delete(key)
+    pipe.zadd(key, {LOADED_MEMBER: 0, **{str(moment_id): moment_id for moment_id in moment_ids}})
+    pipe.expire(key, TIMELINE_CACHE_TTL)
+    pipe.execute()
+
+
+def encode_cursor(moment_id):
+    """生成翻页游标（上一页最后一条动态的ID）"""
+    return base64.urlsafe_b64encode(str(moment_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析翻页游标，无效时返回 None"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _inbox_ids(user_id, before_id, limit):
+    """读取收件箱中早于 before_id 的动态ID"""
+    max_score = f'({before_id}' if before_id else '+inf'
+    try:
+        redis_conn = get_redis_connection('master_cache')
+        key = timeline_key(user_id)
+        if not redis_conn.exists(key):
+            _load_timeline(redis_conn, user_id)
+        return [int(member) for member in redis_conn.zrevrangebyscore(key, max_score, '(0', start=0, num=limit)]
+    except Exception as e:
+        print(f"时间线缓存读取失败: {e}")
+        # 回退到数据库查询
+        queryset = Moment.objects.filter(user_id__in=get_following_ids(user_id), is_shared=True)
+        if before_id:
+            queryset = queryset.filter(id__lt=before_id)
+        return list(queryset.order_by('-id').values_list('id', flat=True)[:limit])
+
+
+def get_following_page(user_id, cursor=None, page_size=10):
+    """获取一页关注动态ID，返回 (动态ID列表, 下一页游标或 None)"""
+    before_id = decode_cursor(cursor) if cursor else None
+    limit = page_size + 1
+    moment_ids = _inbox_ids(user_id, before_id, limit)
+
+    # 合并关注的大V的动态（读扩散）
+    celebrity_ids = get_celebrity_ids()
+    if celebrity_ids:
+        from user.models import Follow
+        followed_celebrities = list(Follow.objects.filter(
+            follower_id=user_id,
+            following_id__in=celebrity_ids,
+            is_deleted=False
+        ).values_list('following_id', flat=True))
+        if followed_celebrities:
+            queryset = Moment.objects.filter(user_id__in=followed_celebrities, is_shared=True)
+            if before_id:
+                queryset = queryset.filter(id__lt=before_id)
+            moment_ids = sorted(
+                set(moment_ids) | set(queryset.order_by('-id').values_list('id', flat=True)[:limit]),
+                reverse=True
+            )[:limit]
+
+    next_cursor = encode_cursor(moment_ids[page_size - 1]) if len(moment_ids) > page_size else None
+    return moment_ids[:page_size], next_cursor
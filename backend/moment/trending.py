@@ -0,0 +1,162 @@
+"""热门标签
+
+标签使用次数按小时分桶累计在 Redis 有序集合 trending_tags:h:{UTC小时} 中（原生键，成员为标签ID），
+分享动态、给分享的动态添加/移除标签、取消分享、删除动态时按动态发布时间所在的小时增减计数；
+24小时、7天窗口由对应小时桶 ZUNIONSTORE 合并得到并短暂缓存，查询热门标签只需一次 ZREVRANGE，
+不再每次对动态-标签关联表做全表聚合。
+首次使用（或 Redis 数据丢失后）从数据库回填最近7天的分桶。
+"""
+import datetime
+import os
+
+from django.db.models import Count
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .models import Moment, Tag
+
+
+# 统计窗口（小时数）
+TRENDING_WINDOWS = {
+    '24h': 24,
+    '7d': 24 * 7,
+}
+
+# 默认统计窗口
+DEFAULT_TRENDING_WINDOW = '7d'
+
+# 窗口合并结果缓存时间（秒）
+TRENDING_WINDOW_CACHE_TTL = int(os.getenv('TRENDING_TAGS_WINDOW_CACHE_TTL', 60))
+
+# 小时桶保留时间（秒），比最大窗口多一小时
+TRENDING_BUCKET_TTL = (max(TRENDING_WINDOWS.values()) + 1) * 3600
+
+# 已回填标记
+SEEDED_KEY = 'trending_tags:seeded'
+
+
+def _hour_start(moment_time):
+    """时间所在的 UTC 整点"""
+    return moment_time.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def bucket_key(hour):
+    """小时桶键"""
+    return f'trending_tags:h:{hour:%Y%m%d%H}'
+
+
+def window_key(window):
+    """窗口合并结果键"""
+    return f'trending_tags:{window}'
+
+
+def _add_to_pipe(pipe, tag_counts, hour, now):
+    """把一个小时桶的计数写入管道，返回是否写入（超出保留时间的桶跳过）"""
+    remaining = int((hour - now).total_seconds()) + TRENDING_BUCKET_TTL
+    if remaining <= 0:
+        return False
+    key = bucket_key(hour)
+    for tag_id, amount in tag_counts.items():
+        pipe.zincrby(key, amount, tag_id)
+    pipe.expire(key, remaining)
+    return True
+
+
+def seed_trending_tags(redis_conn):
+    """从数据库回填最近的小时桶（只执行一次）"""
+    if not redis_conn.set(SEEDED_KEY, 1, nx=True):
+        return
+
+    now = timezone.now()
+    since = now - datetime.timedelta(hours=max(TRENDING_WINDOWS.values()))
+    try:
+        buckets = {}
+        for tag_id, created_at in Moment.tags.through.objects.filter(
+            moment__is_shared=True,
+            moment__created_at__gte=since
+        ).values_list('tag_id', 'moment__created_at').iterator():
+            tag_counts = buckets.setdefault(_hour_start(created_at), {})
+            tag_counts[tag_id] = tag_counts.get(tag_id, 0) + 1
+
+        pipe = redis_conn.pipeline()
+        for hour, tag_counts in buckets.items():
+            _add_to_pipe(pipe, tag_counts, hour, now)
+        pipe.execute()
+    except Exception:
+        # 回填失败时清除标记，下次重新回填
+        redis_conn.delete(SEEDED_KEY)
+        raise
+
+
+def record_tag_usage(tag_ids, created_at, amount):
+    """按动态发布时间所在的小时桶增减标签使用次数"""
+    tag_ids = list(tag_ids)
+    if not tag_ids:
+        return
+    try:
+        redis_conn = get_redis_connection('master_cache')
+        # 尚未回填时跳过，回填会从数据库读取到这次变化
+        if not redis_conn.exists(SEEDED_KEY):
+            return
+        pipe = redis_conn.pipeline()
+        if _add_to_pipe(pipe, {tag_id: amount for tag_id in tag_ids}, _hour_start(created_at), timezone.now()):
+            pipe.execute()
+    except Exception as e:
+        print(f"热门标签计数更新失败: {e}")
+
+
+def record_moment_tags(moment, amount):
+    """动态分享状态变化时增减其标签的使用次数"""
+    record_tag_usage(moment.tags.values_list('id', flat=True), moment.created_at, amount)
+
+
+def _refresh_window(redis_conn, window):
+    """合并窗口内的小时桶"""
+    current_hour = _hour_start(timezone.now())
+    keys = [bucket_key(current_hour - datetime.timedelta(hours=offset)) for offset in range(TRENDING_WINDOWS[window])]
+    key = window_key(window)
+    pipe = redis_conn.pipeline()
+    pipe.zunionstore(key, keys)
+    # 去掉减到0的标签
+    pipe.zremrangebyscore(key, '-inf', 0)
+    pipe.expire(key, TRENDING_WINDOW_CACHE_TTL)
+    pipe.execute()
+
+
+def _load_trending_tags(window, limit):
+    """从数据库统计热门标签"""
+    since = timezone.now() - datetime.timedelta(hours=TRENDING_WINDOWS[window])
+    return list(Tag.objects.filter(
+        moments__is_shared=True,
+        moments__created_at__gte=since
+    ).annotate(
+        moment_count=Count('moments')
+    ).order_by('-moment_count')[:limit])
+
+
+def get_trending_tags(window=DEFAULT_TRENDING_WINDOW, limit=20):
+    """获取窗口内使用次数最多的标签，标签的 moment_count 为窗口内的使用次数"""
+    if window not in TRENDING_WINDOWS:
+        window = DEFAULT_TRENDING_WINDOW
+
+    try:
+        redis_conn = get_redis_connection('master_cache')
+        seed_trending_tags(redis_conn)
+        if not redis_conn.exists(window_key(window)):
+            _refresh_window(redis_conn, window)
+        ranked = [
+            (int(tag_id), int(score))
+            for tag_id, score in redis_conn.zrevrange(window_key(window), 0, limit - 1, withscores=True)
+        ]
+    except Exception as e:
+        print(f"热门标签缓存读取失败: {e}")
+        return _load_trending_tags(window, limit)
+
+    tags = Tag.objects.in_bulk([tag_id for tag_id, _ in ranked])
+    trending_tags = []
+    for tag_id, score in ranked:
+        if tag_id in tags:
+            tag = tags[tag_id]
+            tag.moment_count = score
+            trending_tags.append(tag)
+    return trending_tags
@@ -2,14 +2,29 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.utils.urls import replace_query_param
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, F
-from django.utils import timezone
-from .models import Moment, Tag, Like, Comment, CommentLike
-from .serializers import MomentSerializer, TagSerializer, LikeSerializer
+from django.db.models import Case, F, When
+from .models import Moment, Tag, Like, Comment, CommentLike, enqueue_fan_out
+from .serializers import MomentFeedSerializer, MomentSerializer, TagSerializer, LikeSerializer, feed_queryset
+from .hot_score import update_hot_score
+from .recommend import get_recommended_page
+from .timeline import get_following_page
+from .comment_tree import load_comment_tree
+from .search import search_authors, search_moment_ids
+from .trending import DEFAULT_TRENDING_WINDOW, get_trending_tags, record_moment_tags
+from .ranking import get_ranked_moments, get_ranking_ids, update_rankings
+from .publish import publish_moment
+from .counters import get_counters, incr_counter, reset_counters
+from .bodies import get_feed_items, invalidate_bodies
+from .cache_tags import (
+    MOMENT_LIST_GENERATION, bump_generation, bump_moment_versions, get_tagged, set_tagged, tagged_key
+)
 from user.models import Collection
+from core.pagination import keyset_page, parse_page
+from core.thumbnails import build_srcset
 
 
 class MomentViewSet(viewsets.ModelViewSet):
@@ -20,7 +35,7 @@ class MomentViewSet(viewsets.ModelViewSet):
     
     def get_permissions(self):
         """根据不同的action设置不同的权限"""
-        if self.action in ['list', 'retrieve', 'hot_moments', 'hot_favorites']:
+        if self.action in ['list', 'retrieve', 'hot_moments', 'hot_favorites', 'authors']:
             # 查看动态列表和详情时允许匿名访问
             return [AllowAny()]
         else:
@@ -29,24 +44,25 @@ class MomentViewSet(viewsets.ModelViewSet):
     
     def list(self, request, *args, **kwargs):
         """获取动态列表，支持筛选和搜索"""
-        filter_type = request.query_params.get('filter', 'latest')
+        # 搜索且未指定筛选类型时按相关度排序
+        filter_type = request.query_params.get('filter') or ('relevance' if request.query_params.get('search') else 'latest')
         search_term = request.query_params.get('search', '')
         topic_id = request.query_params.get('topic', '')
         page = int(request.query_params.get('page', 1))
         
-        # 生成缓存键
-        cache_key = f'moment:list:{filter_type}:{search_term}:{topic_id}:{page}'
-        cached_result = None
+        # 关注和推荐：按游标分页，不使用按页码的列表缓存
+        if filter_type == 'following' and request.user.is_authenticated:
+            return self.following(request)
+        if filter_type not in ('latest', 'popular') and not topic_id and not search_term:
+            return self.recommended_list(request)
+        
+        # 生成缓存键（带列表代号），缓存的页面只包含动态ID，正文和计数在读取时合并
+        cache_key = tagged_key(f'moment:list:{filter_type}:{search_term}:{topic_id}:{page}', MOMENT_LIST_GENERATION)
         
         # 尝试从缓存获取
-        try:
-            from django.core.cache import caches
-            master_cache = caches['master_cache']
-            cached_result = master_cache.get(cache_key)
-            if cached_result:
-                return Response(cached_result)
-        except Exception as e:
-            print(f"缓存读取失败: {e}")
+        cached_result = get_tagged(cache_key)
+        if cached_result:
+            return Response(self.hydrate_page(cached_result))
         
         # 基础查询：只查询分享的动态
         queryset = Moment.objects.filter(is_shared=True)
@@ -55,65 +71,96 @@ class MomentViewSet(viewsets.ModelViewSet):
         if topic_id:
             queryset = queryset.filter(tags__id=topic_id)
         
-        # 搜索功能
+        # 搜索功能：全文索引匹配动态内容，按相关度排序（作者搜索见 authors 接口）
+        matched_ids = None
         if search_term:
-            # 搜索动态作者（用户名、昵称）和动态内容
-            from django.db.models import Q
-            queryset = queryset.filter(
-                Q(user__username__icontains=search_term) |
-                Q(user__name__icontains=search_term) |
-                Q(content__icontains=search_term)
-            )
+            matched_ids = search_moment_ids(search_term, queryset)
+            queryset = queryset.filter(id__in=matched_ids)
         
         # 根据筛选类型构建不同的查询
         if filter_type == 'latest':
             # 最新：按创建时间倒序排列
             queryset = queryset.order_by('-created_at')
         elif filter_type == 'popular':
-            # 热门：按热度分数排序
-            # 先获取所有动态，计算热度分数并排序
-            moments_list = list(queryset)
-            moments_list.sort(key=lambda x: x.get_hot_score() if hasattr(x, 'get_hot_score') else (x.likes * 1.0 + x.comments * 0.5 + x.favorites * 0.3), reverse=True)
-            # 转回查询集（这里简化处理，实际项目中可能需要更复杂的实现）
-            if moments_list:
-                # 保持排序顺序
-                from django.db.models import Case, When
-                preserved = Case(*[When(id=moment.id, then=pos) for pos, moment in enumerate(moments_list)])
-                queryset = Moment.objects.filter(id__in=[m.id for m in moments_list]).order_by(preserved)
+            # 热门：按持久化的热度分排序（走 is_shared + hot_score 索引）
+            queryset = queryset.order_by('-hot_score', '-id')
+        elif matched_ids:
+            # 搜索结果（未指定筛选或推荐）按相关度排序
+            queryset = queryset.order_by(Case(*[When(id=moment_id, then=position) for position, moment_id in enumerate(matched_ids)]))
         else:  # recommended
-            # 推荐：随机排序
-            import random
-            moments_list = list(queryset)
-            random.shuffle(moments_list)
-            if moments_list:
-                # 保持排序顺序
-                from django.db.models import Case, When
-                preserved = Case(*[When(id=moment.id, then=pos) for pos, moment in enumerate(moments_list)])
-                queryset = Moment.objects.filter(id__in=[m.id for m in moments_list]).order_by(preserved)
+            # 话题的推荐按最新排序
+            queryset = queryset.order_by('-created_at')
         
-        # 分页处理
-        page_obj = self.paginate_queryset(queryset)
-        if page_obj is not None:
-            serializer = self.get_serializer(page_obj, many=True)
-            paginated_response = self.get_paginated_response(serializer.data)
-            # 缓存结果，有效期5分钟
-            try:
-                from django.core.cache import caches
-                master_cache = caches['master_cache']
-                master_cache.set(cache_key, paginated_response.data, 300)
-            except Exception as e:
-                print(f"缓存写入失败: {e}")
-            return paginated_response
+        # 分页处理（只查询动态ID）
+        moment_ids = queryset.values_list('id', flat=True)
+        page_ids = self.paginate_queryset(moment_ids)
+        if page_ids is not None:
+            page_data = self.get_paginated_response(list(page_ids)).data
+        else:
+            page_data = list(moment_ids)
+        
+        # 缓存结果，有效期5分钟（点赞、收藏等计数变化不影响该缓存）
+        set_tagged(cache_key, page_data, [], 300)
+        return Response(self.hydrate_page(page_data))
+    
+    def feed_items(self, moment_ids):
+        """按动态ID获取序列化数据：正文来自正文缓存，计数来自计数缓存"""
+        return get_feed_items('feed', moment_ids, lambda missing_ids: MomentFeedSerializer(
+            feed_queryset(Moment.objects.filter(id__in=missing_ids)), many=True, context=self.get_serializer_context()
+        ).data)
+    
+    def hydrate_page(self, page_data):
+        """把缓存的ID页面展开为完整数据"""
+        if isinstance(page_data, list):
+            return self.feed_items(page_data)
+        return dict(page_data, results=self.feed_items(page_data['results']))
+    
+    def recommended_list(self, request):
+        """推荐动态流：每次浏览使用独立的随机种子，通过 cursor 参数翻页"""
+        page_size = self.paginator.get_page_size(request) if self.paginator else 10
+        user_id = request.user.id if request.user.is_authenticated else None
+        moment_ids, next_cursor = get_recommended_page(user_id, request.query_params.get('cursor'), page_size)
+        return self.cursor_page_response(request, moment_ids, next_cursor)
+    
+    @action(detail=False, methods=['get'])
+    def following(self, request):
+        """关注动态流：关注的用户分享的动态，按发布顺序倒序，通过 cursor 参数翻页"""
+        page_size = self.paginator.get_page_size(request) if self.paginator else 10
+        moment_ids, next_cursor = get_following_page(request.user.id, request.query_params.get('cursor'), page_size)
+        return self.cursor_page_response(request, moment_ids, next_cursor)
+    
+    def cursor_page_response(self, request, moment_ids, next_cursor):
+        """按给定的动态ID顺序返回一页数据（跳过已取消分享或已删除的动态）"""
+        results = [item for item in self.feed_items(moment_ids) if item['is_shared']]
+        
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({
+            'next': next_url,
+            'next_cursor': next_cursor,
+            'results': results
+        })
+    
+    @action(detail=False, methods=['get'])
+    def authors(self, request):
+        """搜索动态作者（按昵称或手机号前缀）"""
+        keyword = request.query_params.get('q', '')
+        
+        authors = []
+        for user in search_authors(keyword):
+            profile = getattr(user, 'profile', None)
+            authors.append({
+                'id': user.id,
+                'username': user.username,
+                'name': user.name,
+                'avatar': profile.userAvatar.url if profile and profile.userAvatar else ''
+            })
         
-        serializer = self.get_serializer(queryset, many=True)
-        # 缓存结果，有效期5分钟
-        try:
-            from django.core.cache import caches
-            master_cache = caches['master_cache']
-            master_cache.set(cache_key, serializer.data, 300)
-        except Exception as e:
-            print(f"缓存写入失败: {e}")
-        return Response(serializer.data)
+        return Response({
+            'authors': authors,
+            'total': len(authors)
+        }, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=['get'])
     def hot_moments(self, request):
@@ -121,91 +168,25 @@ class MomentViewSet(viewsets.ModelViewSet):
         # 获取时间范围参数
         time_range = request.GET.get('time_range', '7days')
         
-        # 生成缓存键
-        cache_key = f'hot:moments:{time_range}'
-        cached_result = None
-        
-        # 尝试从缓存获取
-        try:
-            from django.core.cache import caches
-            master_cache = caches['master_cache']
-            cached_result = master_cache.get(cache_key)
-            if cached_result:
-                return Response(cached_result)
-        except Exception as e:
-            print(f"缓存读取失败: {e}")
-        
-        # 根据时间范围计算起始时间
-        if time_range == '7days':
-            start_time = timezone.now() - timezone.timedelta(days=7)
-        elif time_range == '30days':
-            start_time = timezone.now() - timezone.timedelta(days=30)
-        else:  # all
-            start_time = timezone.datetime.min
-        
-        # 计算热度分数：与get_hot_score方法一致
-        hot_moments = Moment.objects.filter(
-            created_at__gte=start_time
-        ).annotate(
-            hot_score=F('likes') * 1.0 + F('comments') * 2.0 + F('favorites') * 1.5 + F('view_count') * 0.1
-        ).order_by('-hot_score')[:20]  # 取前20条热门动态
+        # 从热门排行读取前20条，正文和计数来自缓存（跳过已取消分享的动态）
+        hot_moments = [item for item in self.feed_items(get_ranking_ids('hot', time_range, 20)) if item['is_shared']]
         
-        serializer = MomentSerializer(hot_moments, many=True)
-        
-        # 构建响应数据
-        response_data = {
+        return Response({
             'message': '获取热门动态成功',
-            'hot_moments': serializer.data,
+            'hot_moments': hot_moments,
             'time_range': time_range
-        }
-        
-        # 缓存结果，有效期5分钟
-        try:
-            from django.core.cache import caches
-            master_cache = caches['master_cache']
-            master_cache.set(cache_key, response_data, 300)
-        except Exception as e:
-            print(f"缓存写入失败: {e}")
-        
-        return Response(response_data, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=['get'])
     def hot_favorites(self, request):
         """获取热门收藏排行"""
-        # 生成缓存键
-        cache_key = 'hot:favorites'
-        cached_result = None
-        
-        # 尝试从缓存获取
-        try:
-            from django.core.cache import caches
-            master_cache = caches['master_cache']
-            cached_result = master_cache.get(cache_key)
-            if cached_result:
-                return Response(cached_result)
-        except Exception as e:
-            print(f"缓存读取失败: {e}")
-        
-        # 按收藏数排序获取热门动态
-        hot_favorites = Moment.objects.order_by('-favorites')[:20]  # 取前20条热门收藏
+        # 从收藏排行读取前20条（跳过已取消分享的动态）
+        hot_favorites = [item for item in self.feed_items(get_ranking_ids('favorites', 'all', 20)) if item['is_shared']]
         
-        serializer = MomentSerializer(hot_favorites, many=True)
-        
-        # 构建响应数据
-        response_data = {
+        return Response({
             'message': '获取热门收藏成功',
-            'hot_favorites': serializer.data
-        }
-        
-        # 缓存结果，有效期5分钟
-        try:
-            from django.core.cache import caches
-            master_cache = caches['master_cache']
-            master_cache.set(cache_key, response_data, 300)
-        except Exception as e:
-            print(f"缓存写入失败: {e}")
-        
-        return Response(response_data, status=status.HTTP_200_OK)
+            'hot_favorites': hot_favorites
+        }, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['post'])
     def like(self, request, pk=None):
@@ -216,56 +197,29 @@ class MomentViewSet(viewsets.ModelViewSet):
         like, created = Like.objects.get_or_create(user=request.user, moment=moment)
         
         if created:
-            # 增加点赞数
-            moment.likes = F('likes') + 1
-            moment.save()
-            moment.refresh_from_db()  # 刷新数据
+            # 增加点赞数（写入计数缓冲，定时批量落库并更新热度分）
+            likes = incr_counter(moment.id, 'likes', 1)
             
-            # 清除缓存
-            try:
-                from django.core.cache import caches
-                master_cache = caches['master_cache']
-                # 清除社区动态列表缓存
-                master_cache.delete_pattern('community:*')
-                master_cache.delete_pattern('moment:list:*')
-                # 清除用户收藏列表缓存
-                user_id = request.user.id
-                master_cache.delete(f'user:favorites:{user_id}')
-                # 清除用户收藏页面缓存
-                master_cache.delete_pattern(f'user:collections:{user_id}*')
-                master_cache.delete_pattern(f'user:collections:page:{user_id}*')
-                # 清除热门动态和热门收藏缓存
-                master_cache.delete('hot:moments:7days')
-                master_cache.delete('hot:favorites')
-            except Exception as e:
-                print(f"缓存清除失败: {e}")
+            # 只使包含该动态的缓存页面失效
+            bump_moment_versions(moment.id)
             
             return Response({
                 'message': '点赞成功',
-                'likes': moment.likes,
+                'likes': likes,
                 'is_liked': True
             }, status=status.HTTP_200_OK)
         else:
             # 已点赞，取消点赞
             like.delete()
-            # 减少点赞数
-            moment.likes = F('likes') - 1
-            moment.save()
-            moment.refresh_from_db()  # 刷新数据
+            # 减少点赞数（写入计数缓冲，定时批量落库并更新热度分）
+            likes = incr_counter(moment.id, 'likes', -1)
             
-            # 清除缓存
-            try:
-                from django.core.cache import caches
-                master_cache = caches['master_cache']
-                # 清除社区动态列表缓存
-                master_cache.delete_pattern('community:*')
-                master_cache.delete_pattern('moment:list:*')
-            except Exception as e:
-                print(f"缓存清除失败: {e}")
+            # 只使包含该动态的缓存页面失效
+            bump_moment_versions(moment.id)
             
             return Response({
                 'message': '取消点赞成功',
-                'likes': moment.likes,
+                'likes': likes,
                 'is_liked': False
             }, status=status.HTTP_200_OK)
     
@@ -282,64 +236,30 @@ class MomentViewSet(viewsets.ModelViewSet):
         )
         
         if created:
-            # 增加收藏数
-            moment.favorites = F('favorites') + 1
-            moment.save()
-            moment.refresh_from_db()  # 刷新数据
+            # 增加收藏数（写入计数缓冲，定时批量落库并更新热度分）
+            favorites = incr_counter(moment.id, 'favorites', 1)
             
-            # 清除缓存
-            try:
-                from django.core.cache import caches
-                master_cache = caches['master_cache']
-                # 清除社区动态列表缓存
-                master_cache.delete_pattern('community:*')
-                master_cache.delete_pattern('moment:list:*')
-                # 清除用户收藏列表缓存
-                user_id = request.user.id
-                master_cache.delete(f'user:favorites:{user_id}')
-                # 清除用户收藏页面缓存
-                master_cache.delete_pattern(f'user:collections:{user_id}*')
-                master_cache.delete_pattern(f'user:collections:page:{user_id}*')
-                # 清除热门动态和热门收藏缓存
-                master_cache.delete('hot:moments:7days')
-                master_cache.delete('hot:favorites')
-            except Exception as e:
-                print(f"缓存清除失败: {e}")
+            # 只使包含该动态的缓存页面和当前用户的收藏列表失效
+            bump_moment_versions(moment.id)
+            bump_generation(f'user_favorites:{request.user.id}', f'user_collections:{request.user.id}')
             
             return Response({
                 'message': '收藏成功',
-                'favorites': moment.favorites
+                'favorites': favorites
             }, status=status.HTTP_200_OK)
         else:
             # 已收藏，取消收藏
             collection.delete()
-            # 减少收藏数
-            moment.favorites = F('favorites') - 1
-            moment.save()
-            moment.refresh_from_db()  # 刷新数据
+            # 减少收藏数（写入计数缓冲，定时批量落库并更新热度分）
+            favorites = incr_counter(moment.id, 'favorites', -1)
             
-            # 清除缓存
-            try:
-                from django.core.cache import caches
-                master_cache = caches['master_cache']
-                # 清除社区动态列表缓存
-                master_cache.delete_pattern('community:*')
-                master_cache.delete_pattern('moment:list:*')
-                # 清除用户收藏列表缓存
-                user_id = request.user.id
-                master_cache.delete(f'user:favorites:{user_id}')
-                # 清除用户收藏页面缓存
-                master_cache.delete_pattern(f'user:collections:{user_id}*')
-                master_cache.delete_pattern(f'user:collections:page:{user_id}*')
-                # 清除热门动态和热门收藏缓存
-                master_cache.delete('hot:moments:7days')
-                master_cache.delete('hot:favorites')
-            except Exception as e:
-                print(f"缓存清除失败: {e}")
+            # 只使包含该动态的缓存页面和当前用户的收藏列表失效
+            bump_moment_versions(moment.id)
+            bump_generation(f'user_favorites:{request.user.id}', f'user_collections:{request.user.id}')
             
             return Response({
                 'message': '取消收藏成功',
-                'favorites': moment.favorites
+                'favorites': favorites
             }, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['get'])
@@ -359,28 +279,20 @@ class MomentViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def user_favorites(self, request):
         """获取当前用户收藏的动态"""
-        # 生成缓存键
+        # 生成缓存键（带用户收藏列表代号）
         user_id = request.user.id
-        cache_key = f'user:favorites:{user_id}'
-        cached_result = None
+        cache_key = tagged_key(f'user:favorites:{user_id}', f'user_favorites:{user_id}')
         
         # 尝试从缓存获取
-        try:
-            from django.core.cache import caches
-            master_cache = caches['master_cache']
-            cached_result = master_cache.get(cache_key)
-            if cached_result:
-                return Response(cached_result)
-            else:
-                print(f"[DEBUG] 缓存未命中，从数据库查询")
-        except Exception as e:
-            print(f"[ERROR] 缓存读取失败: {e}")
+        cached_result = get_tagged(cache_key)
+        if cached_result:
+            return Response(cached_result)
         
         # 从数据库查询
         user_collections = Collection.objects.filter(user=request.user, content_type='moment').order_by('-created_at')
         moment_ids = [collection.object_id for collection in user_collections]
-        moments = Moment.objects.filter(id__in=moment_ids).order_by('-created_at')
-        serializer = MomentSerializer(moments, many=True)
+        moments = feed_queryset(Moment.objects.filter(id__in=moment_ids)).order_by('-created_at')
+        serializer = MomentFeedSerializer(moments, many=True, context=self.get_serializer_context())
         
         # 构建响应数据
         response_data = {
@@ -388,9 +300,7 @@ class MomentViewSet(viewsets.ModelViewSet):
             'favorites': serializer.data
         }
         
-        from django.core.cache import caches
-        master_cache = caches['master_cache']
-        result = master_cache.set(cache_key, response_data, 600)
+        set_tagged(cache_key, response_data, [item['id'] for item in serializer.data], 600)
         
         return Response(response_data, status=status.HTTP_200_OK)
     
@@ -413,18 +323,15 @@ class MomentViewSet(viewsets.ModelViewSet):
         
         # 增加评论数
         moment.comments = F('comments') + 1
-        moment.save()
+        moment.save(update_fields=['comments'])  # 只更新该字段，避免覆盖缓冲落库的计数
         moment.refresh_from_db()  # 刷新数据
+        update_hot_score(moment)
+        reset_counters(moment.id)
         
-        # 清除缓存
-        try:
-            from django.core.cache import caches
-            master_cache = caches['master_cache']
-            # 清除社区动态列表缓存
-            master_cache.delete_pattern('community:*')
-            master_cache.delete_pattern('moment:list:*')
-        except Exception as e:
-            print(f"缓存清除失败: {e}")
+        # 只使包含该动态的缓存页面失效，正文中的评论列表需要重新生成
+        bump_moment_versions(moment.id)
+        invalidate_bodies(moment.id)
+        update_rankings([moment.id])
         
         return Response({
                 'message': '评论成功',
@@ -444,45 +351,28 @@ class MomentViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def comments(self, request, pk=None):
-        """获取动态的评论列表"""
+        """获取动态的评论列表（一级评论及其回复），传入 page_size 时按 cursor 参数翻页"""
         moment = self.get_object()
-        # 只获取一级评论（parent_id 为 null 的评论）
-        comments = moment.comment_set.filter(parent_id__isnull=True)
         
-        comments_list = []
-        for comment in comments:
-            # 获取该评论的二级回复
-            replies = comment.replies.all()
-            replies_list = []
-            for reply in replies:
-                replies_list.append({
-                    'id': reply.id,
-                    'user': reply.user.name,
-                    'avatar': reply.user.profile.userAvatar.url,
-                    'content': reply.content,
-                    'created_at': reply.created_at,
-                    'is_author': reply.user == request.user,
-                    'likes': reply.likes,
-                    'is_liked': CommentLike.objects.filter(user=request.user, comment=reply).exists() if request.user.is_authenticated else False
-                })
-            
-            comments_list.append({
-                'id': comment.id,
-                'user': comment.user.name,
-                'avatar': comment.user.profile.userAvatar.url,
-                'content': comment.content,
-                'created_at': comment.created_at,
-                'parent_id': comment.parent_id,
-                'is_author': comment.user == request.user,
-                'likes': comment.likes,
-                'is_liked': CommentLike.objects.filter(user=request.user, comment=comment).exists() if request.user.is_authenticated else False,
-                'replies': replies_list
-            })
+        try:
+            page_size = int(request.query_params.get('page_size', 0))
+        except ValueError:
+            page_size = 0
+        if page_size < 0:
+            return Response({'message': 'page_size 必须为正整数'}, status=status.HTTP_400_BAD_REQUEST)
+        comments_list, next_cursor = load_comment_tree(
+            moment, request.user, request.query_params.get('cursor'), page_size
+        )
         
-        return Response({
+        response_data = {
             'comments': comments_list,
             'total_comments': len(comments_list)
-        }, status=status.HTTP_200_OK)
+        }
+        if page_size:
+            # 分页时返回一级评论总数和下一页游标
+            response_data['total_comments'] = moment.comment_set.filter(parent_id__isnull=True).count()
+            response_data['next_cursor'] = next_cursor
+        return Response(response_data, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['delete'], url_path='delete_comment/(?P<comment_id>\d+)')
     def delete_comment(self, request, pk=None, comment_id=None):
@@ -508,20 +398,15 @@ class MomentViewSet(viewsets.ModelViewSet):
             # 统计所有评论（含一级+二级）
             total_comments = Comment.objects.filter(moment=moment).count()
             moment.comments = total_comments
-            moment.save()
+            moment.save(update_fields=['comments'])
             moment.refresh_from_db()  # 刷新数据
+            update_hot_score(moment)
+            reset_counters(moment.id)
             
-            # 清除相关缓存
-            try:
-                from django.core.cache import caches
-                master_cache = caches['master_cache']
-                # 清除社区动态列表缓存
-                master_cache.delete_pattern('community:*')
-                master_cache.delete_pattern('moment:list:*')
-                # 清除动态详情缓存
-                master_cache.delete(f'moment:detail:{pk}')
-            except Exception as e:
-                print(f"缓存清除失败: {e}")
+            # 只使包含该动态的缓存页面失效，正文中的评论列表需要重新生成
+            bump_moment_versions(moment.id)
+            invalidate_bodies(moment.id)
+            update_rankings([moment.id])
             
             return Response({
                 'message': '评论删除成功',
@@ -560,17 +445,8 @@ class MomentViewSet(viewsets.ModelViewSet):
                 comment.save()
                 comment.refresh_from_db()  # 刷新数据
                 
-                # 清除相关缓存
-                try:
-                    from django.core.cache import caches
-                    master_cache = caches['master_cache']
-                    # 清除社区动态列表缓存
-                    master_cache.delete_pattern('community:*')
-                    master_cache.delete_pattern('moment:list:*')
-                    # 清除动态详情缓存
-                    master_cache.delete(f'moment:detail:{pk}')
-                except Exception as e:
-                    print(f"缓存清除失败: {e}")
+                # 只使包含该动态的缓存页面失效
+                bump_moment_versions(moment.id)
                 
                 return Response({
                     'message': '点赞成功',
@@ -585,17 +461,8 @@ class MomentViewSet(viewsets.ModelViewSet):
                 comment.save()
                 comment.refresh_from_db()  # 刷新数据
                 
-                # 清除相关缓存
-                try:
-                    from django.core.cache import caches
-                    master_cache = caches['master_cache']
-                    # 清除社区动态列表缓存
-                    master_cache.delete_pattern('community:*')
-                    master_cache.delete_pattern('moment:list:*')
-                    # 清除动态详情缓存
-                    master_cache.delete(f'moment:detail:{pk}')
-                except Exception as e:
-                    print(f"缓存清除失败: {e}")
+                # 只使包含该动态的缓存页面失效
+                bump_moment_versions(moment.id)
                 
                 return Response({
                     'message': '取消点赞成功',
@@ -630,11 +497,9 @@ class TagViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def trending_tags(self, request):
-        """获取热门标签"""
-        # 统计标签使用次数，取前20个热门标签
-        trending_tags = Tag.objects.annotate(
-            usage_count=Count('moments')
-        ).order_by('-usage_count')[:20]
+        """获取热门标签（window 参数：24h 或 7d）"""
+        # 按时间窗口内的标签使用次数，取前20个热门标签
+        trending_tags = get_trending_tags(request.query_params.get('window', DEFAULT_TRENDING_WINDOW), 20)
         
         serializer = TagSerializer(trending_tags, many=True)
         return Response({
@@ -658,8 +523,6 @@ class LikeViewSet(viewsets.ModelViewSet):
 @login_required
 def moments_view(request):
     """动态页面，处理动态发布"""
-    from moment.models import MomentImage, Tag
-    
     # 获取当前用户的所有动态
     moments = Moment.objects.filter(user=request.user).order_by('-created_at')
     
@@ -676,44 +539,15 @@ def moments_view(request):
                 return redirect('moments')
             
             try:
-                # 创建动态
-                moment = Moment.objects.create(
-                    user=request.user,
-                    content=content
+                # 发布动态：标签和图片批量写入，成就、缓存等副作用异步处理
+                # 自定义标签使用空格分隔
+                publish_moment(
+                    request.user,
+                    content,
+                    tag_names=tags_data + custom_tags.split(),
+                    images=images
                 )
                 
-                # 处理标签
-                for tag_name in tags_data:
-                    tag, created = Tag.objects.get_or_create(name=tag_name)
-                    moment.tags.add(tag)
-                
-                # 处理自定义标签
-                if custom_tags:
-                    # 分割自定义标签（使用空格分隔）
-                    custom_tags_list = custom_tags.split()
-                    for tag_name in custom_tags_list:
-                        tag_name = tag_name.strip()
-                        # 移除#符号
-                        tag_name = tag_name.replace('#', '')
-                        if tag_name:
-                            tag, created = Tag.objects.get_or_create(name=tag_name)
-                            moment.tags.add(tag)
-            
-                # 处理图片
-                for image in images:
-                    MomentImage.objects.create(moment=moment, image=image)
-                
-                # 清除相关缓存，确保社区页面能及时显示新动态
-                try:
-                    from django.core.cache import caches
-                    master_cache = caches['master_cache']
-                    # 清除社区页面缓存
-                    master_cache.delete('community:latest:1')
-                    # 清除热门动态缓存
-                    master_cache.delete_pattern('hot:moments:*')
-                except Exception as e:
-                    print(f"清除缓存失败: {e}")
-                
                 messages.success(request, '动态发布成功')
                 return redirect('moments')
             except Exception as e:
@@ -737,21 +571,11 @@ def moments_view(request):
 @login_required
 def hot_moments_view(request):
     """热门动态页面"""
-    # 计算热度分数：点赞数 * 1.0 + 评论数 * 0.5 + 收藏数 * 0.8
-    # 只显示最近7天的动态
-    one_week_ago = timezone.now() - timezone.timedelta(days=30)
-    
-    hot_moments = Moment.objects.filter(
-        created_at__gte=one_week_ago,
-        is_shared=True
-    ).annotate(
-        hot_score=F('likes') * 1.0 + F('comments') * 0.5 + F('favorites') * 0.8
-    ).order_by('-hot_score')[:20]  # 取前20条热门动态
+    # 最近30天的热门动态排行，取前20条
+    hot_moments = get_ranked_moments('hot', '30days', 20)
     
     # 获取热门标签
-    trending_tags = Tag.objects.annotate(
-        usage_count=Count('moments')
-    ).order_by('-usage_count')[:10]
+    trending_tags = get_trending_tags(limit=10)
     
     context = {
         'hot_moments': hot_moments,
@@ -774,23 +598,20 @@ def share_moment(request, moment_id):
     
     try:
         moment = Moment.objects.get(id=moment_id, user=request.user)
+        was_shared = moment.is_shared
         moment.is_shared = True
-        moment.save()
+        moment.save(update_fields=['is_shared'])
         
-        # 清除相关缓存
-        try:
-            from django.core.cache import caches
-            master_cache = caches['master_cache']
-            # 清除动态列表缓存
-            master_cache.delete_pattern('moment:list:*')
-            # 清除热门动态缓存
-            master_cache.delete_pattern('hot:moments:*')
-            # 清除热门收藏缓存
-            master_cache.delete('hot:favorites')
-            # 清除社区页面缓存
-            master_cache.delete_pattern('community:*')
-        except Exception as cache_error:
-            print(f"缓存清除失败: {cache_error}")
+        # 推送到粉丝的关注时间线，并计入热门标签
+        if not was_shared:
+            enqueue_fan_out(moment.id)
+            record_moment_tags(moment, 1)
+            update_rankings([moment.id])
+        
+        # 动态列表失效
+        bump_generation(MOMENT_LIST_GENERATION)
+        bump_moment_versions(moment.id)
+        invalidate_bodies(moment.id)
         
         return JsonResponse({'success': True, 'message': '动态分享成功'})
     except Moment.DoesNotExist:
@@ -810,20 +631,10 @@ def delete_moment(request, moment_id):
         moment = Moment.objects.get(id=moment_id, user=request.user)
         moment.delete()
         
-        # 清除相关缓存
-        try:
-            from django.core.cache import caches
-            master_cache = caches['master_cache']
-            # 清除动态列表缓存
-            master_cache.delete_pattern('moment:list:*')
-            # 清除热门动态缓存
-            master_cache.delete_pattern('hot:moments:*')
-            # 清除热门收藏缓存
-            master_cache.delete('hot:favorites')
-            # 清除社区页面缓存
-            master_cache.delete_pattern('community:*')
-        except Exception as cache_error:
-            print(f"缓存清除失败: {cache_error}")
+        # 动态列表失效
+        bump_generation(MOMENT_LIST_GENERATION)
+        bump_moment_versions(moment_id)
+        invalidate_bodies(moment_id)
         
         return JsonResponse({'success': True, 'message': '动态删除成功'})
     except Moment.DoesNotExist:
@@ -841,23 +652,19 @@ def unshare_moment(request, moment_id):
     
     try:
         moment = Moment.objects.get(id=moment_id, user=request.user)
+        was_shared = moment.is_shared
         moment.is_shared = False
-        moment.save()
+        moment.save(update_fields=['is_shared'])
         
-        # 清除相关缓存
-        try:
-            from django.core.cache import caches
-            master_cache = caches['master_cache']
-            # 清除动态列表缓存
-            master_cache.delete_pattern('moment:list:*')
-            # 清除热门动态缓存
-            master_cache.delete_pattern('hot:moments:*')
-            # 清除热门收藏缓存
-            master_cache.delete('hot:favorites')
-            # 清除社区页面缓存
-            master_cache.delete_pattern('community:*')
-        except Exception as cache_error:
-            print(f"缓存清除失败: {cache_error}")
+        # 从热门标签中扣除
+        if was_shared:
+            record_moment_tags(moment, -1)
+            update_rankings([moment.id])
+        
+        # 动态列表失效
+        bump_generation(MOMENT_LIST_GENERATION)
+        bump_moment_versions(moment.id)
+        invalidate_bodies(moment.id)
         
         return JsonResponse({'success': True, 'message': '取消分享成功'})
     except Moment.DoesNotExist:
@@ -870,41 +677,18 @@ def unshare_moment(request, moment_id):
 @login_required
 def hot_ranking(request):
     """热门动态排行榜页面"""
-    from django.utils import timezone
-    
     # 获取时间范围参数
     current_time_range = request.GET.get('time_range', '7days')
     time_ranges = ['7days', '30days', 'all']
     
-    # 构建查询
-    moments = Moment.objects.filter(is_shared=True)
-    
-    # 时间筛选
-    if current_time_range == '7days':
-        start_date = timezone.now() - timezone.timedelta(days=7)
-        moments = moments.filter(created_at__gte=start_date)
-        # 如果7天内没有数据，自动使用30天
-        if not moments.exists():
-            current_time_range = '30days'
-            start_date = timezone.now() - timezone.timedelta(days=30)
-            moments = Moment.objects.filter(is_shared=True, created_at__gte=start_date)
-            # 如果30天内也没有数据，使用全部
-            if not moments.exists():
-                current_time_range = 'all'
-                moments = Moment.objects.filter(is_shared=True)
-    elif current_time_range == '30days':
-        start_date = timezone.now() - timezone.timedelta(days=30)
-        moments = moments.filter(created_at__gte=start_date)
-        # 如果30天内没有数据，使用全部
-        if not moments.exists():
-            current_time_range = 'all'
-            moments = Moment.objects.filter(is_shared=True)
-    # 'all' 不需要时间筛选
-    
-    # 按热度值排序
-    # 先获取所有动态，然后计算热度值并排序
-    moments_list = list(moments)
-    moments_list.sort(key=lambda x: x.get_hot_score(), reverse=True)
+    # 从热门排行读取，没有数据时依次扩大到30天、全部
+    if current_time_range not in time_ranges:
+        current_time_range = '7days'
+    for time_range in time_ranges[time_ranges.index(current_time_range):]:
+        current_time_range = time_range
+        moments_list = get_ranked_moments('hot', time_range, 10)
+        if moments_list:
+            break
     
     # 限制前50条
     hot_posts_with_rank = []
@@ -932,16 +716,16 @@ def moment_share_view(request, moment_id):
     """动态分享页面视图"""
     from django.shortcuts import render
     from .models import Moment
-    from django.db.models import F
     
     try:
         # 查询动态数据
         moment = Moment.objects.get(id=moment_id)
         
-        # 浏览数+1（使用F表达式避免并发问题）
-        moment.view_count = F('view_count') + 1
-        moment.save()
-        moment.refresh_from_db()  # 刷新数据
+        # 浏览数+1（写入计数缓冲，定时批量落库）
+        incr_counter(moment.id, 'view_count')
+        # 展示包含未落库增量的最新计数
+        for field, value in get_counters([moment.id]).get(moment.id, {}).items():
+            setattr(moment, field, value)
         
         # 传递完整的动态信息到模板
         context = {
@@ -968,63 +752,21 @@ def moment_share_view(request, moment_id):
         })
 
 
-# 社区动态分页加载API
-from django.http import JsonResponse
-def load_more_moments(request):
-    """加载更多社区动态的API"""
-    page = int(request.GET.get('page', 1))
-    page_size = 10
-    filter_type = request.GET.get('filter', 'latest')  # 默认为最新
-    
-    # 生成缓存键
-    cache_key = f'community:{filter_type}:{page}'
-    cached_result = None
-    
-    # 尝试从缓存获取
-    try:
-        from django.core.cache import caches
-        master_cache = caches['master_cache']
-        cached_result = master_cache.get(cache_key)
-        if cached_result:
-            return JsonResponse(cached_result)
-    except Exception as e:
-        print(f"缓存读取失败: {e}")
-    
-    # 计算偏移量
-    offset = (page - 1) * page_size
-    
-    # 基础查询：只查询分享的动态
-    base_query = Moment.objects.filter(is_shared=True)
-    
-    # 根据筛选类型构建不同的查询
-    if filter_type == 'latest':
-        # 最新：按创建时间倒序排列
-        moments = base_query.order_by('-created_at')[offset:offset + page_size]
-        total_count = base_query.count()
-    elif filter_type == 'popular':
-        # 热门：按热度分数排序
-        # 先获取所有动态，计算热度分数并排序
-        moments_list = list(base_query)
-        moments_list.sort(key=lambda x: x.get_hot_score() if hasattr(x, 'get_hot_score') else (x.likes * 1.0 + x.comments * 0.5), reverse=True)
-        # 分页
-        moments = moments_list[offset:offset + page_size]
-        total_count = len(moments_list)
-    else:  # recommended
-        # 推荐：暂时使用最新的逻辑，后续可根据用户兴趣进行个性化推荐
-        moments = base_query.order_by('-created_at')[offset:offset + page_size]
-        total_count = base_query.count()
-    
-    # 序列化数据
-    moments_data = []
-    for moment in moments:
+# 社区动态卡片（分页加载）
+def build_moment_cards(moment_ids):
+    """构建社区动态卡片（正文部分，计数由缓存合并）"""
+    moment_cards = []
+    for moment in feed_queryset(Moment.objects.filter(id__in=moment_ids)):
         # 获取用户头像
         avatar_url = moment.user.profile.userAvatar.url if hasattr(moment.user, 'profile') and hasattr(moment.user.profile, 'userAvatar') and moment.user.profile.userAvatar else ''
         
-        # 获取动态图片
+        # 获取动态图片及缩略图
         image_urls = []
+        image_srcsets = []
         if hasattr(moment, 'moment_images'):
             for image in moment.moment_images.all():
                 image_urls.append(image.image.url)
+                image_srcsets.append(build_srcset(image.image, image.thumbnail_widths))
         
         # 获取VIP信息
         vip_info = {}
@@ -1035,7 +777,7 @@ def load_more_moments(request):
             vip_info['level_color'] = moment.user.vip.get_level_color()
             vip_info['level_text_color'] = moment.user.vip.get_level_text_color()
         
-        moments_data.append({
+        moment_cards.append({
             'id': moment.id,
             'user': {
                 'id': moment.user.id,
@@ -1046,30 +788,57 @@ def load_more_moments(request):
             },
             'content': moment.content,
             'images': image_urls,
+            'image_srcsets': image_srcsets,
             'created_at': moment.created_at.strftime('%Y-%m-%d %H:%M'),
-            'likes': moment.likes,
-            'comments': moment.comments,
-            'view_count': moment.view_count
         })
+    return moment_cards
+
+
+# 社区动态分页加载API
+from django.http import JsonResponse
+def load_more_moments(request):
+    """加载更多社区动态的API（传入 cursor 时按游标翻页）"""
+    page = parse_page(request.GET.get('page'))
+    cursor = request.GET.get('cursor', '')
+    page_size = 10
+    filter_type = request.GET.get('filter', 'latest')  # 默认为最新
+    
+    # 生成缓存键（带列表代号），缓存当前页的动态ID
+    cache_key = tagged_key(f'community:{filter_type}:{cursor or page}', MOMENT_LIST_GENERATION)
+    
+    # 尝试从缓存获取
+    cached_page = get_tagged(cache_key)
+    if cached_page is None:
+        # 基础查询：只查询分享的动态
+        base_query = Moment.objects.filter(is_shared=True)
+        
+        # 热门按持久化的热度分排序（走 is_shared + hot_score 索引）；
+        # 最新和推荐按发布时间排序，推荐暂时使用最新的逻辑，后续可根据用户兴趣进行个性化推荐
+        order_field = 'hot_score' if filter_type == 'popular' else 'created_at'
+        moments, next_cursor, has_more = keyset_page(
+            base_query.only('id', order_field), cursor, page_size, order_field, page
+        )
+        
+        cached_page = {
+            'moment_ids': [moment.id for moment in moments],
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        }
+        
+        # 缓存结果，有效期5分钟
+        set_tagged(cache_key, cached_page, [], 300)
     
-    # 检查是否还有更多数据
-    has_more = total_count > offset + page_size
+    # 正文和计数分别从缓存读取
+    moments_data = get_feed_items('card', cached_page['moment_ids'], build_moment_cards)
     
     # 构建响应数据
     response_data = {
         'success': True,
         'moments': moments_data,
-        'has_more': has_more,
+        'has_more': cached_page['has_more'],
+        'next_cursor': cached_page['next_cursor'],
         'page': page,
         'page_size': page_size
     }
     
-    # 缓存结果，有效期5分钟
-    try:
-        from django.core.cache import caches
-        master_cache = caches['master_cache']
-        master_cache.set(cache_key, response_data, 300)
-    except Exception as e:
-        print(f"缓存写入失败: {e}")
-    
     return JsonResponse(response_data)
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from core.models import User
 
 
@@ -71,6 +73,7 @@ class Note(models.Model):
 class NoteImage(models.Model):
     notemoment = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='note_images')
     noteimage = models.ImageField(upload_to='note_images/%Y/%m/%d/', verbose_name='日记图片')
+    thumbnail_widths = models.JSONField(default=list, blank=True, verbose_name='缩略图宽度')
 
     def __str__(self):
         return f"日记 #{self.notemoment.id} 的图片"
@@ -122,3 +125,12 @@ class CommentLike(models.Model):
 
     def __str__(self):
         return f"{self.user.username} 点赞了评论 #{self.comment.id}"
+
+
+# 信号处理函数
+@receiver(post_save, sender=NoteImage)
+def create_note_image_thumbnails(sender, instance, created, **kwargs):
+    """上传日记图片后异步生成缩略图"""
+    if created:
+        from core.thumbnails import enqueue_thumbnails
+        enqueue_thumbnails(instance, 'noteimage')
@@ -1,13 +1,20 @@
 from rest_framework import serializers
 from .models import Note, NoteImage
 from core.serializers import UserSerializer
+from core.thumbnails import build_srcset
 
 
 class NoteImageSerializer(serializers.ModelSerializer):
     """日记图片序列化器"""
+    srcset = serializers.SerializerMethodField()
+    
+    def get_srcset(self, obj):
+        """缩略图 srcset"""
+        return build_srcset(obj.noteimage, obj.thumbnail_widths, self.context.get('request'))
+    
     class Meta:
         model = NoteImage
-        fields = ['id', 'noteimage']
+        fields = ['id', 'noteimage', 'srcset']
 
 
 class NoteSerializer(serializers.ModelSerializer):
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from core.models import User
 
 
@@ -6,6 +8,7 @@ class Photo(models.Model):
     """照片模型"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='photos')
     image = models.ImageField(upload_to='photos/%Y/%m/%d/')
+    thumbnail_widths = models.JSONField(default=list, blank=True, verbose_name='缩略图宽度')
     description = models.TextField(blank=True, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
@@ -13,4 +16,13 @@ class Photo(models.Model):
         return f"Photo by {self.user.username} at {self.uploaded_at}"
 
     class Meta:
-        ordering = ['-uploaded_at']
\ No newline at end of file
+        ordering = ['-uploaded_at']
+
+
+# 信号处理函数
+@receiver(post_save, sender=Photo)
+def create_photo_thumbnails(sender, instance, created, **kwargs):
+    """上传照片后异步生成缩略图"""
+    if created:
+        from core.thumbnails import enqueue_thumbnails
+        enqueue_thumbnails(instance, 'image')
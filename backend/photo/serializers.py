@@ -1,12 +1,18 @@
 from rest_framework import serializers
 from .models import Photo
 from core.serializers import UserSerializer
+from core.thumbnails import build_srcset
 
 
 class PhotoSerializer(serializers.ModelSerializer):
     """照片序列化器"""
     user = UserSerializer(read_only=True)
+    srcset = serializers.SerializerMethodField()
+    
+    def get_srcset(self, obj):
+        """缩略图 srcset"""
+        return build_srcset(obj.image, obj.thumbnail_widths, self.context.get('request'))
     
     class Meta:
         model = Photo
-        fields = ['id', 'user', 'image', 'description', 'uploaded_at']
\ No newline at end of file
+        fields = ['id', 'user', 'image', 'srcset', 'description', 'uploaded_at']
\ No newline at end of file
@@ -154,7 +154,8 @@ class UserAchievement(models.Model):
 # 监听动态创建事件，解锁"记录美好"成就
 def unlock_record_moment_achievement(sender, instance, created, **kwargs):
     """当用户创建第一条动态时，解锁"记录美好"成就"""
-    if created:
+    # 通过 moment.publish 发布的动态由异步任务处理
+    if created and not getattr(instance, '_defer_side_effects', False):
         user = instance.user
         # 检查用户是否是第一次创建动态
         moment_count = sender.objects.filter(user=user).count()
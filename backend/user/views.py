@@ -7,9 +7,11 @@ from django.urls import reverse
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.db.models import Q
 from core.models import User
+from core.pagination import keyset_page, parse_page
 from couple.models import CouplePlace as Place
 from .models import Follow, Collection, CommunityEvent
 from moment.models import Moment
+from moment.cache_tags import bump_generation, tagged_key
 from photo.models import Photo
 from rest_framework import viewsets, status
 from rest_framework.response import Response
@@ -190,22 +192,18 @@ def get_following(request, user_id):
 
 @login_required
 def load_more_moments(request, user_id):
-    """加载更多动态"""
+    """加载更多动态（传入 cursor 时按游标翻页）"""
     if request.method == 'GET':
-        page = request.GET.get('page', 2)  # 默认从第2页开始加载
+        page = parse_page(request.GET.get('page'), 2)  # 默认从第2页开始加载
         
         profile_user = get_object_or_404(User, id=user_id)
         moments = Moment.objects.filter(
             user=profile_user
-        ).order_by('-created_at')
-        
-        paginator = Paginator(moments, 10)  # 每页10条
+        ).prefetch_related('moment_images')
         
-        try:
-            moments_page = paginator.page(page)
-        except PageNotAnInteger:
-            moments_page = paginator.page(2)
-        except EmptyPage:
+        # 每页10条，多取一条判断是否还有下一页
+        moments_page, next_cursor, has_next = keyset_page(moments, request.GET.get('cursor'), 10, 'created_at', page)
+        if not moments_page:
             return JsonResponse({'success': False, 'message': '没有更多动态了'})
         
         # 构建动态数据
@@ -223,8 +221,9 @@ def load_more_moments(request, user_id):
         return JsonResponse({
         'success': True,
         'moments': moments_data,
-        'has_next': moments_page.has_next(),
-        'next_page': moments_page.next_page_number() if moments_page.has_next() else None
+        'has_next': has_next,
+        'next_page': page + 1 if has_next else None,
+        'next_cursor': next_cursor
     })
 
     return JsonResponse({'success': False, 'message': '请求方式错误'})
@@ -269,16 +268,9 @@ def add_collection(request):
             )
             
             if created:
-                # 清除缓存
-                try:
-                    from django.core.cache import caches
-                    master_cache = caches['master_cache']  # 使用社区缓存数据库 1
-                    user_id = request.user.id
-                    # 清除收藏列表缓存（包括API和页面缓存）
-                    master_cache.delete_pattern(f'user:collections:{user_id}*')
-                    master_cache.delete_pattern(f'user:collections:page:{user_id}*')
-                except Exception as e:
-                    print(f"缓存清除失败: {e}")
+                # 使收藏列表缓存失效（包括API和页面缓存）
+                user_id = request.user.id
+                bump_generation(f'user_collections:{user_id}', f'user_favorites:{user_id}')
                 
                 return JsonResponse({'success': True, 'message': '收藏成功'})
             else:
@@ -316,16 +308,9 @@ def remove_collection(request):
             
             if collection:
                 collection.delete()
-                # 清除缓存
-                try:
-                    from django.core.cache import caches
-                    master_cache = caches['master_cache']  # 使用社区缓存数据库 1
-                    user_id = request.user.id
-                    # 清除收藏列表缓存（包括API和页面缓存）
-                    master_cache.delete_pattern(f'user:collections:{user_id}*')
-                    master_cache.delete_pattern(f'user:collections:page:{user_id}*')
-                except Exception as e:
-                    print(f"缓存清除失败: {e}")
+                # 使收藏列表缓存失效（包括API和页面缓存）
+                user_id = request.user.id
+                bump_generation(f'user_collections:{user_id}', f'user_favorites:{user_id}')
                 
                 return JsonResponse({'success': True, 'message': '取消收藏成功'})
             else:
@@ -353,6 +338,7 @@ def get_collections(request):
                 cache_key = f'user:collections:{user_id}:{content_type}:{page}'
             else:
                 cache_key = f'user:collections:{user_id}:all:{page}'
+            cache_key = tagged_key(cache_key, f'user_collections:{user_id}')
             
             # 尝试从缓存获取
             cached_result = None
@@ -461,7 +447,7 @@ def collections(request):
     try:
         # 生成缓存键
         user_id = request.user.id
-        cache_key = f'user:collections:page:{user_id}'
+        cache_key = tagged_key(f'user:collections:page:{user_id}', f'user_collections:{user_id}')
         
         # 尝试从缓存获取
         cached_context = None
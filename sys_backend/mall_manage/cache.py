@@ -0,0 +1,63 @@
+import os
+import uuid
+import redis
+
+
+# 与前台商城共用的活动缓存版本号键（商城缓存数据库中的 Redis 原生键）
+ACTIVITY_VERSION_KEY = 'mall_active:version'
+
+# 与前台商城共用的首页板块计数器哈希键
+HOME_SECTION_VERSIONS_KEY = 'mall_home:versions'
+
+# 与前台商城共用的优惠券索引版本号键
+COUPON_INDEX_VERSION_KEY = 'coupon_index:version'
+
+
+def get_mall_cache_redis():
+    """获取商城缓存数据库的 Redis 连接"""
+    return redis.Redis(
+        host=os.environ.get('REDIS_HOST', '127.0.0.1'),
+        port=int(os.environ.get('REDIS_PORT', '6379')),
+        db=int(os.environ.get('REDIS_DB_MALL_CACHE', '2')),
+    )
+
+
+def bump_flash_sale_cache_version():
+    """递增活动缓存版本号，使前台所有活动缓存失效"""
+    try:
+        return get_mall_cache_redis().incr(ACTIVITY_VERSION_KEY)
+    except Exception as e:
+        # 缓存失效失败不影响后台操作，前台缓存会在活动边界时间自然过期
+        print(f"活动缓存版本更新失败: {e}")
+        return None
+
+
+def invalidate_product_card(product_id):
+    """清除前台商品卡片缓存（django-redis 默认键格式为 前缀:版本:键）"""
+    try:
+        # 前台缓存键使用带连字符的 UUID 格式
+        product_id = uuid.UUID(str(product_id))
+        return get_mall_cache_redis().delete(f':1:product_card:{product_id}')
+    except Exception as e:
+        print(f"商品卡片缓存清除失败: {e}")
+        return None
+
+
+def bump_home_section(section):
+    """递增前台首页板块计数器，使该板块缓存失效"""
+    try:
+        return get_mall_cache_redis().hincrby(HOME_SECTION_VERSIONS_KEY, section, 1)
+    except Exception as e:
+        print(f"首页板块版本更新失败: {e}")
+        return None
+
+
+def invalidate_coupons():
+    """优惠券变化时使前台所有用户的优惠券索引失效，并清除可领取优惠券缓存"""
+    try:
+        redis_conn = get_mall_cache_redis()
+        redis_conn.incr(COUPON_INDEX_VERSION_KEY)
+        return redis_conn.delete(':1:coupon_available')
+    except Exception as e:
+        print(f"优惠券缓存清除失败: {e}")
+        return None
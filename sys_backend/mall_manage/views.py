@@ -1,8 +1,9 @@
 from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import connection
+from django.db import connection, transaction
 from rest_framework.decorators import action
+from .cache import bump_flash_sale_cache_version, invalidate_product_card, bump_home_section, invalidate_coupons
 
 
 class ProductManagementViewSet(viewsets.ViewSet):
@@ -129,6 +130,9 @@ class ProductManagementViewSet(viewsets.ViewSet):
             with connection.cursor() as cursor:
                 cursor.execute(sql, params)
             
+            if data.get('is_couple_product', False):
+                bump_home_section('couple_products')
+            
             # 返回新创建的商品
             return self.retrieve(request, product_id)
             
@@ -213,6 +217,9 @@ class ProductManagementViewSet(viewsets.ViewSet):
                 if cursor.rowcount == 0:
                     return Response({'error': '商品不存在'}, status=status.HTTP_404_NOT_FOUND)
             
+            invalidate_product_card(pk)
+            bump_home_section('couple_products')
+            
             # 返回更新后的商品
             return self.retrieve(request, pk)
             
@@ -224,12 +231,17 @@ class ProductManagementViewSet(viewsets.ViewSet):
         try:
             sql = "DELETE FROM mall_product WHERE id = %s"
             
-            with connection.cursor() as cursor:
+            with transaction.atomic(), connection.cursor() as cursor:
+                # 先删除搜索文档（外键约束不会级联删除）
+                cursor.execute("DELETE FROM mall_productsearchdocument WHERE product_id = %s", [pk])
                 cursor.execute(sql, [pk])
                 
                 if cursor.rowcount == 0:
                     return Response({'error': '商品不存在'}, status=status.HTTP_404_NOT_FOUND)
             
+            invalidate_product_card(pk)
+            bump_home_section('couple_products')
+            
             return Response({'message': '商品删除成功'}, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -365,6 +377,8 @@ class CategoryManagementViewSet(viewsets.ViewSet):
                 cursor.execute(sql, params)
                 category_id = cursor.lastrowid
             
+            bump_home_section('categories')
+            
             # 返回新创建的分类
             response = self.retrieve(request, category_id)
             # 确保时间格式正确
@@ -447,6 +461,8 @@ class CategoryManagementViewSet(viewsets.ViewSet):
                 if cursor.rowcount == 0:
                     return Response({'error': '分类不存在'}, status=status.HTTP_404_NOT_FOUND)
             
+            bump_home_section('categories')
+            
             # 返回更新后的分类
             return self.retrieve(request, pk)
             
@@ -464,6 +480,8 @@ class CategoryManagementViewSet(viewsets.ViewSet):
                 if cursor.rowcount == 0:
                     return Response({'error': '分类不存在'}, status=status.HTTP_404_NOT_FOUND)
             
+            bump_home_section('categories')
+            
             return Response({'message': '分类删除成功'}, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -850,6 +868,9 @@ class FlashSaleManagementViewSet(viewsets.ViewSet):
                 cursor.execute(sql, params)
                 flash_sale_id = cursor.lastrowid
             
+            # 活动数据变化，递增前台活动缓存版本号
+            bump_flash_sale_cache_version()
+            
             # 返回新创建的闪购活动
             return self.retrieve(request, flash_sale_id)
             
@@ -940,6 +961,9 @@ class FlashSaleManagementViewSet(viewsets.ViewSet):
                 if cursor.rowcount == 0:
                     return Response({'error': '闪购活动不存在'}, status=status.HTTP_404_NOT_FOUND)
             
+            # 活动数据变化，递增前台活动缓存版本号
+            bump_flash_sale_cache_version()
+            
             # 返回更新后的闪购活动
             return self.retrieve(request, pk)
             
@@ -957,6 +981,9 @@ class FlashSaleManagementViewSet(viewsets.ViewSet):
                 if cursor.rowcount == 0:
                     return Response({'error': '闪购活动不存在'}, status=status.HTTP_404_NOT_FOUND)
             
+            # 活动数据变化，递增前台活动缓存版本号
+            bump_flash_sale_cache_version()
+            
             return Response({'message': '闪购活动删除成功'}, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -1110,6 +1137,8 @@ class CouponManagementViewSet(viewsets.ViewSet):
                 cursor.execute(sql, params)
                 coupon_id = cursor.lastrowid
             
+            invalidate_coupons()
+            
             # 返回新创建的优惠券
             return self.retrieve(request, coupon_id)
             
@@ -1212,6 +1241,8 @@ class CouponManagementViewSet(viewsets.ViewSet):
                 if cursor.rowcount == 0:
                     return Response({'error': '优惠券不存在'}, status=status.HTTP_404_NOT_FOUND)
             
+            invalidate_coupons()
+            
             # 返回更新后的优惠券
             return self.retrieve(request, pk)
             
@@ -1229,6 +1260,8 @@ class CouponManagementViewSet(viewsets.ViewSet):
                 if cursor.rowcount == 0:
                     return Response({'error': '优惠券不存在'}, status=status.HTTP_404_NOT_FOUND)
             
+            invalidate_coupons()
+            
             return Response({'message': '优惠券删除成功'}, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -1341,6 +1374,8 @@ class BannerManagementViewSet(viewsets.ViewSet):
                 cursor.execute(sql, params)
                 banner_id = cursor.lastrowid
             
+            bump_home_section('banners')
+            
             # 返回新创建的Banner
             return self.retrieve(request, banner_id)
             
@@ -1416,6 +1451,8 @@ class BannerManagementViewSet(viewsets.ViewSet):
                 if cursor.rowcount == 0:
                     return Response({'error': 'Banner不存在'}, status=status.HTTP_404_NOT_FOUND)
             
+            bump_home_section('banners')
+            
             # 返回更新后的Banner
             return self.retrieve(request, pk)
             
@@ -1433,6 +1470,8 @@ class BannerManagementViewSet(viewsets.ViewSet):
                 if cursor.rowcount == 0:
                     return Response({'error': 'Banner不存在'}, status=status.HTTP_404_NOT_FOUND)
             
+            bump_home_section('banners')
+            
             return Response({'message': 'Banner删除成功'}, status=status.HTTP_200_OK)
             
         except Exception as e:
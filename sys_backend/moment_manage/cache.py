@@ -0,0 +1,39 @@
+import os
+import redis
+
+
+# 与前台共用的热门排行有序集合键（主数据库中的 Redis 原生键，格式为 ranking:{排行}:{窗口}）
+RANKING_KEYS = [
+    f'ranking:{name}:{window}'
+    for name in ('hot', 'favorites')
+    for window in ('7days', '30days', 'all')
+]
+
+# 与前台共用的动态发布时间有序集合键
+RANKING_PUBLISHED_KEY = 'ranking:published'
+
+# 前台动态正文缓存的展示格式
+MOMENT_BODY_KINDS = ('feed', 'card')
+
+
+def get_master_cache_redis():
+    """获取前台主数据库的 Redis 连接"""
+    return redis.Redis(
+        host=os.environ.get('REDIS_HOST', '127.0.0.1'),
+        port=int(os.environ.get('REDIS_PORT', '6379')),
+        db=int(os.environ.get('REDIS_DB_matser', '1')),
+    )
+
+
+def invalidate_moment(moment_id):
+    """动态被隐藏或删除后，移出前台热门排行并清除正文缓存（django-redis 默认键格式为 前缀:版本:键）"""
+    try:
+        pipe = get_master_cache_redis().pipeline()
+        for key in RANKING_KEYS + [RANKING_PUBLISHED_KEY]:
+            pipe.zrem(key, moment_id)
+        pipe.delete(*[f':1:moment:body:{kind}:{moment_id}' for kind in MOMENT_BODY_KINDS])
+        return pipe.execute()
+    except Exception as e:
+        # 缓存清除失败不影响后台操作，前台读取排行时会过滤未分享的动态
+        print(f"动态缓存清除失败: {e}")
+        return None
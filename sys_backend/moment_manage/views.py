@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.utils import timezone
 from django.db import connection
 from django.contrib.auth import get_user_model
+from .cache import invalidate_moment
 
 User = get_user_model()
 
@@ -185,6 +186,8 @@ class MomentViewSet(viewsets.ViewSet):
             with connection.cursor() as cursor:
                 cursor.execute(delete_moment_sql, [pk])
             
+            invalidate_moment(pk)
+            
             return Response(status=status.HTTP_204_NO_CONTENT)
             
         except Exception as e:
@@ -215,6 +218,8 @@ class MomentViewSet(viewsets.ViewSet):
             with connection.cursor() as cursor:
                 cursor.execute(update_sql, [new_shared, pk])
             
+            invalidate_moment(pk)
+            
             return Response({
                 'is_shared': new_shared,
                 'message': '分享状态已更新'